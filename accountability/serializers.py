@@ -1,14 +1,16 @@
 from rest_framework import serializers
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from elevanalog.instrumentation import TimedSerializerMixin
 from .models import AccountabilityPartner
-from users.serializers import UserSerializer
+from users.serializers import CompactUserSerializer
 
 User = get_user_model()
 
-class AccountabilityPartnerSerializer(serializers.ModelSerializer):
-    requester = UserSerializer(read_only=True)
-    partner = UserSerializer(read_only=True)
+class AccountabilityPartnerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Compact, so the list's prefetch plan is two select_related joins
+    requester = CompactUserSerializer(read_only=True)
+    partner = CompactUserSerializer(read_only=True)
     partner_id = serializers.IntegerField(write_only=True)
 
     class Meta:
@@ -1,3 +1,29 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from elevanalog.instrumentation import QueryBudgetTestMixin
+from .models import AccountabilityPartner
+
+User = get_user_model()
+
+
+class AccountabilityPartnerListTests(QueryBudgetTestMixin, TestCase):
+    query_budgets = settings.QUERY_BUDGETS
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='seeker', email='seeker@example.com', password='pass')
+        for i in range(10):
+            partner = User.objects.create_user(username=f'partner{i}', email=f'partner{i}@example.com', password='pass')
+            AccountabilityPartner.objects.create(requester=self.user, partner=partner)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def test_partners_embed_compact_users_within_budget(self):
+        response = self.client.get('/api/partners/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+        row = response.json()['results'][0]
+        self.assertEqual(
+            set(row['partner']), {'id', 'username', 'email', 'first_name', 'last_name', 'avatar_40'}
+        )
@@ -2,15 +2,19 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from elevanalog.pagination import KeysetPagination
+from elevanalog.prefetch import apply_prefetch_plan
 from .models import AccountabilityPartner
 from .serializers import AccountabilityPartnerSerializer
 
 class AccountabilityPartnerViewSet(viewsets.ModelViewSet):
     serializer_class = AccountabilityPartnerSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return AccountabilityPartner.objects.filter(requester=self.request.user) | AccountabilityPartner.objects.filter(partner=self.request.user)
+        queryset = AccountabilityPartner.objects.filter(requester=self.request.user) | AccountabilityPartner.objects.filter(partner=self.request.user)
+        return apply_prefetch_plan(queryset, self.get_serializer_class())
 
     def perform_create(self, serializer):
         serializer.save(requester=self.request.user)
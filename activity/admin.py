@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import TaskEvent
+
+
+@admin.register(TaskEvent)
+class TaskEventAdmin(admin.ModelAdmin):
+    list_display = ['verb', 'task', 'actor', 'created_at']
+    list_filter = ['verb']
+    raw_id_fields = ['task', 'actor']
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+
+from elevanalog.async_api import authenticate, error_response
+from elevanalog.pubsub import get_broker
+from .events import inbox_channel
+from .models import ActivityInbox
+from .serializers import ActivitySerializer
+
+KEEPALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+REPLAY_LIMIT = 500
+
+
+async def stream(request):
+    """
+    Server-Sent Events stream of the user's activity inbox (ASGI only).
+
+    Each SSE message is one inbox row, with the row id as its event id, so a
+    reconnecting EventSource resumes from Last-Event-ID (or ?last_event_id=)
+    and gets whatever it missed. Without either, the stream starts at the
+    newest row. EventSource can't send headers, so ?token= is accepted too.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        user, _ = await authenticate(request, allow_query_token=True)
+        last_id = _last_event_id(request)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+
+    if last_id is None:
+        newest = await ActivityInbox.objects.filter(user=user).order_by('-pk').values_list('pk', flat=True).afirst()
+        last_id = newest or 0
+
+    response = StreamingHttpResponse(_events(user, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+
+def _last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise exceptions.ValidationError({'last_event_id': "Expected an integer event id."})
+
+
+async def _events(user, last_id):
+    # Subscribe before replaying, so nothing delivered in between is missed
+    async with get_broker().subscribe(inbox_channel(user.pk)) as wakeups:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        while True:
+            rows = [
+                row async for row in ActivityInbox.objects.filter(user=user, pk__gt=last_id)
+                .select_related('event__actor').order_by('pk')[:REPLAY_LIMIT]
+            ]
+            for row in rows:
+                data = json.dumps(ActivitySerializer(row).data, default=str)
+                yield f'id: {row.pk}\nevent: {row.event.verb}\ndata: {data}\n\n'
+                last_id = row.pk
+            if len(rows) == REPLAY_LIMIT:
+                continue  # more to replay before waiting
+            try:
+                await asyncio.wait_for(wakeups.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
@@ -0,0 +1,94 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from organizations.models import Membership
+from teams.models import TeamMembership
+from tasks.models import TaskVisibility
+from .models import TaskEvent
+
+
+def inbox_channel(user_id):
+    # Pub/sub channel that wakes a user's live streams when their inbox grows
+    return f'activity:{user_id}'
+
+
+def task_state(task):
+    # (assignee_id, status) as loaded, or None when either field is deferred
+    values = task.__dict__
+    if 'assignee_id' not in values or 'status' not in values:
+        return None
+    return values['assignee_id'], values['status']
+
+
+def task_changes(task, before, created, actor=None):
+    """Unsaved TaskEvents describing how `task` differs from its `before` state."""
+    actor_id = getattr(actor, 'pk', None)
+    events = []
+    if created:
+        actor_id = actor_id or task.owner_id
+        events.append(TaskEvent(task=task, actor_id=actor_id, verb=TaskEvent.CREATED,
+                                payload={'title': task.title, 'status': task.status}))
+        if task.assignee_id:
+            events.append(TaskEvent(task=task, actor_id=actor_id, verb=TaskEvent.ASSIGNED,
+                                    payload={'assignee_id': task.assignee_id}))
+        return events
+    if before is None:
+        return events
+
+    assignee_id, status = before
+    if task.assignee_id != assignee_id and task.assignee_id:
+        events.append(TaskEvent(task=task, actor_id=actor_id, verb=TaskEvent.ASSIGNED,
+                                payload={'assignee_id': task.assignee_id, 'previous_assignee_id': assignee_id}))
+    if task.status != status:
+        events.append(TaskEvent(task=task, actor_id=actor_id, verb=TaskEvent.STATUS_CHANGED,
+                                payload={'from': status, 'to': task.status}))
+    return events
+
+
+def record_events(events):
+    """Append the events and queue their fan-out once the transaction commits."""
+    from .tasks import fan_out_events
+
+    events = TaskEvent.objects.bulk_create(events)
+    if events:
+        event_ids = [event.pk for event in events]
+        transaction.on_commit(lambda: fan_out_events.delay(event_ids))
+    return events
+
+
+def recipients(task_ids):
+    """
+    {task_id: user ids who can see the task}, resolved from the visibility
+    index: user keys directly, organization and team keys through membership.
+    """
+    audiences = defaultdict(set)
+    for task_id, audience in TaskVisibility.objects.filter(task_id__in=task_ids).values_list('task_id', 'audience'):
+        audiences[task_id].add(audience)
+
+    ids = defaultdict(set)
+    for keys in audiences.values():
+        for key in keys:
+            kind, _, pk = key.partition(':')
+            ids[kind].add(int(pk))
+    org_members = defaultdict(set)
+    for org_id, user_id in Membership.objects.filter(organization_id__in=ids['org']).values_list(
+            'organization_id', 'user_id'):
+        org_members[org_id].add(user_id)
+    team_members = defaultdict(set)
+    for team_id, user_id in TeamMembership.objects.filter(team_id__in=ids['team']).values_list(
+            'team_id', 'user_id'):
+        team_members[team_id].add(user_id)
+
+    result = {}
+    for task_id, keys in audiences.items():
+        users = result[task_id] = set()
+        for key in keys:
+            kind, _, pk = key.partition(':')
+            if kind == 'user':
+                users.add(int(pk))
+            elif kind == 'org':
+                users |= org_members[int(pk)]
+            elif kind == 'team':
+                users |= team_members[int(pk)]
+    return result
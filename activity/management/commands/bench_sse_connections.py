@@ -0,0 +1,99 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many idle connections to /api/activity/stream/ on a running ASGI "
+        "server and report how many it holds, how fast they open and (with --pid) "
+        "the server's memory per connection."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000/api/activity/stream/')
+        parser.add_argument('--user', required=True, help="Email of the user to connect as.")
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--hold', type=float, default=60.0, help="Seconds to keep the connections idle.")
+        parser.add_argument('--ramp', type=int, default=100, help="Connections opened concurrently.")
+        parser.add_argument('--pid', type=int, help="Server worker pid, to report its resident memory.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['user']}.")
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError("Only plain http:// URLs are supported.")
+        token = str(AccessToken.for_user(user))
+        asyncio.run(self._bench(url, token, options))
+
+    async def _bench(self, url, token, options):
+        rss_before = _rss_kb(options['pid'])
+        request = (
+            f"GET {url.path or '/'}{'?' + url.query if url.query else ''} HTTP/1.1\r\n"
+            f"Host: {url.netloc}\r\nAccept: text/event-stream\r\n"
+            f"Authorization: Bearer {token}\r\n\r\n"
+        ).encode()
+
+        semaphore = asyncio.Semaphore(options['ramp'])
+        timings, errors = [], []
+
+        async def connect():
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+                    writer.write(request)
+                    status = await asyncio.wait_for(reader.readline(), timeout=30)
+                    if b' 200 ' not in status:
+                        raise ConnectionError(status.decode(errors='replace').strip())
+                    await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=30)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError) as exc:
+                    errors.append(repr(exc))
+                    return None
+                timings.append((time.perf_counter() - started) * 1000)
+                return reader, writer
+
+        started = time.perf_counter()
+        connections = [c for c in await asyncio.gather(*(connect() for _ in range(options['connections']))) if c]
+        opened_in = time.perf_counter() - started
+        self.stdout.write(f"Opened {len(connections)}/{options['connections']} connections in {opened_in:.1f}s")
+        if timings:
+            quantiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+            self.stdout.write(f"Connect + headers: p50 {quantiles[49]:.1f} ms, p99 {quantiles[98]:.1f} ms")
+        if errors:
+            self.stdout.write(self.style.WARNING(f"{len(errors)} failed, e.g. {errors[0]}"))
+
+        rss_open = _rss_kb(options['pid'])
+        await asyncio.sleep(options['hold'])
+        alive = sum(1 for reader, _ in connections if not reader.at_eof())
+        self.stdout.write(f"Still open after {options['hold']:.0f}s idle: {alive}")
+
+        if rss_before is not None and rss_open is not None and connections:
+            per_connection = (rss_open - rss_before) / len(connections)
+            self.stdout.write(f"Server RSS {rss_before / 1024:.1f} MB -> {rss_open / 1024:.1f} MB "
+                              f"({per_connection:.1f} KB per connection)")
+
+        for _, writer in connections:
+            writer.close()
+
+
+def _rss_kb(pid):
+    if pid is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
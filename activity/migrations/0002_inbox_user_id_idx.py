@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='activityinbox',
+            name='inbox_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='activityinbox',
+            index=models.Index(fields=['user', 'id'], name='inbox_user_id_idx'),
+        ),
+    ]
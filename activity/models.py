@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import models
+
+from tasks.models import Task
+
+User = settings.AUTH_USER_MODEL
+
+
+class TaskEvent(models.Model):
+    """One thing that happened to a task. Append-only; never updated."""
+    CREATED = 'created'
+    ASSIGNED = 'assigned'
+    STATUS_CHANGED = 'status_changed'
+    COMMENTED = 'commented'
+    PARTNER_ADDED = 'partner_added'
+    VERB_CHOICES = (
+        (CREATED, 'Created'),
+        (ASSIGNED, 'Assigned'),
+        (STATUS_CHANGED, 'Status changed'),
+        (COMMENTED, 'Commented'),
+        (PARTNER_ADDED, 'Partner added'),
+    )
+
+    # Kept (as NULL) when the task or actor is deleted, so the log stays intact
+    task = models.ForeignKey(Task, on_delete=models.SET_NULL, null=True, related_name='events')
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['task', 'created_at'], name='taskevent_task_created_idx')]
+
+    def __str__(self):
+        return f'{self.verb} #{self.task_id}'
+
+
+class ActivityInbox(models.Model):
+    # One row per event per user who could see the task, written by activity.tasks.fan_out_events
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_inbox')
+    event = models.ForeignKey(TaskEvent, on_delete=models.CASCADE, related_name='deliveries')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'event')
+        # The inbox is paged by id, which is delivery order
+        indexes = [models.Index(fields=['user', 'id'], name='inbox_user_id_idx')]
+        verbose_name = 'Activity Inbox'
+        verbose_name_plural = 'Activity Inbox'
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+from elevanalog.instrumentation import TimedSerializerMixin
+from users.serializers import CompactUserSerializer
+from .models import ActivityInbox
+
+
+class ActivitySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    event_id = serializers.IntegerField(source='event.id', read_only=True)
+    task = serializers.IntegerField(source='event.task_id', read_only=True)
+    verb = serializers.CharField(source='event.verb', read_only=True)
+    actor = CompactUserSerializer(source='event.actor', read_only=True)
+    payload = serializers.JSONField(source='event.payload', read_only=True)
+
+    class Meta:
+        model = ActivityInbox
+        fields = ['id', 'event_id', 'task', 'verb', 'actor', 'payload', 'created_at']
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+
+from accountability.models import TaskAccountability
+from tasks.models import Task, TaskComment
+from tasks.signals import comments_bulk_created, partners_added, tasks_bulk_written
+from .events import record_events, task_changes, task_state
+from .models import TaskEvent
+
+
+@receiver(post_init, sender=Task)
+def remember_activity_state(sender, instance, **kwargs):
+    instance._activity_state = task_state(instance)
+
+
+@receiver(post_save, sender=Task)
+def record_task_events(sender, instance, created, **kwargs):
+    record_events(task_changes(instance, instance._activity_state, created, getattr(instance, '_actor', None)))
+    instance._activity_state = task_state(instance)
+
+
+@receiver(tasks_bulk_written)
+def record_bulk_task_events(sender, created, updated, **kwargs):
+    events = []
+    for task in created:
+        events += task_changes(task, None, True, getattr(task, '_actor', None))
+    for task in updated:
+        events += task_changes(task, task._activity_state, False, getattr(task, '_actor', None))
+        task._activity_state = task_state(task)
+    record_events(events)
+
+
+@receiver(post_save, sender=TaskComment)
+def record_comment(sender, instance, created, **kwargs):
+    if created:
+        record_events([TaskEvent(task_id=instance.task_id, actor_id=instance.author_id, verb=TaskEvent.COMMENTED,
+                                 payload={'comment_id': instance.pk})])
+
+
+@receiver(comments_bulk_created)
+def record_bulk_comments(sender, comments, **kwargs):
+    record_events([
+        TaskEvent(task_id=comment.task_id, actor_id=comment.author_id, verb=TaskEvent.COMMENTED,
+                  payload={'comment_id': comment.pk})
+        for comment in comments
+    ])
+
+
+@receiver(post_save, sender=TaskAccountability)
+def record_partner(sender, instance, created, **kwargs):
+    if created:
+        record_events([TaskEvent(task_id=instance.task_id, verb=TaskEvent.PARTNER_ADDED,
+                                 payload={'partner_id': instance.partner_id})])
+
+
+@receiver(partners_added)
+def record_partners(sender, task, partner_ids, actor=None, **kwargs):
+    record_events([
+        TaskEvent(task=task, actor_id=getattr(actor, 'pk', None), verb=TaskEvent.PARTNER_ADDED,
+                  payload={'partner_id': partner_id})
+        for partner_id in sorted(partner_ids)
+    ])
@@ -0,0 +1,27 @@
+from celery import shared_task
+
+from elevanalog.pubsub import get_broker
+from .events import inbox_channel, recipients
+from .models import ActivityInbox, TaskEvent
+
+FAN_OUT_BATCH_SIZE = 1000
+
+
+@shared_task
+def fan_out_events(event_ids):
+    """
+    Deliver events to the inbox of everyone who can see their task, except
+    the actor. Safe to retry: existing deliveries are skipped.
+    """
+    events = list(TaskEvent.objects.filter(pk__in=event_ids, task__isnull=False))
+    audience = recipients({event.task_id for event in events})
+    deliveries = [
+        ActivityInbox(user_id=user_id, event=event, created_at=event.created_at)
+        for event in events
+        for user_id in audience.get(event.task_id, ())
+        if user_id != event.actor_id
+    ]
+    ActivityInbox.objects.bulk_create(deliveries, batch_size=FAN_OUT_BATCH_SIZE, ignore_conflicts=True)
+    # Wake up live streams (activity.async_views.stream); they read the new rows themselves
+    get_broker().publish_many({inbox_channel(delivery.user_id) for delivery in deliveries})
+    return f"Delivered {len(events)} events to {len(deliveries)} inboxes."
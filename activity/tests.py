@@ -0,0 +1,83 @@
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from elevanalog.pubsub import InProcessBroker, get_broker
+from organizations.models import Membership, Organization
+from tasks.models import Task, TaskComment
+from .models import ActivityInbox, TaskEvent
+from .tasks import fan_out_events
+from .views import ActivityViewSet
+
+User = get_user_model()
+
+
+@override_settings(PUBSUB_BROKER='elevanalog.pubsub.InProcessBroker')
+class ActivityFanOutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        self.colleague = User.objects.create_user(username='colleague', email='colleague@example.com', password='pass')
+        self.outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='pass')
+        self.organization = Organization.objects.create(name='Acme')
+        Membership.objects.create(user=self.owner, organization=self.organization, role='admin')
+        Membership.objects.create(user=self.colleague, organization=self.organization, role='member')
+
+    def test_events_reach_everyone_who_can_see_the_task_except_the_actor(self):
+        task = Task.objects.create(title='Launch', owner=self.owner, organization=self.organization)
+        task.status = 'in_progress'
+        task._actor = self.owner
+        task.save()
+        TaskComment.objects.create(task=task, author=self.colleague, text='On it')
+
+        events = TaskEvent.objects.filter(task=task).order_by('pk')
+        self.assertEqual(
+            list(events.values_list('verb', flat=True)),
+            [TaskEvent.CREATED, TaskEvent.STATUS_CHANGED, TaskEvent.COMMENTED],
+        )
+
+        fan_out_events([event.pk for event in events])
+        inbox = ActivityInbox.objects.values_list('user_id', 'event__verb')
+        self.assertCountEqual(inbox, [
+            (self.colleague.pk, TaskEvent.CREATED),
+            (self.colleague.pk, TaskEvent.STATUS_CHANGED),
+            (self.owner.pk, TaskEvent.COMMENTED),
+        ])
+
+    def test_pollers_get_rows_delivered_since_their_cursor(self):
+        def poll(**params):
+            request = APIRequestFactory().get('/api/activity/', params)
+            force_authenticate(request, user=self.colleague)
+            return ActivityViewSet.as_view({'get': 'list'})(request).data
+
+        self.assertEqual(poll()['since'], 0)
+        task = Task.objects.create(title='Launch', owner=self.owner, organization=self.organization)
+        fan_out_events(list(TaskEvent.objects.values_list('pk', flat=True)))
+        first = poll()
+        self.assertEqual(len(first['results']), 1)
+        self.assertEqual(first['since'], first['results'][0]['id'])
+
+        task.status = 'completed'
+        task.save()
+        self.assertEqual(poll(since=first['since'])['results'], [])
+        # Delivered later, however old the event
+        fan_out_events(list(TaskEvent.objects.filter(verb=TaskEvent.STATUS_CHANGED).values_list('pk', flat=True)))
+        later = poll(since=first['since'])
+        self.assertEqual([row['verb'] for row in later['results']], [TaskEvent.STATUS_CHANGED])
+        self.assertEqual(poll(since=later['since']), {'next': None, 'since': later['since'], 'results': []})
+
+
+class InProcessBrokerTests(SimpleTestCase):
+    async def test_publishes_coalesce_into_one_wakeup_per_subscriber(self):
+        broker = InProcessBroker()
+        async with broker.subscribe('activity:1') as first, broker.subscribe('activity:1') as second:
+            broker.publish_many(['activity:1', 'activity:2'])
+            broker.publish('activity:1')
+            await asyncio.sleep(0)
+            self.assertEqual((first.qsize(), second.qsize()), (1, 1))
+        self.assertEqual(broker.subscriber_count(), 0)
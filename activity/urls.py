@@ -0,0 +1,13 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from . import async_views
+from .views import ActivityViewSet
+
+router = DefaultRouter()
+router.register(r'activity', ActivityViewSet, basename='activity')
+
+urlpatterns = [
+    # Server-Sent Events; needs the ASGI app (elevanalog.asgi)
+    path('activity/stream/', async_views.stream, name='activity-stream'),
+    path('', include(router.urls)),
+]
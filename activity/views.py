@@ -0,0 +1,55 @@
+from django.db.models import Max
+from rest_framework import mixins, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from elevanalog.pagination import KeysetPagination
+from .models import ActivityInbox
+from .serializers import ActivitySerializer
+
+
+class ActivityViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    The requesting user's activity inbox, newest first, paged by inbox row id
+    (the order rows were delivered in, which is not always event order).
+
+    Every response carries `since`, the id of the newest row delivered so
+    far, empty pages included. Pollers send it back as ?since= to get only
+    the rows delivered after it, oldest first, and keep the `since` of each
+    response for the next poll.
+    """
+    serializer_class = ActivitySerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = '-id'
+
+    def get_queryset(self):
+        # The serializer reads through dotted sources, which the prefetch planner doesn't follow
+        return ActivityInbox.objects.filter(user=self.request.user).select_related('event__actor')
+
+    def list(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        if since is not None:
+            return self._list_since(request, since)
+        response = super().list(request, *args, **kwargs)
+        response.data['since'] = self.get_queryset().aggregate(newest=Max('pk'))['newest'] or 0
+        return response
+
+    def _list_since(self, request, since):
+        try:
+            since = int(since)
+        except ValueError:
+            raise ValidationError({'since': "Expected an integer inbox id."})
+        page_size = self.paginator.get_page_size(request)
+        rows = list(self.get_queryset().filter(pk__gt=since).order_by('pk')[:page_size + 1])
+        more, rows = len(rows) > page_size, rows[:page_size]
+        if rows:
+            since = rows[-1].pk
+        return Response({
+            # Further rows delivered since, when the page was full
+            'next': replace_query_param(request.build_absolute_uri(), 'since', since) if more else None,
+            'since': since,
+            'results': self.get_serializer(rows, many=True).data,
+        })
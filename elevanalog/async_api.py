@@ -0,0 +1,84 @@
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from rest_framework import exceptions, status
+from rest_framework.request import ForcedAuthentication, Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+User = get_user_model()
+
+_jwt = JWTAuthentication()
+
+
+async def authenticate(request, queryset=None, allow_query_token=False):
+    """
+    JWTAuthentication for async views: the token is checked exactly as DRF
+    would, and the user is loaded with the async ORM (optionally from a
+    queryset carrying the select/prefetch the view needs).
+
+    With allow_query_token, a ?token= parameter is accepted when there is no
+    Authorization header, for clients such as EventSource that can't set one.
+    """
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header is not None else None
+    if raw_token is None and allow_query_token and request.GET.get('token'):
+        raw_token = request.GET['token'].encode()
+    if raw_token is None:
+        raise exceptions.NotAuthenticated()
+    token = _jwt.get_validated_token(raw_token)
+
+    try:
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+
+    queryset = User.objects.all() if queryset is None else queryset
+    user = await queryset.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+    if user is None:
+        raise exceptions.AuthenticationFailed("User not found", code='user_not_found')
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed("User is inactive", code='user_inactive')
+    return user, token
+
+
+def async_api_view(user_queryset=None):
+    """
+    Decorator for read-only async endpoints that sit beside the DRF viewsets.
+
+    The wrapped view gets a DRF Request (so query_params, viewset helpers and
+    paginators work unchanged) for an authenticated user, and API exceptions
+    become the same JSON error bodies DRF sends. `user_queryset` is a callable
+    returning the queryset the user is loaded from.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'},
+                                    status=status.HTTP_405_METHOD_NOT_ALLOWED)
+            try:
+                user, token = await authenticate(request, user_queryset() if user_queryset else None)
+                drf_request = Request(request, authenticators=[ForcedAuthentication(user, token)])
+                return await view(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+        return wrapper
+    return decorator
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    response = JsonResponse(detail, status=exc.status_code, safe=False)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = _jwt.authenticate_header(None)
+    return response
+
+
+def viewset_for(viewset_class, request, action, **kwargs):
+    """An initialized viewset instance, for reusing its get_queryset/get_serializer from an async view."""
+    view = viewset_class(request=request, args=(), kwargs=kwargs, action=action, format_kwarg=None)
+    view.headers = {}
+    return view
@@ -0,0 +1,58 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def _timestamp(value):
+    return timegm(value.utctimetuple()) if value else None
+
+
+def _validator_aggregates(aggregates):
+    return {'count': Count('pk'), 'updated_at': Max('updated_at'), 'pk_sum': Sum('pk'), **(aggregates or {})}
+
+
+def _etag(stats, parts):
+    return make_etag(*(stats[key] for key in sorted(stats)), *parts)
+
+
+def queryset_etag(queryset, *parts, aggregates=None):
+    """
+    ETag for a list, from one aggregate over the rows it would return: the
+    row count, the newest updated_at and the sum of primary keys (so swapping
+    one row for another also changes the tag). `aggregates` adds more, for
+    columns that change without touching updated_at.
+
+    Lists get no Last-Modified: deleted rows, rows leaving a filter and lost
+    access don't move any timestamp, so If-Modified-Since alone would be
+    answered with a stale 304.
+    """
+    stats = queryset.order_by().aggregate(**_validator_aggregates(aggregates))
+    return _etag(stats, parts)
+
+
+async def aqueryset_etag(queryset, *parts, aggregates=None):
+    """queryset_etag for async views."""
+    stats = await queryset.order_by().aaggregate(**_validator_aggregates(aggregates))
+    return _etag(stats, parts)
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 response if the request's validators still match, else None."""
+    response = get_conditional_response(request, etag=etag, last_modified=_timestamp(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    return response
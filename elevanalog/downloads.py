@@ -0,0 +1,122 @@
+import re
+from calendar import timegm
+from urllib.parse import quote
+
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header, parse_http_date_safe
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    The inclusive (start, end) byte range a Range header asks for, or None to
+    send the whole file (no header, a malformed one, or several ranges, which
+    we don't serve as multipart). Raises RangeNotSatisfiable when the range
+    lies outside the file.
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = min(int(last), size - 1) if last else size - 1
+    if end < start:
+        # e.g. bytes=10-5, which is invalid rather than unsatisfiable
+        return None
+    return start, end
+
+
+def _range_applies(request, etag, last_modified):
+    # If-Range: only honour Range when the client's copy is still current
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag and not etag.startswith('W/')
+    if last_modified is None:
+        return False
+    return parse_http_date_safe(if_range) == timegm(last_modified.utctimetuple())
+
+
+class _Slice:
+    """The next `length` bytes of an open file, as a file-like object for FileResponse."""
+
+    def __init__(self, file, length):
+        self._file = file
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def file_response(request, file, size, content_type, filename, etag=None, last_modified=None):
+    """
+    Stream an open binary file, honouring a single-range Range header (and
+    If-Range). Whole files are handed to the server's wsgi.file_wrapper, so
+    servers that support it (gunicorn) send them with sendfile().
+    """
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except RangeNotSatisfiable:
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is not None and not _range_applies(request, etag, last_modified):
+        byte_range = None
+
+    if byte_range is None:
+        response = FileResponse(file, as_attachment=True, filename=filename, content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(_Slice(file, end - start + 1), status=206, as_attachment=True,
+                                filename=filename, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def offload_response(mode, target, content_type, filename):
+    """
+    An empty response telling the front server to send the file itself:
+    mode 'x-accel-redirect' (nginx, `target` is an internal URI) or
+    'x-sendfile' (Apache/lighttpd, `target` is a filesystem path). The server
+    then handles Range and streams with sendfile().
+    """
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(target)
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = target
+    else:
+        raise ValueError(f"Unknown offload mode {mode!r}.")
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
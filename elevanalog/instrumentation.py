@@ -0,0 +1,266 @@
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger('elevanalog.requests')
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """What one request cost. Filled in by the hooks below while it's the current request."""
+
+    def __init__(self):
+        self.view_name = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self._serializer_depth = 0
+
+    def as_dict(self):
+        return {
+            'view': self.view_name,
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'serializer_ms': round(self.serializer_time * 1000, 2),
+            'render_ms': round(self.render_time * 1000, 2),
+            'total_ms': round(self.total_time * 1000, 2),
+        }
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def _install_query_hook(sender=None, connection=None, **kwargs):
+    # Every connection, whichever thread opens it, so queries that async views
+    # run through sync_to_async are counted too (the context var follows them)
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _install_on_open_connections():
+    # connection_created has already fired for connections opened before this
+    # module was imported (system checks, the test database)
+    for connection in connections.all(initialized_only=True):
+        _install_query_hook(connection=connection)
+
+
+connection_created.connect(_install_query_hook, dispatch_uid='elevanalog.instrumentation')
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin adding the time spent in to_representation to the
+    current request's serializer time. Put it on the serializers views
+    return; nested ones are counted as part of their parent. Lists are timed
+    item by item, through the child serializer.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics._serializer_depth:
+            return super().to_representation(instance)
+        metrics._serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics._serializer_depth -= 1
+            metrics.serializer_time += time.perf_counter() - started
+
+
+class MetricsRegistry:
+    """In-process totals per view name, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, metrics, status_code):
+        with self._lock:
+            view = self._views.setdefault(metrics.view_name, {
+                'requests': {}, 'queries': 0, 'db_time': 0.0, 'serializer_time': 0.0, 'render_time': 0.0,
+                'duration_sum': 0.0, 'duration_buckets': [0] * len(DURATION_BUCKETS), 'count': 0,
+            })
+            view['requests'][status_code] = view['requests'].get(status_code, 0) + 1
+            view['queries'] += metrics.queries
+            view['db_time'] += metrics.db_time
+            view['serializer_time'] += metrics.serializer_time
+            view['render_time'] += metrics.render_time
+            view['duration_sum'] += metrics.total_time
+            view['count'] += 1
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if metrics.total_time <= bound:
+                    view['duration_buckets'][index] += 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        with self._lock:
+            views = {name: {**data, 'requests': dict(data['requests'])} for name, data in self._views.items()}
+        lines = [
+            '# TYPE http_requests_total counter',
+            '# TYPE http_request_db_queries_total counter',
+            '# TYPE http_request_db_seconds_total counter',
+            '# TYPE http_request_serializer_seconds_total counter',
+            '# TYPE http_request_render_seconds_total counter',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for name in sorted(views):
+            data = views[name]
+            label = f'view="{_escape(name)}"'
+            for status_code in sorted(data['requests']):
+                lines.append(f'http_requests_total{{{label},status="{status_code}"}} {data["requests"][status_code]}')
+            lines.append(f'http_request_db_queries_total{{{label}}} {data["queries"]}')
+            lines.append(f'http_request_db_seconds_total{{{label}}} {data["db_time"]:.6f}')
+            lines.append(f'http_request_serializer_seconds_total{{{label}}} {data["serializer_time"]:.6f}')
+            lines.append(f'http_request_render_seconds_total{{{label}}} {data["render_time"]:.6f}')
+            for bound, count in zip(DURATION_BUCKETS, data['duration_buckets']):
+                lines.append(f'http_request_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{label},le="+Inf"}} {data["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{{label}}} {data["duration_sum"]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{label}}} {data["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class InstrumentationMiddleware:
+    """
+    Records query count, DB time, serializer time (of serializers with
+    TimedSerializerMixin), render time and total time for every
+    request, keyed by the resolved URL name (e.g. task-list, task-my-today).
+    Each request is logged as one JSON line on the 'elevanalog.requests'
+    logger and added to the registry behind metrics_view. Requests over their
+    settings.QUERY_BUDGETS entry are logged as warnings.
+
+    The metrics are also attached to the response as `request_metrics`, which
+    QueryBudgetTestMixin reads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        _install_on_open_connections()
+        metrics, token, started = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics, token, started = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, started)
+
+    def process_template_response(self, request, response):
+        # Runs last of the template response hooks (this middleware comes
+        # first), so the time to the post-render callback is the rendering
+        # of the response body, e.g. a DRF Response's JSON
+        metrics = _current.get()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def _start(self):
+        metrics = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    def _finish(self, request, response, metrics, started):
+        # Streaming responses are timed up to their headers only
+        metrics.total_time = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            metrics.view_name = 'unresolved'
+        else:
+            metrics.view_name = match.url_name or match.route or match.view_name
+        registry.observe(metrics, response.status_code)
+
+        record = {**metrics.as_dict(), 'method': request.method, 'status': response.status_code}
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(metrics.view_name)
+        if budget is not None and metrics.queries > budget:
+            record['query_budget'] = budget
+            logger.warning(json.dumps(record), extra={'metrics': record})
+        else:
+            logger.info(json.dumps(record), extra={'metrics': record})
+
+        response.request_metrics = metrics
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of the registry. Totals are per process, so
+    scrape each worker. Requires `Authorization: Bearer <METRICS_TOKEN>`; the
+    endpoint doesn't exist when METRICS_TOKEN is unset.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        raise Http404
+    if request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
+
+
+class QueryBudgetTestMixin:
+    """
+    TestCase mixin: declare `query_budgets = {'task-list': 8, ...}` and call
+    assertWithinQueryBudget(response) on responses from self.client. Fails
+    when the endpoint ran more queries than its budget, or has none declared.
+    """
+    query_budgets = {}
+
+    def assertWithinQueryBudget(self, response):
+        metrics = getattr(response, 'request_metrics', None)
+        if metrics is None:
+            self.fail("Response has no request metrics; is InstrumentationMiddleware installed?")
+        budget = self.query_budgets.get(metrics.view_name)
+        if budget is None:
+            self.fail(f"No query budget declared for {metrics.view_name!r}.")
+        if metrics.queries > budget:
+            self.fail(f"{metrics.view_name} ran {metrics.queries} queries, over its budget of {budget}.")
@@ -0,0 +1,249 @@
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import F, Q
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over (ordering field, id).
+
+    Unlike DRF's CursorPagination, the cursor stores both the ordering value and
+    the primary key, so pages stay stable however many rows share a due date or
+    creation time. The ordering comes from the view's OrderingFilter (first term
+    only) when present, else search rank for searched querysets. Nullable fields
+    sort their NULLs after everything else.
+
+    Pass ?include_count=true to get a total; it is cached per user and filter
+    set so paging through a list doesn't re-run COUNT(*) on every page.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'include_count'
+    default_ordering = '-created_at'
+    count_cache_timeout = 60
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self._setup(queryset, request, view)
+        self.count = self.get_count(queryset, request) if self._wants_count(request) else None
+        results = list(self.get_page_queryset(queryset))
+        return self.build_page(results)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views, reading through the async ORM."""
+        self._setup(queryset, request, view)
+        self.count = await self.aget_count(queryset, request) if self._wants_count(request) else None
+        # aiterator() only runs prefetch_related lookups when given a chunk size
+        page = self.get_page_queryset(queryset).aiterator(chunk_size=self.page_size + 1)
+        results = [obj async for obj in page]
+        return self.build_page(results)
+
+    def _setup(self, queryset, request, view):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field, self.reverse = self.get_ordering(request, queryset, view)
+        self.nullable = self._is_nullable(queryset.model, self.field)
+        self.cursor = self.decode_cursor(request, queryset.model)
+
+    def _wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def get_page_queryset(self, queryset):
+        """
+        The ordered, filtered and sliced queryset for the current cursor.
+        Kept separate from evaluation so async views can iterate it themselves.
+        """
+        backwards = bool(self.cursor and self.cursor['previous'])
+        reverse = self.reverse != backwards
+        # Reading backwards walks the forward order in reverse, so NULLs come first.
+        nulls_last = not backwards
+
+        nulls = {}
+        if self.nullable:
+            nulls = {'nulls_last': True} if nulls_last else {'nulls_first': True}
+        expression = F(self.field)
+        if reverse:
+            order = [expression.desc(**nulls), '-id']
+        else:
+            order = [expression.asc(**nulls), 'id']
+        queryset = queryset.order_by(*order)
+
+        if self.cursor:
+            queryset = queryset.filter(self._after(self.cursor['value'], self.cursor['pk'], reverse, nulls_last))
+        return queryset[:self.page_size + 1]
+
+    def build_page(self, results):
+        backwards = bool(self.cursor and self.cursor['previous'])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if backwards:
+            results.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = self.cursor is not None, has_more
+
+        self.first_item = results[0] if results else None
+        self.last_item = results[-1] if results else None
+        return results
+
+    def _after(self, value, pk, reverse, nulls_last):
+        field = self.field
+        cmp = 'lt' if reverse else 'gt'
+        if value is None:
+            after = Q(**{f'{field}__isnull': True, f'id__{cmp}': pk})
+            if not nulls_last:
+                after |= Q(**{f'{field}__isnull': False})
+            return after
+
+        after = Q(**{f'{field}__{cmp}': value}) | Q(**{field: value, f'id__{cmp}': pk})
+        if nulls_last and self.nullable:
+            after |= Q(**{f'{field}__isnull': True})
+        return after
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        if view is not None:
+            for backend in getattr(view, 'filter_backends', []):
+                if issubclass(backend, OrderingFilter):
+                    ordering = backend().get_ordering(request, queryset, view)
+                    break
+            else:
+                ordering = getattr(view, 'ordering', None)
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        if ordering:
+            term = ordering[0]
+        elif 'search_rank' in queryset.query.annotations:
+            # Full-text search results come best match first
+            term = '-search_rank'
+        else:
+            term = self.default_ordering
+        return term.lstrip('-'), term.startswith('-')
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def _count_key(self, request):
+        params = sorted(
+            (key, value) for key, value in request.query_params.lists()
+            if key not in (self.cursor_query_param, self.page_size_query_param, self.count_query_param)
+        )
+        digest = hashlib.md5(json.dumps([request.path, params]).encode()).hexdigest()
+        return f'keyset-count:{request.user.pk}:{digest}'
+
+    def get_count(self, queryset, request):
+        return cache.get_or_set(self._count_key(request), queryset.count, self.count_cache_timeout)
+
+    async def aget_count(self, queryset, request):
+        key = self._count_key(request)
+        count = await cache.aget(key)
+        if count is None:
+            count = await queryset.acount()
+            await cache.aset(key, count, self.count_cache_timeout)
+        return count
+
+    def _is_nullable(self, model, field):
+        try:
+            return model._meta.get_field(field).null
+        except FieldDoesNotExist:
+            return False
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            cursor = {
+                'value': self._parse_value(model, data['v']),
+                'pk': int(data['pk']),
+                'previous': bool(data.get('p')),
+            }
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _parse_value(self, model, value):
+        if value is None:
+            return None
+        try:
+            field = model._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            return value
+        if isinstance(field, models.DateTimeField):
+            parsed = parse_datetime(value)
+        elif isinstance(field, models.DateField):
+            parsed = parse_date(value)
+        else:
+            return value
+        if parsed is None:
+            raise ValueError(value)
+        return parsed
+
+    def encode_cursor(self, obj, previous):
+        value = getattr(obj, self.field)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        data = {'v': value, 'pk': obj.pk}
+        if previous:
+            data['p'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_item is None:
+            return None
+        return self.encode_cursor(self.last_item, previous=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_item is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first_item, previous=True)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,75 @@
+from functools import lru_cache
+
+from rest_framework import serializers
+
+
+def _relation(model, name):
+    # Forward relations by field name, reverse ones by accessor (e.g. membership_set)
+    for field in model._meta.get_fields():
+        if not field.is_relation:
+            continue
+        if field.auto_created and not field.concrete:
+            if field.get_accessor_name() == name:
+                return field
+        elif field.name == name:
+            return field
+    return None
+
+
+def _is_to_many(relation):
+    return relation.many_to_many or relation.one_to_many
+
+
+def _walk(serializer, model, prefix, in_prefetch, select, prefetch):
+    # Explicit declarations, for relations read by method fields or properties
+    meta = getattr(serializer, 'Meta', None)
+    for name in getattr(meta, 'select_related', ()):
+        relation = _relation(model, name)
+        if relation is None:
+            continue
+        if in_prefetch or _is_to_many(relation):
+            prefetch.add(prefix + name)
+        else:
+            select.add(prefix + name)
+    for name in getattr(meta, 'prefetch_related', ()):
+        if _relation(model, name.split('__')[0]) is not None:
+            prefetch.add(prefix + name)
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        if not isinstance(child, serializers.ModelSerializer):
+            continue
+        relation = _relation(model, field.source)
+        if relation is None:
+            continue
+        path = prefix + field.source
+        to_many = _is_to_many(relation)
+        if in_prefetch or to_many:
+            prefetch.add(path)
+        else:
+            select.add(path)
+        _walk(child, relation.related_model, path + '__', in_prefetch or to_many, select, prefetch)
+
+
+@lru_cache(maxsize=None)
+def prefetch_plan(serializer_class):
+    """
+    Derive (select_related, prefetch_related) lookups from a serializer's nested
+    serializers, plus any `select_related` / `prefetch_related` lists declared on
+    the Meta of the serializers involved. Relations the model doesn't have (e.g.
+    an app that isn't installed) are skipped.
+    """
+    select, prefetch = set(), set()
+    _walk(serializer_class(), serializer_class.Meta.model, '', False, select, prefetch)
+    return tuple(sorted(select)), tuple(sorted(prefetch))
+
+
+def apply_prefetch_plan(queryset, serializer_class):
+    select, prefetch = prefetch_plan(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class InProcessBroker:
+    """
+    Publish/subscribe between code running in this process. Messages are
+    wake-ups rather than data: each subscriber's queue holds at most one
+    pending message, so a burst of publishes coalesces into a single wake-up
+    and a slow reader never builds a backlog.
+
+    publish() may be called from any thread; subscribers live on an event loop.
+    Only reaches subscribers in the same process, so deployments with more
+    than one web process should use RedisBroker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # channel -> {(loop, queue)}
+
+    def publish(self, channel, message=''):
+        self.publish_many([channel], message)
+
+    def publish_many(self, channels, message=''):
+        for channel in channels:
+            self._deliver(channel, message)
+
+    def _deliver(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        """Async context manager yielding a queue that receives the channel's messages."""
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=1))
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(entry)
+        try:
+            await self._subscribed(channel)
+            yield entry[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(entry)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    async def _subscribed(self, channel):
+        pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass  # a wake-up is already pending
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Redis-backed broker for multi-process deployments. Publishes go to Redis;
+    each process keeps one pattern subscription and hands messages to its
+    local subscribers, so idle clients don't each hold a Redis connection.
+    """
+    prefix = 'pubsub:'
+
+    def __init__(self, url=None):
+        super().__init__()
+        import redis
+
+        self.url = url or settings.PUBSUB_REDIS_URL
+        self._client = redis.Redis.from_url(self.url)
+        self._listeners = {}  # event loop -> listener task
+
+    def publish_many(self, channels, message=''):
+        pipeline = self._client.pipeline(transaction=False)
+        for channel in channels:
+            pipeline.publish(self.prefix + channel, message)
+        pipeline.execute()
+
+    async def _subscribed(self, channel):
+        loop = asyncio.get_running_loop()
+        listener = self._listeners.get(loop)
+        # (Re)start the listener if this loop has none or it died with its connection
+        if listener is None or listener.done():
+            self._listeners[loop] = loop.create_task(self._listen())
+
+    async def _listen(self):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.psubscribe(self.prefix + '*')
+        try:
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                channel = message['channel'].decode()[len(self.prefix):]
+                data = message['data']
+                self._deliver(channel, data.decode() if isinstance(data, bytes) else data)
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """The broker named by settings.PUBSUB_BROKER, shared by the whole process."""
+    return import_string(settings.PUBSUB_BROKER)()
@@ -0,0 +1,44 @@
+import re
+
+from django.db import models
+from django.db.models import Lookup
+
+SEARCH_CONFIG = 'english'
+
+
+class SearchVectorField(models.Field):
+    """
+    A tsvector column on Postgres. Other databases get a plain text column that
+    is never written, so models using it still migrate and run under SQLite;
+    search code checks connection.vendor and falls back to icontains there.
+
+    Defined here rather than imported from django.contrib.postgres so that
+    loading the models doesn't require a Postgres driver.
+    """
+    description = "PostgreSQL tsvector"
+
+    def db_type(self, connection):
+        return 'tsvector' if connection.vendor == 'postgresql' else 'text'
+
+
+@SearchVectorField.register_lookup
+class Matches(Lookup):
+    # search_vector__matches=SearchQuery(...), i.e. vector @@ query
+    lookup_name = 'matches'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} @@ {rhs}', (*lhs_params, *rhs_params)
+
+
+def search_terms(text):
+    """Words of a search string, stripped of anything tsquery would parse as an operator."""
+    return re.findall(r'\w+', text or '')
+
+
+def prefix_tsquery(terms):
+    # Every term must match, the last one as a prefix so results update as the user types
+    if not terms:
+        return ''
+    return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
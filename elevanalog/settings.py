@@ -54,9 +54,11 @@ INSTALLED_APPS = [
     'teams',
     'organizations',
     'accountability',
+    'activity',
 ]
 
 MIDDLEWARE = [
+    'elevanalog.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -168,6 +170,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # List endpoints opt into elevanalog.pagination.KeysetPagination per view
 }
 
 SIMPLE_JWT = {
@@ -245,8 +248,81 @@ FRONTEND_DOMAIN = os.getenv("FRONTEND_DOMAIN", "http://localhost:3000")
 
 
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
+
+# Response caches (tasks.cache) and other shared caches live in the same Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://localhost:6379/1'),
+    }
+}
 CELERY_RESULT_BACKEND = 'django-db'
 
+# Live update wake-ups (elevanalog.pubsub). Activity is published from Celery
+# workers, so the broker has to reach other processes; InProcessBroker only
+# suits running everything in one process (e.g. tests with eager Celery).
+PUBSUB_BROKER = os.environ.get('PUBSUB_BROKER', 'elevanalog.pubsub.RedisBroker')
+PUBSUB_REDIS_URL = os.environ.get('PUBSUB_REDIS_URL', 'redis://localhost:6379/2')
+
+# Task attachments (tasks.attachments). Uploads are chunked through
+# ATTACHMENT_UPLOAD_STORAGE; S3UploadStorage lets clients send parts straight
+# to the bucket, LocalUploadStorage writes under MEDIA_ROOT.
+ATTACHMENT_UPLOAD_STORAGE = os.environ.get('ATTACHMENT_UPLOAD_STORAGE', 'elevanalog.uploads.LocalUploadStorage')
+ATTACHMENT_S3_BUCKET = os.environ.get('ATTACHMENT_S3_BUCKET')
+ATTACHMENT_S3_ENDPOINT_URL = os.environ.get('ATTACHMENT_S3_ENDPOINT_URL')
+ATTACHMENT_MAX_SIZE = int(os.environ.get('ATTACHMENT_MAX_SIZE', 5 * 1024 * 1024))
+# S3 requires parts of at least 5 MB, except the last
+ATTACHMENT_PART_SIZE = int(os.environ.get('ATTACHMENT_PART_SIZE', 5 * 1024 * 1024))
+# Seconds before tasks.tasks.expire_attachment_uploads gives up on a pending
+# upload with no new parts, and on one still processing
+ATTACHMENT_UPLOAD_EXPIRY = int(os.environ.get('ATTACHMENT_UPLOAD_EXPIRY', 24 * 60 * 60))
+ATTACHMENT_PROCESSING_TIMEOUT = int(os.environ.get('ATTACHMENT_PROCESSING_TIMEOUT', 60 * 60))
+
+# Attachment downloads from LocalUploadStorage: '' streams from the worker,
+# 'x-accel-redirect' hands the file to nginx (an internal location serving
+# MEDIA_ROOT at ATTACHMENT_ACCEL_REDIRECT_PREFIX), 'x-sendfile' to Apache.
+ATTACHMENT_SENDFILE = os.environ.get('ATTACHMENT_SENDFILE', '')
+ATTACHMENT_ACCEL_REDIRECT_PREFIX = os.environ.get('ATTACHMENT_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Request instrumentation (elevanalog.instrumentation). /metrics serves the
+# Prometheus text format to callers presenting METRICS_TOKEN; unset disables it.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Queries a single request to these endpoints is expected to need; requests
+# over budget are logged as warnings. Tests hold the same endpoints to budgets
+# through QueryBudgetTestMixin.
+QUERY_BUDGETS = {
+    'task-list': 8,
+    'task-detail': 8,
+    'task-my-today': 8,
+    'task-summary': 4,
+    'user-me': 4,
+    'activity-list': 6,
+    'accountability-partner-list': 4,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        # Request records are already JSON lines
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'elevanalog.requests': {
+            'handlers': ['requests'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# How far ahead recurring tasks are created as real tasks (see tasks.recurrence)
+RECURRENCE_HORIZON_DAYS = int(os.environ.get('RECURRENCE_HORIZON_DAYS', 14))
+
 CELERY_BEAT_SCHEDULE = {
     'generate-organization-reports-weekly': {
         'task': 'reports.tasks.generate_organization_report',
@@ -257,6 +333,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'users.tasks.check_expired_trials',
         'schedule': crontab(hour=0, minute=0),
     },
+    'reconcile-task-counters-nightly': {
+        'task': 'tasks.tasks.reconcile_task_counters',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'materialize-recurring-tasks-hourly': {
+        'task': 'tasks.tasks.materialize_recurring_tasks',
+        'schedule': crontab(minute=15),
+    },
+    'expire-attachment-uploads-hourly': {
+        'task': 'tasks.tasks.expire_attachment_uploads',
+        'schedule': crontab(minute=45),
+    },
 }
 
 def setup_beat_schedule(sender, **kwargs):
@@ -0,0 +1,12 @@
+from .settings import *
+
+# Tests need neither Redis nor a Celery broker: caches are per process,
+# Celery tasks run inline and pub/sub wake-ups stay in process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+PUBSUB_BROKER = 'elevanalog.pubsub.InProcessBroker'
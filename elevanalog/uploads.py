@@ -0,0 +1,222 @@
+import hashlib
+import os
+import shutil
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils.http import content_disposition_header
+from django.utils.module_loading import import_string
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class UploadStorage:
+    """
+    Where uploaded file bytes go. Uploads are multipart: start() opens one,
+    each part is sent separately and complete() assembles them under `key`.
+
+    Storages with direct_parts hand clients a URL per part from part_url();
+    the rest receive parts through write_part(), which the API calls with the
+    request body.
+    """
+    direct_parts = False
+
+    def start(self, key):
+        """Open a multipart upload for `key`, returning its upload id."""
+        raise NotImplementedError
+
+    def part_url(self, key, upload_id, number, expires):
+        raise NotImplementedError
+
+    def write_part(self, key, upload_id, number, stream):
+        """Store part `number` read from a file-like `stream`, returning its ETag."""
+        raise NotImplementedError
+
+    def complete(self, key, upload_id, parts):
+        """Assemble the [(number, etag), ...] parts into the object at `key`."""
+        raise NotImplementedError
+
+    def abort(self, key, upload_id):
+        raise NotImplementedError
+
+    def save(self, key, stream):
+        """Store a whole file read from `stream` in one go, for content already in hand."""
+        raise NotImplementedError
+
+    def open(self, key):
+        """A binary file-like object for reading the object at `key`."""
+        raise NotImplementedError
+
+    def size(self, key):
+        raise NotImplementedError
+
+    def download_url(self, key, filename, expires):
+        """A URL clients can download the object from directly, or None to serve it ourselves."""
+        return None
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class LocalUploadStorage(UploadStorage):
+    """
+    Filesystem storage under MEDIA_ROOT, so completed objects are also
+    readable through the default FileSystemStorage. Parts go through the API,
+    which makes this a stand-in for development and tests.
+    """
+
+    def __init__(self, location=None):
+        self._location = location
+
+    @property
+    def location(self):
+        # Read per call so MEDIA_ROOT overrides (e.g. in tests) apply
+        return os.path.abspath(self._location or settings.MEDIA_ROOT or '.')
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.location, key))
+        if not path.startswith(self.location + os.sep):
+            raise ValueError(f"Key {key!r} is outside the storage location.")
+        return path
+
+    def _parts_dir(self, upload_id):
+        return os.path.join(self.location, '.uploads', upload_id)
+
+    def start(self, key):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._parts_dir(upload_id))
+        return upload_id
+
+    def write_part(self, key, upload_id, number, stream):
+        digest = hashlib.md5()
+        with open(os.path.join(self._parts_dir(upload_id), str(number)), 'wb') as f:
+            while chunk := stream.read(COPY_CHUNK_SIZE):
+                digest.update(chunk)
+                f.write(chunk)
+        return digest.hexdigest()
+
+    def complete(self, key, upload_id, parts):
+        parts_dir = self._parts_dir(upload_id)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{upload_id}.partial'
+        with open(partial, 'wb') as out:
+            for number, _ in sorted(parts):
+                with open(os.path.join(parts_dir, str(number)), 'rb') as part:
+                    shutil.copyfileobj(part, out, COPY_CHUNK_SIZE)
+        os.replace(partial, path)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    def abort(self, key, upload_id):
+        shutil.rmtree(self._parts_dir(upload_id), ignore_errors=True)
+
+    def save(self, key, stream):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{uuid.uuid4().hex}.partial'
+        with open(partial, 'wb') as out:
+            shutil.copyfileobj(stream, out, COPY_CHUNK_SIZE)
+        os.replace(partial, path)
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def size(self, key):
+        return os.path.getsize(self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3UploadStorage(UploadStorage):
+    """
+    S3 (or compatible) storage. Clients PUT parts straight to presigned
+    URLs, so file bytes never pass through the web workers.
+    """
+    direct_parts = True
+
+    def __init__(self, bucket=None, client=None):
+        import boto3
+
+        self.bucket = bucket or settings.ATTACHMENT_S3_BUCKET
+        self.client = client or boto3.client('s3', endpoint_url=getattr(settings, 'ATTACHMENT_S3_ENDPOINT_URL', None))
+
+    def start(self, key):
+        return self.client.create_multipart_upload(Bucket=self.bucket, Key=key)['UploadId']
+
+    def part_url(self, key, upload_id, number, expires):
+        return self.client.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': self.bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': number},
+            ExpiresIn=expires,
+        )
+
+    def complete(self, key, upload_id, parts):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': etag} for number, etag in sorted(parts)]},
+        )
+
+    def abort(self, key, upload_id):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def save(self, key, stream):
+        self.client.upload_fileobj(stream, self.bucket, key)
+
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body']
+
+    def size(self, key):
+        return self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+
+    def download_url(self, key, filename, expires):
+        # S3 answers Range and conditional requests itself
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket, 'Key': key,
+                'ResponseContentDisposition': content_disposition_header(True, filename),
+            },
+            ExpiresIn=expires,
+        )
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+@lru_cache(maxsize=None)
+def get_upload_storage():
+    """The storage named by settings.ATTACHMENT_UPLOAD_STORAGE, shared by the whole process."""
+    return import_string(settings.ATTACHMENT_UPLOAD_STORAGE)()
+
+
+class UploadStorageFiles(Storage):
+    """
+    A read-only Django Storage over the upload storage, for code that reads
+    files through one (sorl thumbnails of attachments).
+    """
+
+    def __init__(self, storage=None):
+        self.upload_storage = storage or get_upload_storage()
+
+    def _open(self, name, mode='rb'):
+        return File(self.upload_storage.open(name), name=name)
+
+    def _save(self, name, content):
+        raise NotImplementedError("Write through the upload storage instead.")
+
+    def exists(self, name):
+        try:
+            self.upload_storage.size(name)
+        except Exception:
+            return False
+        return True
+
+    def size(self, name):
+        return self.upload_storage.size(name)
@@ -22,10 +22,16 @@ from rest_framework_simplejwt.views import (
 )
 from django.http import JsonResponse
 
+from elevanalog.instrumentation import metrics_view
+
+
+def root_view(request):
+    return JsonResponse({'status': 'ok'})
 
 
 urlpatterns = [
     path('', root_view),
+    path('metrics', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -39,5 +45,6 @@ urlpatterns = [
     path('api/', include('users.urls')),
 
     path('api/', include('teams.urls')),
+    path('api/', include('activity.urls')),
 
 ]
@@ -7,6 +7,8 @@ import sys
 def main():
     """Run administrative tasks."""
     settings_module = 'elevanalog.deployment_settings' if 'RENDER_EXTERNAL_HOSTNAME' in os.environ else 'elevanalog.settings'
+    if sys.argv[1:2] == ['test']:
+        settings_module = 'elevanalog.test_settings'
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
     try:
         from django.core.management import execute_from_command_line
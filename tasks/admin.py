@@ -1,7 +1,12 @@
 from django.contrib import admin
-from .models import Task, TaskComment, TaskAttachment
+from .models import RecurrenceRule, Task, TaskComment, TaskAttachment
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     list_display = ['title', 'owner', 'assignee', 'status', 'due_date']
-    search_fields = ['title', 'owner__username']
\ No newline at end of file
+    search_fields = ['title', 'owner__username']
+
+@admin.register(RecurrenceRule)
+class RecurrenceRuleAdmin(admin.ModelAdmin):
+    list_display = ['template', 'rule', 'dtstart', 'next_occurrence']
+    raw_id_fields = ['template']
@@ -0,0 +1,71 @@
+from django.http import JsonResponse
+from django.utils import timezone
+
+from elevanalog.async_api import async_api_view, viewset_for
+from elevanalog.conditional import aqueryset_etag, not_modified, set_validators
+from .cache import arequest_generation
+from .comments import COMMENT_AGGREGATES
+from .permissions import get_permission_context
+from .views import TaskCommentViewSet, TaskViewSet
+from .visibility import OPEN_STATUSES, due_on
+
+# Async counterparts of the hottest read endpoints, for ASGI deployments.
+# They reuse the viewsets' querysets, filters and serializers; only the I/O
+# goes through the async ORM. Everything a serializer touches must already be
+# loaded (select/prefetch plan, permission roles), because lazy loads raise
+# SynchronousOnlyOperation inside the event loop.
+
+
+async def _task_viewset(request, action):
+    await get_permission_context(request).aload()
+    return viewset_for(TaskViewSet, request, action)
+
+
+async def _validator_parts(request):
+    return request.user.pk, await arequest_generation(request), sorted(request.query_params.lists())
+
+
+@async_api_view()
+async def task_list(request):
+    view = await _task_viewset(request, 'list')
+    queryset = view.filter_queryset(view.get_queryset())
+
+    etag = await aqueryset_etag(
+        queryset, *await _validator_parts(request), aggregates=COMMENT_AGGREGATES
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    paginator = view.paginator
+    page = await paginator.apaginate_queryset(queryset, request, view=view)
+    data = view.get_serializer(page, many=True).data
+    return set_validators(JsonResponse(paginator.get_paginated_response(data).data), etag)
+
+
+@async_api_view()
+async def my_today(request):
+    view = await _task_viewset(request, 'my_today')
+    today = timezone.localdate()
+    tasks = view.get_queryset().filter(due_on(today), status__in=OPEN_STATUSES)
+
+    etag = await aqueryset_etag(
+        tasks, today, *await _validator_parts(request), aggregates=COMMENT_AGGREGATES
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    results = [task async for task in tasks.aiterator(chunk_size=500)]
+    data = view.get_serializer(results, many=True).data
+    return set_validators(JsonResponse(data, safe=False), etag)
+
+
+@async_api_view()
+async def comment_list(request, task_pk):
+    view = viewset_for(TaskCommentViewSet, request, 'list', task_pk=task_pk)
+    queryset = view.filter_queryset(view.get_queryset())
+    paginator = view.paginator
+    page = await paginator.apaginate_queryset(queryset, request, view=view)
+    data = view.get_serializer(page, many=True).data
+    return JsonResponse(paginator.get_paginated_response(data).data)
@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import os
+import uuid
+from contextlib import closing
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from elevanalog.uploads import COPY_CHUNK_SIZE, get_upload_storage
+from .models import AttachmentBlob, AttachmentUpload, TaskAttachment
+from .visibility import tasks_for_user
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_CONTENT_TYPES = [
+    'image/jpeg',
+    'image/png',
+    'image/gif',
+    'image/svg+xml',
+    'application/pdf',
+    'text/plain',
+]
+THUMBNAIL_CONTENT_TYPES = ['image/jpeg', 'image/png', 'image/gif']
+SNIFF_BYTES = 2048
+PART_URL_EXPIRES = 60 * 60
+DOWNLOAD_URL_EXPIRES = 5 * 60
+
+_SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+def sniff_content_type(head):
+    """
+    The content type of a file judged from its first bytes, or None when it
+    isn't one of the types attachments accept. The client's claimed type is
+    never consulted.
+    """
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if b'\x00' in head:
+        return None
+    try:
+        text = head.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        # The sample may end mid-character
+        if exc.start < len(head) - 3:
+            return None
+        text = head[:exc.start].decode('utf-8')
+    if '<svg' in text.lower():
+        return 'image/svg+xml'
+    return 'text/plain'
+
+
+def attachment_key(filename):
+    name = get_valid_filename(os.path.basename(filename)) or 'file'
+    return f'task_attachments/{uuid.uuid4().hex}/{name[-100:]}'
+
+
+def part_count(size):
+    return max(-(-size // settings.ATTACHMENT_PART_SIZE), 1)
+
+
+def attach(task, user_id, blob, filename):
+    """
+    A TaskAttachment for content that is already stored; the blob's
+    ref_count follows through tasks.signals. Call with the blob locked.
+    """
+    thumbnail_url = blob.attachments.exclude(thumbnail_url='').values_list('thumbnail_url', flat=True).first()
+    return TaskAttachment.objects.create(
+        task=task, blob=blob, file=blob.key, uploaded_by_id=user_id, filename=filename[:255],
+        content_type=blob.content_type, size=blob.size, thumbnail_url=thumbnail_url or '',
+    )
+
+
+def start_upload(task, permissions, filename, size, sha256=''):
+    """
+    Open an upload for the user of a TaskPermissionContext. When the client
+    declared a SHA-256 whose content is already attached to a task the user
+    can see, the attachment is created right away and the upload comes back
+    complete, with no bytes to send. Anything else is uploaded in full and
+    deduplicated by finish_upload once its hash is known, so a bare hash
+    never grants access to content.
+    """
+    user = permissions.user
+    if sha256:
+        with transaction.atomic():
+            # The lock keeps gc_attachment_blobs off the blob until it is referenced
+            blob = AttachmentBlob.objects.select_for_update().filter(
+                pk__in=AttachmentBlob.objects.filter(
+                    sha256=sha256, attachments__task__in=tasks_for_user(permissions)
+                ).values('pk')
+            ).first()
+            if blob is not None:
+                return AttachmentUpload.objects.create(
+                    task=task, uploaded_by=user, filename=filename[:255], size=blob.size, sha256=sha256,
+                    key=blob.key, status='complete', attachment=attach(task, user.pk, blob, filename),
+                )
+
+    storage = get_upload_storage()
+    key = attachment_key(filename)
+    return AttachmentUpload.objects.create(
+        task=task, uploaded_by=user, filename=filename[:255], size=size, sha256=sha256, key=key,
+        upload_id=storage.start(key),
+    )
+
+
+def store_attachment(task, user, uploaded_file):
+    """
+    Attach a file received inline with a request, storing its content only
+    if no identical content is stored yet.
+    """
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    sha256 = digest.hexdigest()
+
+    with transaction.atomic():
+        blob = AttachmentBlob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is None:
+            key = attachment_key(uploaded_file.name)
+            uploaded_file.seek(0)
+            get_upload_storage().save(key, uploaded_file)
+            blob = _get_or_create_blob(sha256, key, uploaded_file.size, uploaded_file.content_type)
+        return attach(task, user.pk, blob, uploaded_file.name)
+
+
+def _get_or_create_blob(sha256, key, size, content_type):
+    # Locked; when another writer stored the same content first, ours is dropped
+    blob, created = AttachmentBlob.objects.select_for_update().get_or_create(
+        sha256=sha256, defaults={'key': key, 'size': size, 'content_type': content_type},
+    )
+    if not created:
+        transaction.on_commit(lambda: get_upload_storage().delete(key))
+    return blob
+
+
+def _read_object(storage, key):
+    """(SHA-256 hex digest, first SNIFF_BYTES) of a stored object, read in one pass."""
+    digest = hashlib.sha256()
+    head = b''
+    with closing(storage.open(key)) as f:
+        while chunk := f.read(COPY_CHUNK_SIZE):
+            if len(head) < SNIFF_BYTES:
+                head += chunk[:SNIFF_BYTES - len(head)]
+            digest.update(chunk)
+    return digest.hexdigest(), head
+
+
+def part_urls(upload, api_url):
+    """
+    [{'number', 'url'}] for each part of the upload: presigned storage URLs
+    when the storage takes parts directly, otherwise `api_url(number)`.
+    """
+    storage = get_upload_storage()
+    return [
+        {'number': number, 'url': storage.part_url(upload.key, upload.upload_id, number, PART_URL_EXPIRES)
+         if storage.direct_parts else api_url(number)}
+        for number in range(1, part_count(upload.size) + 1)
+    ]
+
+
+def finish_upload(upload_pk):
+    """
+    Assemble an upload whose parts are all in, check its size, hash and
+    sniffed content type, and turn it into a TaskAttachment. Content that is
+    already stored is deduplicated: the assembled copy is deleted and the
+    attachment points at the existing blob. New images get a thumbnail.
+    Runs in tasks.tasks.process_attachment_upload, never in a web worker.
+    """
+    upload = AttachmentUpload.objects.select_related('task').filter(
+        pk=upload_pk, status='processing').first()
+    if upload is None:
+        return None
+    storage = get_upload_storage()
+
+    try:
+        storage.complete(upload.key, upload.upload_id, [(part['number'], part['etag']) for part in upload.parts])
+        size = storage.size(upload.key)
+        sha256, head = _read_object(storage, upload.key)
+    except Exception:
+        logger.exception("Assembling attachment upload %s failed", upload.pk)
+        return _fail(upload, "The upload could not be assembled.")
+    content_type = sniff_content_type(head)
+
+    error = None
+    if upload.sha256 and sha256 != upload.sha256:
+        error = "The uploaded content doesn't match its declared SHA-256."
+    elif size > settings.ATTACHMENT_MAX_SIZE:
+        error = f"File size too large. Maximum size is {settings.ATTACHMENT_MAX_SIZE // (1024 * 1024)}MB."
+    elif content_type not in ALLOWED_CONTENT_TYPES:
+        error = "Unsupported file type. Allowed types are JPG, PNG, GIF, SVG, PDF, and TXT."
+    if error:
+        storage.delete(upload.key)
+        return _fail(upload, error)
+
+    with transaction.atomic():
+        # expire_stale_uploads may have given up on the upload meanwhile
+        if not AttachmentUpload.objects.select_for_update().filter(pk=upload.pk, status='processing').exists():
+            transaction.on_commit(lambda: storage.delete(upload.key))
+            return None
+        blob = _get_or_create_blob(sha256, upload.key, size, content_type)
+        attachment = attach(upload.task, upload.uploaded_by_id, blob, upload.filename)
+        upload.attachment = attachment
+        upload.status = 'complete'
+        upload.save(update_fields=['attachment', 'status', 'updated_at'])
+
+    if content_type in THUMBNAIL_CONTENT_TYPES and not attachment.thumbnail_url:
+        try:
+            thumbnail_url = attachment.build_thumbnail()
+        except Exception:
+            # The attachment is usable without one
+            logger.exception("Thumbnailing attachment %s failed", attachment.pk)
+        else:
+            TaskAttachment.objects.filter(blob=blob, thumbnail_url='').update(thumbnail_url=thumbnail_url)
+    return attachment
+
+
+def _fail(upload, error):
+    upload.status = 'failed'
+    upload.error = error
+    upload.save(update_fields=['status', 'error', 'updated_at'])
+    return None
+
+
+def expire_stale_uploads():
+    """
+    Give up on uploads clients abandoned: pending uploads untouched for
+    ATTACHMENT_UPLOAD_EXPIRY seconds are aborted in storage, and uploads
+    processing for longer than ATTACHMENT_PROCESSING_TIMEOUT (a lost or
+    crashed worker) are failed and their assembled object deleted. Returns
+    (expired, timed out).
+    """
+    storage = get_upload_storage()
+    now = timezone.now()
+
+    expired = 0
+    pending = AttachmentUpload.objects.filter(
+        status='pending', updated_at__lt=now - timedelta(seconds=settings.ATTACHMENT_UPLOAD_EXPIRY),
+    ).values_list('pk', 'key', 'upload_id')
+    for pk, key, upload_id in pending.iterator():
+        # Conditional, so an upload that moved on since isn't touched
+        if AttachmentUpload.objects.filter(pk=pk, status='pending').update(
+                status='failed', error="The upload expired.", updated_at=now):
+            _discard(storage.abort, key, upload_id)
+            expired += 1
+
+    timed_out = 0
+    processing = AttachmentUpload.objects.filter(
+        status='processing', updated_at__lt=now - timedelta(seconds=settings.ATTACHMENT_PROCESSING_TIMEOUT),
+    ).values_list('pk', 'key')
+    for pk, key in processing.iterator():
+        if AttachmentUpload.objects.filter(pk=pk, status='processing').update(
+                status='failed', error="Processing the upload timed out.", updated_at=now):
+            _discard(storage.delete, key)
+            timed_out += 1
+    return expired, timed_out
+
+
+def _discard(operation, *args):
+    try:
+        operation(*args)
+    except Exception:
+        # Storage lifecycle rules catch whatever is left behind
+        logger.exception("Discarding stale upload object %s failed", args[0])
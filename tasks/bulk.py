@@ -0,0 +1,246 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from organizations.models import Organization
+from teams.models import Team
+from .models import Task, TaskComment
+from .permissions import get_permission_context
+from .roles import get_roles_many
+from .signals import comments_written_in_bulk, tasks_written_in_bulk
+from .visibility import visible_tasks
+
+User = get_user_model()
+
+MAX_BULK_OPERATIONS = 500
+MAX_BULK_COMMENTS = 500
+
+
+class BulkOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['create', 'update', 'transition'])
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+
+    def validate(self, attrs):
+        op = attrs['op']
+        if op in ('update', 'transition') and 'id' not in attrs:
+            raise serializers.ValidationError({'id': "This field is required."})
+        if op in ('create', 'update') and 'data' not in attrs:
+            raise serializers.ValidationError({'data': "This field is required."})
+        if op == 'transition' and 'status' not in attrs:
+            raise serializers.ValidationError({'status': "This field is required."})
+        return attrs
+
+
+class BulkCommentSerializer(serializers.Serializer):
+    task = serializers.IntegerField()
+    text = serializers.CharField()
+
+
+class BulkTaskFieldsSerializer(serializers.ModelSerializer):
+    # Plain ids so a batch doesn't run one lookup per related field per item;
+    # BulkTaskWriter checks they exist in aggregate.
+    assignee_id = serializers.IntegerField(required=False, allow_null=True)
+    team_id = serializers.IntegerField(required=False, allow_null=True)
+    organization_id = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Task
+        fields = ['title', 'description', 'status', 'priority', 'due_date', 'is_recurring',
+                  'assignee_id', 'team_id', 'organization_id']
+
+
+def _with_completed_at(values):
+    # completed_at follows status whichever operation sets it
+    if 'status' in values:
+        values['completed_at'] = timezone.now() if values['status'] == 'completed' else None
+    return values
+
+
+class BulkTaskWriter:
+    """
+    Applies a batch of task creates, partial updates and status transitions.
+
+    Every item is validated and permission-checked up front with a fixed number
+    of queries, then all valid items are written with bulk_create/bulk_update in
+    one transaction. Invalid items are reported and skipped.
+    """
+
+    def __init__(self, request):
+        self.user = request.user
+        self.permissions = get_permission_context(request)
+
+    def run(self, operations):
+        items = [self._parse(index, operation) for index, operation in enumerate(operations)]
+        self._load_references([item for item in items if 'errors' not in item])
+
+        to_create, to_update, update_fields = [], {}, set()
+        for item in items:
+            if 'errors' in item:
+                continue
+            errors = self._check(item)
+            if errors:
+                item['errors'] = errors
+                continue
+
+            if item['op'] == 'create':
+                task = Task(owner=self.user, **item['values'])
+                to_create.append(task)
+            else:
+                task = self.tasks[item['id']]
+                for attr, value in item['values'].items():
+                    setattr(task, attr, value)
+                update_fields.update(item['values'])
+                to_update[task.pk] = task
+            task._actor = self.user
+            item['task'] = task
+
+        with transaction.atomic():
+            if to_create:
+                Task.objects.bulk_create(to_create)
+            if to_update:
+                now = timezone.now()
+                for task in to_update.values():
+                    task.updated_at = now
+                Task.objects.bulk_update(list(to_update.values()), sorted(update_fields | {'updated_at'}))
+            tasks_written_in_bulk(created=to_create, updated=list(to_update.values()))
+
+        return [self._result(item) for item in items]
+
+    def _parse(self, index, operation):
+        item = {'index': index}
+        parsed = BulkOperationSerializer(data=operation)
+        if not parsed.is_valid():
+            item.update(op=operation.get('op') if isinstance(operation, dict) else None, errors=parsed.errors)
+            return item
+
+        item.update(op=parsed.validated_data['op'], id=parsed.validated_data.get('id'))
+        if item['op'] == 'transition':
+            item['values'] = _with_completed_at({'status': parsed.validated_data['status']})
+            return item
+
+        fields = BulkTaskFieldsSerializer(data=parsed.validated_data['data'], partial=item['op'] == 'update')
+        if not fields.is_valid():
+            item['errors'] = fields.errors
+            return item
+        item['values'] = _with_completed_at(dict(fields.validated_data))
+        return item
+
+    def _load_references(self, items):
+        task_ids = {item['id'] for item in items if item['op'] != 'create'}
+        self.tasks = {}
+        if task_ids:
+            self.tasks = {
+                task.pk: task for task in visible_tasks(self.permissions.audience).filter(pk__in=task_ids).select_related('team')
+            }
+
+        values = [item['values'] for item in items]
+        assignee_ids = {v['assignee_id'] for v in values if v.get('assignee_id')}
+        team_ids = {v['team_id'] for v in values if v.get('team_id')}
+        org_ids = {v['organization_id'] for v in values if v.get('organization_id')}
+
+        self.user_ids = set(User.objects.filter(pk__in=assignee_ids).values_list('pk', flat=True)) if assignee_ids else set()
+        self.team_ids = set(Team.objects.filter(pk__in=team_ids).values_list('pk', flat=True)) if team_ids else set()
+        self.org_ids = set(Organization.objects.filter(pk__in=org_ids).values_list('pk', flat=True)) if org_ids else set()
+        self.assignee_roles = get_roles_many(self.user_ids)
+
+    def _check(self, item):
+        values = item['values']
+        for field, known in (('assignee_id', self.user_ids), ('team_id', self.team_ids),
+                             ('organization_id', self.org_ids)):
+            if values.get(field) and values[field] not in known:
+                return {field: f'Invalid pk "{values[field]}" - object does not exist.'}
+
+        if item['op'] == 'create':
+            return self._check_create(values)
+
+        task = self.tasks.get(item['id'])
+        if task is None:
+            return {'detail': "Not found."}
+        if task.status == 'completed':
+            return {'detail': "Completed tasks cannot be updated."}
+        if not self.permissions.can_update(task):
+            return {'detail': "You do not have permission to edit this task."}
+        return None
+
+    def _check_create(self, values):
+        # Same rules as TaskViewSet.perform_create
+        assignee_id = values.get('assignee_id')
+        organization_id = values.get('organization_id')
+        if assignee_id and assignee_id != self.user.pk:
+            if not organization_id:
+                return {'detail': "You cannot assign tasks outside of an organization."}
+            creator_role = self.permissions.org_roles.get(organization_id)
+            if creator_role is None or organization_id not in self.assignee_roles[assignee_id][0]:
+                return {'detail': "Both you and the assignee must be members of the organization."}
+            if creator_role not in ['admin', 'manager']:
+                return {'detail': "You must be an admin or manager to assign tasks."}
+        return None
+
+    def _result(self, item):
+        result = {'index': item['index'], 'op': item['op']}
+        if 'errors' in item:
+            result.update(id=item.get('id'), status='error', errors=item['errors'])
+        else:
+            result.update(id=item['task'].pk, status='ok')
+        return result
+
+
+class BulkCommentWriter:
+    """
+    Posts a batch of comments, possibly across many tasks, as one user.
+
+    Permissions for the whole batch are resolved in one pass: the tasks in one
+    query, the user's roles from tasks.roles and accountability partnerships
+    in one more. Allowed comments are written with a single bulk_create;
+    the rest are reported and skipped.
+    """
+
+    def __init__(self, request):
+        self.user = request.user
+        self.permissions = get_permission_context(request)
+
+    def run(self, comments):
+        items = [self._parse(index, comment) for index, comment in enumerate(comments)]
+        valid = [item for item in items if 'errors' not in item]
+        tasks = Task.objects.only('id', 'owner_id', 'organization_id', 'team_id').in_bulk(
+            {item['task_id'] for item in valid}
+        )
+        self.permissions.load_partnerships(tasks)
+
+        to_create = []
+        for item in valid:
+            task = tasks.get(item['task_id'])
+            if task is None:
+                item['errors'] = {'detail': "Not found."}
+            elif not self.permissions.can_comment(task):
+                item['errors'] = {'detail': "You do not have permission to comment on this task."}
+            else:
+                item['comment'] = TaskComment(task=task, author=self.user, text=item['text'])
+                to_create.append(item['comment'])
+
+        if to_create:
+            with transaction.atomic():
+                TaskComment.objects.bulk_create(to_create)
+                comments_written_in_bulk(to_create)
+
+        return [self._result(item) for item in items]
+
+    def _parse(self, index, comment):
+        item = {'index': index}
+        parsed = BulkCommentSerializer(data=comment)
+        if not parsed.is_valid():
+            item.update(task_id=comment.get('task') if isinstance(comment, dict) else None, errors=parsed.errors)
+            return item
+        item.update(task_id=parsed.validated_data['task'], text=parsed.validated_data['text'])
+        return item
+
+    def _result(self, item):
+        result = {'index': item['index'], 'task': item['task_id']}
+        if 'errors' in item:
+            result.update(id=None, status='error', errors=item['errors'])
+        else:
+            result.update(id=item['comment'].pk, status='ok')
+        return result
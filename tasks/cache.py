@@ -0,0 +1,123 @@
+import hashlib
+import json
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.response import Response
+
+from .models import TaskVisibility
+from .permissions import get_permission_context
+
+RESPONSE_CACHE_TIMEOUT = 300
+HITS_KEY = 'tasks:response-cache:hits'
+MISSES_KEY = 'tasks:response-cache:misses'
+
+
+def _generation_key(audience):
+    return f'tasks:generation:{audience}'
+
+
+def get_generation(audience):
+    """
+    Combined cache generation of a user's audience keys (see tasks.visibility).
+    Cached responses are keyed by it, so replacing the generation of any one
+    of those keys makes every earlier response for the user unreachable.
+    """
+    keys = [_generation_key(key) for key in audience]
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        generations.update(cache.get_many(missing))
+    return _combine(keys, generations)
+
+
+async def aget_generation(audience):
+    keys = [_generation_key(key) for key in audience]
+    generations = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        for key in missing:
+            await cache.aadd(key, uuid.uuid4().hex, None)
+        generations.update(await cache.aget_many(missing))
+    return _combine(keys, generations)
+
+
+def _combine(keys, generations):
+    combined = '|'.join(str(generations.get(key)) for key in keys)
+    return hashlib.md5(combined.encode()).hexdigest()
+
+
+def request_generation(request):
+    return get_generation(get_permission_context(request).audience)
+
+
+async def arequest_generation(request):
+    # The permission context must already be loaded (see TaskPermissionContext.aload)
+    return await aget_generation(get_permission_context(request).audience)
+
+
+def invalidate_audiences(audiences):
+    """Start a new generation for each audience key once the current transaction commits."""
+    audiences = set(audiences)
+    if not audiences:
+        return
+    generation = uuid.uuid4().hex
+    transaction.on_commit(
+        lambda: cache.set_many({_generation_key(key): generation for key in audiences}, None)
+    )
+
+
+def invalidate_embedding_tasks(user_ids=(), team_ids=()):
+    """
+    Start new generations for everyone who can see a task that embeds one of
+    these users (as owner or assignee) or teams, whose profile or name
+    changed without any task row changing.
+    """
+    tasks = Q(task__owner_id__in=user_ids) | Q(task__assignee_id__in=user_ids) | Q(task__team_id__in=team_ids)
+    invalidate_audiences(TaskVisibility.objects.filter(tasks).values_list('audience', flat=True).distinct())
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def cached_response(request, view_name, build):
+    """
+    Serve `build()`'s response from the cache for this user and query string.
+    Only successful responses are stored.
+    """
+    user_id = request.user.pk
+    params = sorted(request.query_params.lists())
+    digest = hashlib.md5(json.dumps(params).encode()).hexdigest()
+    key = f'tasks:response:{user_id}:{request_generation(request)}:{view_name}:{digest}'
+
+    data = cache.get(key)
+    if data is not None:
+        _increment(HITS_KEY)
+        return Response(data)
+
+    _increment(MISSES_KEY)
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+    return response
+
+
+def cache_stats():
+    values = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from django.db.models import DateTimeField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .cache import invalidate_audiences
+from .models import Task, TaskComment, TaskVisibility
+
+# Extra ETag aggregates for task lists: comments change these without
+# touching updated_at
+COMMENT_AGGREGATES = {'comments': Sum('comment_count'), 'last_comment_at': Max('last_comment_at')}
+
+
+def _invalidate_tasks(task_ids):
+    invalidate_audiences(TaskVisibility.objects.filter(task_id__in=task_ids).values_list('audience', flat=True))
+
+
+def comments_added(comments):
+    """
+    Count new comments into their tasks' comment_count and last_comment_at
+    with F() updates, one per distinct (number added, newest) pair, so
+    concurrent writers never lose an increment.
+    """
+    added = defaultdict(lambda: (0, None))
+    for comment in comments:
+        count, last = added[comment.task_id]
+        added[comment.task_id] = (count + 1, max(last or comment.created_at, comment.created_at))
+
+    grouped = defaultdict(list)
+    for task_id, key in added.items():
+        grouped[key].append(task_id)
+    for (count, last), task_ids in grouped.items():
+        last = Value(last, output_field=DateTimeField())
+        Task.objects.filter(pk__in=task_ids).update(
+            comment_count=F('comment_count') + count,
+            last_comment_at=Greatest(Coalesce('last_comment_at', last), last),
+        )
+    _invalidate_tasks(list(added))
+
+
+def comment_removed(comment):
+    newest = TaskComment.objects.filter(task=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    Task.objects.filter(pk=comment.task_id).update(
+        comment_count=F('comment_count') - 1, last_comment_at=Subquery(newest)
+    )
+    _invalidate_tasks([comment.task_id])
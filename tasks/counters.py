@@ -0,0 +1,193 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from accountability.models import TaskAccountability
+from teams.models import TeamMembership
+from .models import Task, TaskCounter
+
+# The task_type buckets of tasks.visibility.tasks_for_user, counted per status
+BUCKETS = ['owned_by_me', 'assigned_by_me', 'assigned', 'accountability', 'team']
+STATE_FIELDS = ('id', 'owner_id', 'assignee_id', 'team_id', 'status')
+
+
+def task_state(task):
+    """
+    The fields a task's counters depend on, read without touching the database.
+    None when any of them is deferred, so callers know to fetch it instead.
+    """
+    values = task.__dict__
+    if any(field not in values for field in STATE_FIELDS):
+        return None
+    return tuple(values[field] for field in STATE_FIELDS)
+
+
+def load_states(task_ids):
+    return {
+        state[0]: state
+        for state in Task.objects.filter(pk__in=list(task_ids)).values_list(*STATE_FIELDS)
+    }
+
+
+def _personal(owner_id, assignee_id, status):
+    if assignee_id is None or assignee_id == owner_id:
+        yield owner_id, 'owned_by_me', status
+    else:
+        yield owner_id, 'assigned_by_me', status
+        yield assignee_id, 'assigned', status
+
+
+def task_deltas(changes):
+    """
+    Counter changes for a batch of task writes. `changes` is a list of
+    (state before, state after) pairs from task_state(), with None for a
+    created or deleted task. Partners and team members are read with one
+    query each.
+    """
+    deltas = Counter()
+    task_ids, team_ids = set(), set()
+    for before, after in changes:
+        for state in (before, after):
+            if state is not None:
+                task_ids.add(state[0])
+                if state[3]:
+                    team_ids.add(state[3])
+
+    partners = defaultdict(list)
+    if task_ids:
+        for task_id, partner_id in TaskAccountability.objects.filter(task_id__in=task_ids).values_list(
+                'task_id', 'partner_id'):
+            partners[task_id].append(partner_id)
+    members = defaultdict(list)
+    if team_ids:
+        for team_id, user_id in TeamMembership.objects.filter(team_id__in=team_ids).values_list(
+                'team_id', 'user_id'):
+            members[team_id].append(user_id)
+
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            task_id, owner_id, assignee_id, team_id, status = state
+            for key in _personal(owner_id, assignee_id, status):
+                deltas[key] += sign
+            for partner_id in partners[task_id]:
+                deltas[partner_id, 'accountability', status] += sign
+            for user_id in members[team_id] if team_id else ():
+                deltas[user_id, 'team', status] += sign
+    return deltas
+
+
+def apply_deltas(deltas):
+    """
+    Add the deltas to the stored counters with F() updates, so concurrent
+    writers don't overwrite each other. Keys with the same change are updated
+    together (a team task moving status is one UPDATE for all its members).
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    TaskCounter.objects.bulk_create(
+        [TaskCounter(user_id=user_id, bucket=bucket, status=status) for user_id, bucket, status in deltas],
+        ignore_conflicts=True,
+    )
+    grouped = defaultdict(set)
+    for (user_id, bucket, status), delta in deltas.items():
+        grouped[bucket, status, delta].add(user_id)
+    for (bucket, status, delta), user_ids in grouped.items():
+        TaskCounter.objects.filter(user_id__in=user_ids, bucket=bucket, status=status).update(
+            count=F('count') + delta
+        )
+
+
+def partners_changed(task_id, added=(), removed=()):
+    status = Task.objects.filter(pk=task_id).values_list('status', flat=True).first()
+    if status is None:
+        return
+    deltas = Counter()
+    for partner_id in added:
+        deltas[partner_id, 'accountability', status] += 1
+    for partner_id in removed:
+        deltas[partner_id, 'accountability', status] -= 1
+    apply_deltas(deltas)
+
+
+def count_tasks(user_ids):
+    """Counters for the given users computed from the source tables: {(user_id, bucket, status): count}."""
+    user_ids = list(user_ids)
+    counts = Counter()
+    owned = (
+        Task.objects.filter(owner_id__in=user_ids)
+        .values('owner_id', 'status')
+        .annotate(
+            own=Count('pk', filter=Q(assignee__isnull=True) | Q(assignee=F('owner'))),
+            delegated=Count('pk', filter=Q(assignee__isnull=False) & ~Q(assignee=F('owner'))),
+        )
+    )
+    for row in owned:
+        counts[row['owner_id'], 'owned_by_me', row['status']] += row['own']
+        counts[row['owner_id'], 'assigned_by_me', row['status']] += row['delegated']
+
+    queries = [
+        ('assigned', Task.objects.filter(assignee_id__in=user_ids).exclude(owner=F('assignee')),
+         'assignee_id', 'status'),
+        ('accountability', TaskAccountability.objects.filter(partner_id__in=user_ids),
+         'partner_id', 'task__status'),
+        ('team', TeamMembership.objects.filter(user_id__in=user_ids),
+         'user_id', 'team__tasks__status'),
+    ]
+    for bucket, queryset, user_field, status_field in queries:
+        for row in queryset.values(user_field, status_field).annotate(n=Count('pk')).order_by():
+            # Teams without tasks come back with a NULL status
+            if row[status_field] is not None:
+                counts[row[user_field], bucket, row[status_field]] += row['n']
+    return {key: count for key, count in counts.items() if count}
+
+
+def stored_counts(user_ids):
+    rows = TaskCounter.objects.filter(user_id__in=list(user_ids)).values_list('user_id', 'bucket', 'status', 'count')
+    return {(user_id, bucket, status): count for user_id, bucket, status, count in rows if count}
+
+
+def rebuild_counters(user_ids):
+    """Replace the stored counters of the given users with freshly computed ones."""
+    user_ids = list(user_ids)
+    with transaction.atomic():
+        # Lock the users' rows so concurrent deltas wait for the rebuild
+        list(TaskCounter.objects.select_for_update().filter(user_id__in=user_ids).values_list('pk', flat=True))
+        expected = count_tasks(user_ids)
+        TaskCounter.objects.filter(user_id__in=user_ids).delete()
+        TaskCounter.objects.bulk_create(
+            [TaskCounter(user_id=user_id, bucket=bucket, status=status, count=count)
+             for (user_id, bucket, status), count in expected.items()],
+            batch_size=1000,
+        )
+
+
+def rebuild_team_counters(user_id):
+    # A user's team bucket after joining or leaving a team
+    with transaction.atomic():
+        TaskCounter.objects.filter(user_id=user_id, bucket='team').delete()
+        rows = (
+            TeamMembership.objects.filter(user_id=user_id)
+            .values('team__tasks__status')
+            .annotate(n=Count('pk'))
+            .order_by()
+        )
+        TaskCounter.objects.bulk_create([
+            TaskCounter(user_id=user_id, bucket='team', status=row['team__tasks__status'], count=row['n'])
+            for row in rows if row['team__tasks__status'] is not None
+        ])
+
+
+def summary(user):
+    """{bucket: {status: count, ..., 'total': count}} for every bucket and status, zero-filled."""
+    statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+    result = {bucket: dict.fromkeys(statuses, 0) for bucket in BUCKETS}
+    for bucket, status, count in TaskCounter.objects.filter(user=user).values_list('bucket', 'status', 'count'):
+        if bucket in result:
+            result[bucket][status] = count
+    for counts in result.values():
+        counts['total'] = sum(counts.values())
+    return result
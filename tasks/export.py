@@ -0,0 +1,117 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+from accountability.models import TaskAccountability
+from .models import TaskComment
+
+EXPORT_CHUNK_SIZE = 2000
+
+TASK_FIELDS = ['id', 'title', 'description', 'status', 'priority', 'due_date', 'completed_at',
+               'is_recurring', 'created_at', 'updated_at', 'organization_id', 'team_id']
+
+
+class NDJSONRenderer(BaseRenderer):
+    # Only used for content negotiation; the export view streams its own body.
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode() + b'\n'
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    Honours Accept (and ?format=) when it names an export format, and falls
+    back to NDJSON for anything else, such as the application/json clients
+    send by default, instead of answering 406.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
+
+
+def export_queryset(queryset):
+    """
+    The given tasks with everything an export row needs, in primary key order.
+    iterator() keeps the prefetches, running them once per chunk.
+    """
+    return (
+        queryset
+        .select_related('owner', 'assignee')
+        .prefetch_related(None)
+        .prefetch_related(
+            Prefetch('comments', queryset=TaskComment.objects.select_related('author').order_by('created_at', 'id')),
+            Prefetch('accountability_partnerships',
+                     queryset=TaskAccountability.objects.select_related('partner').order_by('id')),
+        )
+        .order_by('pk')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def _user(user):
+    return {'id': user.pk, 'email': user.email} if user else None
+
+
+def task_record(task):
+    record = {field: getattr(task, field) for field in TASK_FIELDS}
+    record['owner'] = _user(task.owner)
+    record['assignee'] = _user(task.assignee)
+    record['accountability_partners'] = [_user(p.partner) for p in task.accountability_partnerships.all()]
+    record['comments'] = [
+        {'id': c.pk, 'author': _user(c.author), 'text': c.text, 'created_at': c.created_at}
+        for c in task.comments.all()
+    ]
+    return record
+
+
+def ndjson_lines(tasks):
+    encoder = DjangoJSONEncoder()
+    for task in tasks:
+        yield encoder.encode(task_record(task)) + '\n'
+
+
+class _Echo:
+    # csv.writer target that hands each formatted row back instead of buffering it
+    def write(self, value):
+        return value
+
+
+def csv_lines(tasks):
+    """
+    One row per task. Comments and partners don't fit flat columns, so they are
+    written as JSON arrays in their own cells.
+    """
+    writer = csv.writer(_Echo())
+    encoder = DjangoJSONEncoder()
+    yield writer.writerow(TASK_FIELDS + ['owner_email', 'assignee_email', 'accountability_partners', 'comments'])
+    for task in tasks:
+        record = task_record(task)
+        yield writer.writerow(
+            [encoder.default(v) if hasattr(v, 'isoformat') else v for v in (record[f] for f in TASK_FIELDS)]
+            + [
+                record['owner']['email'],
+                record['assignee']['email'] if record['assignee'] else '',
+                encoder.encode([p['email'] for p in record['accountability_partners']]),
+                encoder.encode(record['comments']),
+            ]
+        )
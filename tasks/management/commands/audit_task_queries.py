@@ -0,0 +1,77 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from tasks.permissions import TaskPermissionContext
+from tasks.seed import seed_tasks
+from tasks.visibility import OPEN_STATUSES, due_on, tasks_for_user
+
+User = get_user_model()
+
+TASK_TYPES = [None, 'owned_by_me', 'assigned_by_me', 'assigned', 'accountability', 'team']
+PAGE = 51  # KeysetPagination reads page_size + 1 rows
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the task list queries (every task_type bucket and my_today) "
+        "and flag any that fall back to a full table scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Plan the queries as this user (default: first user).")
+        parser.add_argument('--seed', type=int, default=0, metavar='USERS',
+                            help="Seed this many users with tasks first; rolled back afterwards.")
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan, not just flagged ones.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                seed_tasks(users=options['seed'], prefix='audit')
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+            try:
+                flagged = self._audit(options['user'], options['verbose_plans'])
+            finally:
+                transaction.set_rollback(True)
+
+        if flagged:
+            raise CommandError(f"{flagged} task query plan(s) use a full table scan.")
+        self.stdout.write(self.style.SUCCESS("All task query plans use an index."))
+
+    def _audit(self, user_id, verbose):
+        user = User.objects.filter(pk=user_id).first() if user_id else User.objects.order_by('pk').first()
+        if user is None:
+            raise CommandError("No user to plan the queries for; pass --seed.")
+        permissions = TaskPermissionContext(user)
+
+        queries = [(f'list task_type={task_type}', tasks_for_user(permissions, task_type))
+                   for task_type in TASK_TYPES]
+        queries.append(('my_today', tasks_for_user(permissions).filter(
+            due_on(timezone.localdate()), status__in=OPEN_STATUSES)))
+
+        flagged = 0
+        for label, queryset in queries:
+            plan = queryset.order_by('-created_at', '-id')[:PAGE].explain()
+            scans = self._full_scans(plan)
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"{label}: full scan of {', '.join(sorted(scans))}"))
+            else:
+                self.stdout.write(f"{label}: ok")
+            if scans or verbose:
+                self.stdout.write(plan + '\n')
+        return flagged
+
+    def _full_scans(self, plan):
+        if connection.vendor == 'postgresql':
+            return set(re.findall(r'Seq Scan on (\w+)', plan))
+        # SQLite: "SCAN tasks_task" without "USING ... INDEX"
+        return {
+            match.group(1) for match in re.finditer(r'SCAN (\w+)(.*)', plan)
+            if 'INDEX' not in match.group(2)
+        }
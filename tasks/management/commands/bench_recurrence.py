@@ -0,0 +1,89 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tasks.models import RecurrenceRule, Task
+from tasks.recurrence import MATERIALIZE_BATCH_SIZE, materialize_occurrences
+from tasks.seed import seed_recurring
+from .bench_tasks_api import _git_commit
+
+
+class Command(BaseCommand):
+    help = (
+        "Time recurring task materialization against a fixture of recurring "
+        "definitions (100k by default): the first run over a full horizon, an "
+        "immediate re-run (which must create nothing) and the steady-state "
+        "hourly run. Everything happens in one transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='recur', help="Name prefix of the fixture (default: recur).")
+        parser.add_argument('--definitions', type=int, default=100_000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--horizon-days', type=int, default=settings.RECURRENCE_HORIZON_DAYS)
+        parser.add_argument('--batch-size', type=int, default=MATERIALIZE_BATCH_SIZE)
+        parser.add_argument('--output', help="Results file (default: bench-recurrence-<commit>.json).")
+
+    def handle(self, *args, **options):
+        if RecurrenceRule.objects.filter(template__title__startswith=f"{options['prefix']} ").exists():
+            raise CommandError(f"A '{options['prefix']}' fixture already exists; pass another --prefix.")
+        batch_size = options['batch_size']
+        now = timezone.now()
+        horizon = now + timedelta(days=options['horizon_days'])
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            seed_recurring(definitions=options['definitions'], users=options['users'], prefix=options['prefix'])
+            self.stdout.write(f"Seeded {options['definitions']} definitions in {time.perf_counter() - started:.0f}s.")
+
+            results = {
+                'first run': self._time(lambda: materialize_occurrences(horizon, batch_size)),
+                're-run': self._time(lambda: materialize_occurrences(horizon, batch_size)),
+                'next hour': self._time(lambda: materialize_occurrences(horizon + timedelta(hours=1), batch_size)),
+            }
+            if results['re-run']['occurrences']:
+                raise CommandError("Re-running materialization created occurrences again.")
+            occurrences = Task.objects.filter(recurrence__isnull=False, title__startswith=f"{options['prefix']} ")
+            duplicates = occurrences.count() - occurrences.values('recurrence', 'occurrence_start').distinct().count()
+            transaction.set_rollback(True)
+
+        commit = _git_commit()
+        report = {
+            'commit': commit,
+            'created_at': now.isoformat(),
+            'database': connection.vendor,
+            'definitions': options['definitions'],
+            'horizon_days': options['horizon_days'],
+            'batch_size': batch_size,
+            'duplicates': duplicates,
+            'results': results,
+        }
+        output = options['output'] or f"bench-recurrence-{(commit or 'worktree')[:12]}.json"
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<12} {result['seconds']:>9.2f}s {result['occurrences']:>10} occurrences "
+                f"{result['per_second']:>10.0f}/s {result['queries']:>7} queries"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote results to {output}."))
+
+    def _time(self, run):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            rules, occurrences = run()
+            elapsed = time.perf_counter() - started
+        return {
+            'seconds': round(elapsed, 3),
+            'rules': rules,
+            'occurrences': occurrences,
+            'per_second': round(occurrences / elapsed, 1) if elapsed else 0.0,
+            'queries': len(captured),
+        }
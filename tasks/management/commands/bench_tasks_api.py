@@ -0,0 +1,199 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accountability.models import TaskAccountability
+from organizations.models import Membership
+from tasks.models import Task, TaskComment
+from tasks.seed import seed_large_org
+from tasks.views import TaskCommentViewSet, TaskViewSet
+from teams.models import Team
+from users.tasks import check_expired_trials
+
+User = get_user_model()
+
+TASK_TYPES = [None, 'owned_by_me', 'assigned_by_me', 'assigned', 'accountability', 'team']
+ROLES = ['admin', 'manager', 'member']
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the tasks API hot paths against a seeded large organization and "
+        "write the results to JSON: every task_type branch of the task list and "
+        "my_today per role, comment create, task create with partners and "
+        "check_expired_trials. Requests go through the views in-process; writes "
+        "are rolled back, so runs against the same fixture stay comparable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench', help="Name prefix of the fixture (default: bench).")
+        parser.add_argument('--seed', action='store_true', help="Create the fixture first (kept afterwards).")
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--teams', type=int, default=200)
+        parser.add_argument('--tasks', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=5_000_000)
+        parser.add_argument('--partners', type=int, default=3, help="Accountability partners per task.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per benchmark.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed runs per benchmark.")
+        parser.add_argument('--with-cache', action='store_true',
+                            help="Keep the response cache on; by default every request is a cache miss.")
+        parser.add_argument('--output', help="Results file (default: bench-<commit>.json).")
+        parser.add_argument('--compare', metavar='FILE', help="Earlier results to print the change against.")
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['seed']:
+            started = time.perf_counter()
+            seed_large_org(
+                users=options['users'], teams=options['teams'], tasks=options['tasks'],
+                comments=options['comments'], partners_per_task=options['partners'], prefix=prefix,
+            )
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            self.stdout.write(f"Seeded in {time.perf_counter() - started:.0f}s.")
+
+        subjects = self._subjects(prefix)
+        self.factory = APIRequestFactory()
+        self.repeat, self.warmup = options['repeat'], options['warmup']
+
+        if options['with_cache']:
+            results = self._run_all(subjects)
+        else:
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+                results = self._run_all(subjects)
+
+        commit = _git_commit()
+        report = {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'repeat': self.repeat,
+            'cache': options['with_cache'],
+            'fixture': self._fixture(prefix),
+            'results': results,
+        }
+        output = options['output'] or f"bench-{(commit or 'worktree')[:12]}.json"
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {output}."))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self._compare(json.load(f)['results'], results)
+
+    def _subjects(self, prefix):
+        memberships = Membership.objects.filter(user__email__startswith=f'{prefix}-').select_related(
+            'user', 'organization')
+        subjects = {}
+        for role in ROLES:
+            membership = memberships.filter(role=role).order_by('user_id').first()
+            if membership is not None:
+                subjects[role] = membership
+        if not subjects:
+            raise CommandError(f"No '{prefix}' fixture found; pass --seed to create one.")
+        return subjects
+
+    def _run_all(self, subjects):
+        results = {}
+        for role, membership in subjects.items():
+            user = membership.user
+            for task_type in TASK_TYPES:
+                query = f'?task_type={task_type}' if task_type else ''
+                results[f'list[{task_type or "all"}] as {role}'] = self._time_request(
+                    TaskViewSet.as_view({'get': 'list'}), 'get', f'/api/tasks/{query}', user)
+            results[f'my_today as {role}'] = self._time_request(
+                TaskViewSet.as_view({'get': 'my_today'}), 'get', '/api/tasks/my-today/', user)
+
+        member = subjects.get('member') or next(iter(subjects.values()))
+        user, organization = member.user, member.organization
+        task = Task.objects.filter(owner=user).order_by('pk').first()
+        if task is not None:
+            results['comment create'] = self._time_request(
+                TaskCommentViewSet.as_view({'post': 'create'}), 'post', f'/api/tasks/{task.pk}/comments/', user,
+                {'text': 'Benchmark comment'}, task_pk=task.pk, write=True)
+
+        partners = list(
+            Membership.objects.filter(organization=organization).exclude(user=user)
+            .order_by('user_id').values_list('user__email', flat=True)[:3]
+        )
+        results['task create with partners'] = self._time_request(
+            TaskViewSet.as_view({'post': 'create'}), 'post', '/api/tasks/', user,
+            {'title': 'Benchmark task', 'organization': organization.pk, 'accountability_partners': partners},
+            write=True)
+
+        results['check_expired_trials'] = self._time(lambda: check_expired_trials(), write=True)
+        return results
+
+    def _time_request(self, view, method, url, user, data=None, write=False, **kwargs):
+        def call():
+            if data is None:
+                request = getattr(self.factory, method)(url)
+            else:
+                request = getattr(self.factory, method)(url, data, format='json')
+            force_authenticate(request, user=user)
+            response = view(request, **kwargs)
+            if response.status_code >= 400:
+                raise CommandError(f"{method.upper()} {url} returned {response.status_code}: {response.data}")
+            response.render()
+        return self._time(call, write)
+
+    def _time(self, call, write=False):
+        timings, queries = [], 0
+        for run in range(self.warmup + self.repeat):
+            with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                call()
+                elapsed = (time.perf_counter() - started) * 1000
+                if write:
+                    transaction.set_rollback(True)
+            if run >= self.warmup:
+                timings.append(elapsed)
+                queries = len(captured)
+        timings.sort()
+        return {
+            'runs': len(timings),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 3),
+            'min_ms': round(timings[0], 3),
+            'max_ms': round(timings[-1], 3),
+            'queries': queries,
+        }
+
+    def _fixture(self, prefix):
+        tasks = Task.objects.filter(owner__email__startswith=f'{prefix}-')
+        return {
+            'prefix': prefix,
+            'users': User.objects.filter(email__startswith=f'{prefix}-').count(),
+            'teams': Team.objects.filter(name__startswith=f'{prefix}-').count(),
+            'tasks': tasks.count(),
+            'comments': TaskComment.objects.filter(task__in=tasks).count(),
+            'partnerships': TaskAccountability.objects.filter(task__in=tasks).count(),
+        }
+
+    def _compare(self, before, after):
+        self.stdout.write(f"{'benchmark':<40} {'before p50':>11} {'after p50':>11} {'change':>8}")
+        for name in sorted(after):
+            if name not in before:
+                continue
+            old, new = before[name]['p50_ms'], after[name]['p50_ms']
+            change = (new - old) / old * 100 if old else 0.0
+            self.stdout.write(f"{name:<40} {old:>11.2f} {new:>11.2f} {change:>+7.1f}%")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
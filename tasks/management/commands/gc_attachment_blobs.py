@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from elevanalog.uploads import get_upload_storage
+from tasks.models import AttachmentBlob, TaskAttachment
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete attachment blobs no attachment references any more, along with "
+        "their stored content. Blobs are kept for --grace-hours after their last "
+        "reference goes, so an upload deduplicated against one in the meantime "
+        "can still claim it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted.")
+        parser.add_argument('--recount', action='store_true',
+                            help="Recompute every blob's ref_count from its attachments first.")
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self._recount()
+
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        candidates = AttachmentBlob.objects.filter(
+            Q(released_at__lt=cutoff) | Q(released_at__isnull=True, created_at__lt=cutoff),
+            ref_count__lte=0,
+        ).exclude(Exists(TaskAttachment.objects.filter(blob=OuterRef('pk'))))
+
+        if options['dry_run']:
+            count = candidates.count()
+            size = sum(candidates.values_list('size', flat=True))
+            self.stdout.write(f"Would delete {count} blob(s), {size} bytes.")
+            return
+
+        storage = get_upload_storage()
+        deleted = reclaimed = 0
+        while True:
+            with transaction.atomic():
+                # Blobs an upload is attaching to right now are locked and skipped
+                blobs = list(
+                    candidates.select_for_update(skip_locked=True).order_by('pk')[:options['batch_size']]
+                )
+                if not blobs:
+                    break
+                AttachmentBlob.objects.filter(pk__in=[blob.pk for blob in blobs]).delete()
+            for blob in blobs:
+                try:
+                    storage.delete(blob.key)
+                except Exception as exc:
+                    self.stderr.write(f"Could not delete {blob.key}: {exc}")
+            deleted += len(blobs)
+            reclaimed += sum(blob.size for blob in blobs)
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} blob(s), reclaimed {reclaimed} bytes."))
+
+    def _recount(self):
+        fixed = 0
+        counted = AttachmentBlob.objects.annotate(n=Count('attachments')).exclude(ref_count=F('n'))
+        for blob in counted.iterator(chunk_size=1000):
+            AttachmentBlob.objects.filter(pk=blob.pk).update(
+                ref_count=blob.n, released_at=None if blob.n else (blob.released_at or timezone.now())
+            )
+            fixed += 1
+        if fixed:
+            self.stdout.write(self.style.WARNING(f"Corrected ref_count of {fixed} blob(s)."))
@@ -0,0 +1,93 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tasks.models import Task
+
+User = get_user_model()
+
+# name -> (sync path, async path)
+ENDPOINTS = {
+    'task-list': ('/api/tasks/', '/api/async/tasks/'),
+    'my-today': ('/api/tasks/my-today/', '/api/async/tasks/my-today/'),
+    'comment-list': ('/api/tasks/{task}/comments/', '/api/async/tasks/{task}/comments/'),
+    'me': ('/api/users/me/', '/api/async/users/me/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the hot read endpoints and report p50/p99 latency and throughput "
+        "per concurrency level. Point --wsgi-url at a WSGI server (sync views) and "
+        "--asgi-url at an ASGI server (async views) to compare the two deployments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', help="Base URL of the WSGI deployment, e.g. http://localhost:8000")
+        parser.add_argument('--asgi-url', help="Base URL of the ASGI deployment, e.g. http://localhost:8001")
+        parser.add_argument('--user', required=True, help="Email of the user to request as.")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+        parser.add_argument('--requests', type=int, default=500, help="Requests per endpoint and concurrency level.")
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), action='append', dest='endpoints')
+
+    def handle(self, *args, **options):
+        targets = [(name, url.rstrip('/'), index) for name, url, index in (
+            ('wsgi', options['wsgi_url'], 0), ('asgi', options['asgi_url'], 1)) if url]
+        if not targets:
+            raise CommandError("Pass --wsgi-url and/or --asgi-url.")
+
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['user']}.")
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        task = Task.objects.filter(owner=user).order_by('pk').values_list('pk', flat=True).first()
+
+        self.stdout.write(f"{'target':<6} {'endpoint':<14} {'conc':>5} {'p50 ms':>9} {'p99 ms':>9} "
+                          f"{'req/s':>8} {'errors':>7}")
+        for endpoint in options['endpoints'] or list(ENDPOINTS):
+            if '{task}' in ENDPOINTS[endpoint][0] and task is None:
+                self.stderr.write(f"Skipping {endpoint}: the user owns no tasks.")
+                continue
+            for concurrency in options['concurrency']:
+                for target, base_url, index in targets:
+                    url = base_url + ENDPOINTS[endpoint][index].format(task=task)
+                    result = self._run(url, headers, concurrency, options['requests'])
+                    self.stdout.write(
+                        f"{target:<6} {endpoint:<14} {concurrency:>5} {result['p50']:>9.1f} "
+                        f"{result['p99']:>9.1f} {result['throughput']:>8.1f} {result['errors']:>7}"
+                    )
+
+    def _run(self, url, headers, concurrency, total):
+        def worker(count):
+            timings, errors = [], 0
+            with requests.Session() as session:
+                session.headers.update(headers)
+                for _ in range(count):
+                    started = time.perf_counter()
+                    try:
+                        ok = session.get(url, timeout=30).status_code == 200
+                    except requests.RequestException:
+                        ok = False
+                    timings.append((time.perf_counter() - started) * 1000)
+                    errors += not ok
+            return timings, errors
+
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(worker, shares))
+        elapsed = time.perf_counter() - started
+
+        timings = sorted(t for worker_timings, _ in results for t in worker_timings)
+        quantiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+        return {
+            'p50': quantiles[49],
+            'p99': quantiles[98],
+            'throughput': len(timings) / elapsed if elapsed else 0.0,
+            'errors': sum(errors for _, errors in results),
+        }
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.models import Task
+from tasks.visibility import audience_of, live_visible_tasks, sync_task_visibility, visible_tasks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the task visibility index, or check it for drift against the live query."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drift, don't write anything. Exits non-zero on drift.")
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Check only the given user id (repeatable).")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['check']:
+            self._check(options['user_ids'])
+        else:
+            self._rebuild(options['chunk_size'])
+
+    def _rebuild(self, chunk_size):
+        updated = 0
+        last_pk = 0
+        while True:
+            tasks = list(Task.objects.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+            if not tasks:
+                break
+            changes = sync_task_visibility(tasks)
+            updated += sum(1 for before, after in changes.values() if before != after)
+            last_pk = tasks[-1].pk
+        self.stdout.write(self.style.SUCCESS(f"Visibility index rebuilt, {updated} task(s) updated."))
+
+    def _check(self, user_ids):
+        users = User.objects.order_by('pk')
+        if user_ids:
+            users = users.filter(pk__in=user_ids)
+
+        drifted = 0
+        for user_id in users.values_list('pk', flat=True).iterator(chunk_size=1000):
+            live = set(live_visible_tasks(user_id).values_list('id', flat=True))
+            indexed = set(visible_tasks(audience_of(user_id)).values_list('id', flat=True))
+            if live != indexed:
+                drifted += 1
+                self.stdout.write(f"user {user_id}: {len(live - indexed)} missing, {len(indexed - live)} stale")
+
+        if drifted:
+            raise CommandError(f"Visibility index has drifted for {drifted} user(s).")
+        self.stdout.write(self.style.SUCCESS("Visibility index matches the live query."))
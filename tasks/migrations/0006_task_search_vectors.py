@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:05
+
+import elevanalog.search
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    # Postgres only: SQLite keeps the columns as unused text and searches with icontains
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    task_table = apps.get_model('tasks', 'Task')._meta.db_table
+    comment_table = apps.get_model('tasks', 'TaskComment')._meta.db_table
+    schema_editor.execute(
+        f"UPDATE {task_table} SET search_vector = "
+        f"setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    )
+    schema_editor.execute(
+        f"UPDATE {comment_table} SET search_vector = to_tsvector('english', coalesce(text, ''))"
+    )
+    schema_editor.execute(f"CREATE INDEX task_search_vector_idx ON {task_table} USING GIN (search_vector)")
+    schema_editor.execute(
+        f"CREATE INDEX taskcomment_search_vector_idx ON {comment_table} USING GIN (search_vector)"
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS task_search_vector_idx")
+    schema_editor.execute("DROP INDEX IF EXISTS taskcomment_search_vector_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_indexes_audience_visibility'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=elevanalog.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='taskcomment',
+            name='search_vector',
+            field=elevanalog.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
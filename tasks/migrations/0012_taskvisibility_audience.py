@@ -0,0 +1,97 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+CHUNK_SIZE = 1000
+
+
+def clear_index(apps, schema_editor):
+    apps.get_model('tasks', 'TaskVisibility').objects.all().delete()
+
+
+def rebuild_index(apps, schema_editor):
+    # Same keys as tasks.visibility, written against the historical models
+    Task = apps.get_model('tasks', 'Task')
+    TaskVisibility = apps.get_model('tasks', 'TaskVisibility')
+    TaskAccountability = apps.get_model('accountability', 'TaskAccountability')
+
+    last_pk = 0
+    while True:
+        tasks = list(
+            Task.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'owner_id', 'assignee_id', 'organization_id', 'team_id')[:CHUNK_SIZE]
+        )
+        if not tasks:
+            break
+        keys = set()
+        for pk, owner_id, assignee_id, organization_id, team_id in tasks:
+            keys.add((pk, f'user:{owner_id}'))
+            if assignee_id:
+                keys.add((pk, f'user:{assignee_id}'))
+            if organization_id:
+                keys.add((pk, f'org:{organization_id}'))
+            if team_id:
+                keys.add((pk, f'team:{team_id}'))
+        partners = TaskAccountability.objects.filter(
+            task_id__gt=last_pk, task_id__lte=tasks[-1][0]
+        ).values_list('task_id', 'partner_id')
+        keys |= {(task_id, f'user:{partner_id}') for task_id, partner_id in partners}
+        TaskVisibility.objects.bulk_create(
+            [TaskVisibility(task_id=task_id, audience=audience) for task_id, audience in keys],
+            batch_size=CHUNK_SIZE, ignore_conflicts=True,
+        )
+        last_pk = tasks[-1][0]
+
+
+class RekeyVisibility(migrations.SeparateDatabaseAndState):
+    """
+    The schema operations, skipped on databases whose table is already keyed
+    by audience (an earlier version of 0005 re-keyed it).
+    """
+
+    def __init__(self, operations):
+        super().__init__(database_operations=operations, state_operations=operations)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        table = from_state.apps.get_model('tasks', 'TaskVisibility')._meta.db_table
+        connection = schema_editor.connection
+        with connection.cursor() as cursor:
+            columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+        if 'audience' not in columns:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # Visibility rows are keyed by audience (user, organization or team)
+    # instead of one row per user and task. Per-user rows can't be converted,
+    # so the index is cleared and rebuilt from the tasks in place.
+
+    dependencies = [
+        ('accountability', '0002_taskaccountability'),
+        ('tasks', '0011_recurrencerule'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_index, migrations.RunPython.noop),
+        RekeyVisibility([
+            migrations.AlterUniqueTogether(
+                name='taskvisibility',
+                unique_together=set(),
+            ),
+            migrations.RemoveField(
+                model_name='taskvisibility',
+                name='user',
+            ),
+            migrations.AddField(
+                model_name='taskvisibility',
+                name='audience',
+                field=models.CharField(default='', max_length=40),
+                preserve_default=False,
+            ),
+            migrations.AlterUniqueTogether(
+                name='taskvisibility',
+                unique_together={('audience', 'task')},
+            ),
+        ]),
+        migrations.RunPython(rebuild_index, clear_index),
+    ]
@@ -1,11 +1,33 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
+from elevanalog.search import SearchVectorField
 from organizations.models import Organization
 from teams.models import Team
 
 User = settings.AUTH_USER_MODEL
 
 
+class TaskQuerySet(models.QuerySet):
+    def for_write(self):
+        """
+        Tasks loaded to be changed and saved. The comment fields, which
+        tasks.comments maintains with F() updates, are left out so save()
+        can't write stale copies of them back.
+        """
+        return self.defer(*Task.COMMENT_FIELDS)
+
+
+class TaskManager(models.Manager.from_queryset(TaskQuerySet)):
+    def get_queryset(self):
+        # search_vector is only ever used inside queries; leaving it out of
+        # every SELECT also leaves it out of save(), which only writes loaded fields
+        return super().get_queryset().defer('search_vector')
+
+
 class Task(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -28,18 +50,173 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by tasks.search; its GIN index is created by migration 0006 on Postgres only
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Maintained by tasks.comments with F() updates; load tasks to be saved with for_write()
+    comment_count = models.IntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Set on occurrences materialized from a RecurrenceRule (see tasks.recurrence)
+    recurrence = models.ForeignKey('RecurrenceRule', on_delete=models.SET_NULL, null=True, blank=True,
+                                   editable=False, related_name='occurrences')
+    occurrence_start = models.DateTimeField(null=True, blank=True, editable=False)
+
+    COMMENT_FIELDS = ('comment_count', 'last_comment_at')
+
+    objects = TaskManager()
+
+    class Meta:
+        indexes = [
+            # task_type=owned_by_me / assigned_by_me, and owner=... in the OR
+            models.Index(fields=['owner', 'assignee'], name='task_owner_assignee_idx'),
+            # task_type=assigned, and assignee=... in the OR
+            models.Index(fields=['assignee', 'owner'], name='task_assignee_owner_idx'),
+            # task_type=team (team_id IN ...) with status filters
+            models.Index(fields=['team', 'status'], name='task_team_status_idx'),
+            models.Index(fields=['organization', 'status'], name='task_org_status_idx'),
+            # Default keyset order of the task list (-created_at, -id)
+            models.Index(fields=['created_at', 'id'], name='task_created_idx'),
+            # ?due_date= as a half-open range
+            models.Index(fields=['due_date'], name='task_due_date_idx'),
+            # my_today: due today and still open
+            models.Index(
+                fields=['due_date'],
+                name='task_open_due_date_idx',
+                condition=models.Q(status__in=['pending', 'in_progress']),
+            ),
+        ]
+        constraints = [
+            # Each occurrence is created once, however many materialization runs overlap
+            models.UniqueConstraint(fields=['recurrence', 'occurrence_start'], name='task_recurrence_occurrence_uniq'),
+        ]
 
     def __str__(self):
         return self.title
-    
+
+
+class RecurrenceRule(models.Model):
+    # Repeats a template task on an RFC 5545 RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO".
+    # The template is the occurrence at dtstart; later ones are created as
+    # ordinary tasks by tasks.recurrence, a horizon ahead. next_occurrence is
+    # the first one not created yet, null once the rule has ended.
+    template = models.OneToOneField(Task, on_delete=models.CASCADE, related_name='recurrence_rule')
+    rule = models.CharField(max_length=500)
+    dtstart = models.DateTimeField()
+    next_occurrence = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_occurrence'],
+                name='recurrence_next_idx',
+                condition=models.Q(next_occurrence__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.template_id}: {self.rule}'
+
+
 class TaskComment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='task_comments')
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+class AttachmentBlob(models.Model):
+    # One stored copy of an attachment's content, shared by every attachment
+    # with the same bytes. ref_count is kept by tasks.signals; unreferenced
+    # blobs are removed by the gc_attachment_blobs command.
+    sha256 = models.CharField(max_length=64, unique=True)
+    key = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100)
+    ref_count = models.IntegerField(default=0)
+    released_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['released_at'], condition=models.Q(ref_count__lte=0),
+                         name='attachmentblob_unref_idx'),
+        ]
+
 
 class TaskAttachment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='attachments')
-    file = models.FileField(upload_to='task_attachments/')
+    # Attachments with a blob point their file at the blob's key
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.PROTECT, null=True, blank=True,
+                             related_name='attachments')
+    file = models.FileField(upload_to='task_attachments/', max_length=255)
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
-    uploaded_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Original name and the type sniffed from the content (see tasks.attachments)
+    filename = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    thumbnail_url = models.CharField(max_length=500, blank=True)
+
+    def build_thumbnail(self):
+        # Renders through sorl, reading the original from the upload storage
+        # (which is where it lives, not the default storage); only called
+        # while processing an upload
+        from elevanalog.uploads import UploadStorageFiles
+
+        source = ImageFile(self.file.name, storage=UploadStorageFiles())
+        return get_thumbnail(source, '256x256', crop='center', quality=90).url
+
+
+class AttachmentUpload(models.Model):
+    # A chunked upload on its way to becoming a TaskAttachment (see tasks.attachments)
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='attachment_uploads')
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attachment_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    # Declared by the client; content already stored under it is reused
+    sha256 = models.CharField(max_length=64, blank=True)
+    key = models.CharField(max_length=255)
+    upload_id = models.CharField(max_length=255)
+    parts = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.CharField(max_length=255, blank=True)
+    attachment = models.OneToOneField(
+        TaskAttachment, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class TaskVisibility(models.Model):
+    # Denormalized "who is this task shared with" rows, kept in sync by tasks.visibility.
+    audience = models.CharField(max_length=40)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='visibility')
+
+    class Meta:
+        unique_together = ('audience', 'task')
+        verbose_name = 'Task Visibility'
+        verbose_name_plural = 'Task Visibility'
+
+
+class TaskCounter(models.Model):
+    # Per-user task counts by TaskViewSet task_type bucket and status, kept
+    # current by tasks.counters and read by /api/tasks/summary/.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='task_counters')
+    bucket = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'bucket', 'status')
+        verbose_name = 'Task Counter'
+        verbose_name_plural = 'Task Counters'
@@ -0,0 +1,110 @@
+from accountability.models import TaskAccountability
+from .roles import aget_roles, get_roles
+from .visibility import user_audience
+
+
+class TaskPermissionContext:
+    """
+    The requesting user's organization and team roles (from tasks.roles),
+    loaded once and reused for every task permission check made while
+    handling a request.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._org_roles = None
+        self._team_roles = None
+        self._partner_tasks = {}
+
+    @property
+    def org_roles(self):
+        # organization_id -> role
+        if self._org_roles is None:
+            self._org_roles, self._team_roles = get_roles(self.user.pk)
+        return self._org_roles
+
+    @property
+    def team_roles(self):
+        # team_id -> role
+        if self._team_roles is None:
+            self._org_roles, self._team_roles = get_roles(self.user.pk)
+        return self._team_roles
+
+    async def aload(self):
+        """
+        Load the role maps up front. Async views call this, since the lazy
+        properties above can't query the database from an event loop.
+        """
+        self._org_roles, self._team_roles = await aget_roles(self.user.pk)
+        return self
+
+    @property
+    def audience(self):
+        # Visibility index keys for this user (see tasks.visibility)
+        return user_audience(self.user.pk, self.org_roles, self.team_roles)
+
+    def is_owner(self, task):
+        return task.owner_id == self.user.pk
+
+    def is_partner(self, task):
+        if task.pk not in self._partner_tasks:
+            self._partner_tasks[task.pk] = TaskAccountability.objects.filter(
+                task_id=task.pk, partner=self.user
+            ).exists()
+        return self._partner_tasks[task.pk]
+
+    def load_partnerships(self, task_ids):
+        """Answer is_partner for all of `task_ids` with one query, for batch checks."""
+        task_ids = set(task_ids) - set(self._partner_tasks)
+        if not task_ids:
+            return
+        partnered = set(TaskAccountability.objects.filter(
+            task_id__in=task_ids, partner=self.user
+        ).values_list('task_id', flat=True))
+        for task_id in task_ids:
+            self._partner_tasks[task_id] = task_id in partnered
+
+    def can_edit(self, task):
+        # Owner, or an admin/manager in the task's organization
+        if self.is_owner(task):
+            return True
+        if task.organization_id is None:
+            return False
+        return self.org_roles.get(task.organization_id) in ['admin', 'manager']
+
+    def can_update(self, task):
+        # 1. Personal task (no org), only owner can edit
+        if not task.organization_id and self.is_owner(task):
+            return True
+        # 2. Team-assigned task, org admin or team manager/assistant
+        if task.team_id:
+            return (
+                self.org_roles.get(task.team.organization_id) == 'admin'
+                or self.team_roles.get(task.team_id) in ['manager', 'assistant']
+            )
+        # 3. Org task not assigned to a team, only org admin can edit
+        if task.organization_id:
+            return self.org_roles.get(task.organization_id) == 'admin'
+        return False
+
+    def can_delete(self, task):
+        if not task.organization_id:
+            return self.is_owner(task)
+        return self.org_roles.get(task.organization_id) == 'admin'
+
+    def can_comment(self, task):
+        return (
+            self.is_owner(task)
+            or (task.organization_id is not None and task.organization_id in self.org_roles)
+            or (task.team_id is not None and task.team_id in self.team_roles)
+            or self.is_partner(task)
+        )
+
+
+def get_permission_context(request):
+    """Return the permission context for this request, creating it on first use."""
+    context = getattr(request, '_task_permission_context', None)
+    if context is None or context.user != request.user:
+        context = TaskPermissionContext(request.user)
+        request._task_permission_context = context
+    return context
@@ -0,0 +1,163 @@
+import logging
+from datetime import timedelta
+
+from dateutil.rrule import HOURLY, rrule, rrulestr
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RecurrenceRule, Task
+from .signals import tasks_written_in_bulk
+
+logger = logging.getLogger(__name__)
+
+# Fields an occurrence copies from its template
+TEMPLATE_FIELDS = ['title', 'description', 'owner_id', 'assignee_id', 'team_id', 'organization_id', 'priority']
+# Bounds one rule's share of a run; the rest is picked up by the next batch
+MAX_OCCURRENCES_PER_RULE = 500
+MATERIALIZE_BATCH_SIZE = 1000
+
+
+def parse_rule(text, dtstart):
+    """
+    The dateutil rrule for an RRULE string starting at `dtstart`. Raises
+    ValueError for anything but a single rule repeating at most hourly.
+    """
+    parsed = rrulestr(text.strip(), dtstart=dtstart)
+    if not isinstance(parsed, rrule):
+        raise ValueError("Expected a single RRULE.")
+    if parsed._freq > HOURLY:
+        # MINUTELY and SECONDLY would swamp the task tables
+        raise ValueError("Tasks can repeat at most hourly.")
+    return parsed
+
+
+def set_recurrence(task, text):
+    """
+    Make `task` the template of a rule (replacing any rule it had), or stop
+    it repeating when `text` is blank. A stopped rule is kept, disabled, so
+    its occurrences stay linked to it. Occurrences already created are kept;
+    the next run of materialize_occurrences continues after the latest of
+    them, and never with occurrences that are already in the past.
+    """
+    if not text:
+        RecurrenceRule.objects.filter(template=task).update(next_occurrence=None, updated_at=timezone.now())
+        _mark_recurring(task, False)
+        return None
+
+    rule = RecurrenceRule.objects.filter(template=task).first()
+    dtstart = rule.dtstart if rule else (task.due_date or task.created_at or timezone.now())
+    parsed = parse_rule(text, dtstart)
+    resume = max(timezone.now(), dtstart)
+    if rule:
+        latest = rule.occurrences.order_by('-occurrence_start').values_list('occurrence_start', flat=True).first()
+        if latest is not None:
+            resume = max(resume, latest)
+    rule, _ = RecurrenceRule.objects.update_or_create(
+        template=task,
+        defaults={'rule': text.strip(), 'dtstart': dtstart, 'next_occurrence': parsed.after(resume)},
+    )
+    _mark_recurring(task, True)
+    return rule
+
+
+def _mark_recurring(task, recurring):
+    if task.is_recurring != recurring:
+        task.is_recurring = recurring
+        task.save(update_fields=['is_recurring', 'updated_at'])
+
+
+def _expand(rule, horizon):
+    """
+    (occurrence starts due by `horizon`, the first one after them or None),
+    expanded lazily from rule.next_occurrence and capped per rule.
+    """
+    parsed = parse_rule(rule.rule, rule.dtstart)
+    starts = []
+    for start in parsed.xafter(rule.next_occurrence, inc=True):
+        if start > horizon or len(starts) == MAX_OCCURRENCES_PER_RULE:
+            return starts, start
+        starts.append(start)
+    return starts, None
+
+
+def _occurrence(template, rule, start):
+    task = Task(**{field: getattr(template, field) for field in TEMPLATE_FIELDS})
+    task.due_date = start
+    task.recurrence = rule
+    task.occurrence_start = start
+    return task
+
+
+def materialize_batch(horizon, batch_size=MATERIALIZE_BATCH_SIZE):
+    """
+    Create the occurrences due by `horizon` for one batch of rules, in one
+    transaction. Rules are locked with SKIP LOCKED, so overlapping runs split
+    the work instead of repeating it; the (recurrence, occurrence_start)
+    constraint with ignore_conflicts keeps any overlap that slips through
+    (a rule edited mid-run) from creating duplicates. Returns (rules
+    processed, occurrences created).
+    """
+    with transaction.atomic():
+        rules = list(
+            RecurrenceRule.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('template')
+            .filter(next_occurrence__lte=horizon)
+            .order_by('next_occurrence', 'pk')[:batch_size]
+        )
+        if not rules:
+            return 0, 0
+
+        pending = []
+        for rule in rules:
+            try:
+                starts, rule.next_occurrence = _expand(rule, horizon)
+            except ValueError:
+                logger.exception("Recurrence rule %s can't be expanded; disabling it", rule.pk)
+                starts, rule.next_occurrence = [], None
+            pending += [(rule, start) for start in starts]
+
+        # Occurrences that already exist (the rule was edited to overlap ones
+        # it created before) are skipped up front, so the rows read back
+        # below are exactly the ones this batch inserted
+        earliest = min((start for _, start in pending), default=None)
+        existing = set()
+        if earliest is not None:
+            existing = set(Task.objects.filter(
+                recurrence__in=rules, occurrence_start__gte=earliest
+            ).values_list('recurrence_id', 'occurrence_start'))
+        wanted = {(rule.pk, start): (rule, start) for rule, start in pending if (rule.pk, start) not in existing}
+
+        Task.objects.bulk_create(
+            [_occurrence(rule.template, rule, start) for rule, start in wanted.values()],
+            batch_size=1000, ignore_conflicts=True,
+        )
+        RecurrenceRule.objects.bulk_update(rules, ['next_occurrence'])
+
+        created = []
+        if wanted:
+            # ignore_conflicts leaves primary keys unset, so read the rows back
+            created = [
+                task for task in Task.objects.filter(recurrence__in=rules, occurrence_start__gte=earliest)
+                if (task.recurrence_id, task.occurrence_start) in wanted
+            ]
+            tasks_written_in_bulk(created=created)
+    return len(rules), len(created)
+
+
+def materialize_occurrences(horizon=None, batch_size=MATERIALIZE_BATCH_SIZE):
+    """
+    Create every occurrence due within RECURRENCE_HORIZON_DAYS from now (or
+    by `horizon`), batch by batch. Occurrences are plain tasks, so lists and
+    my_today only ever see rows that have been materialized here.
+    """
+    if horizon is None:
+        horizon = timezone.now() + timedelta(days=settings.RECURRENCE_HORIZON_DAYS)
+    rules = occurrences = 0
+    while True:
+        batch_rules, batch_occurrences = materialize_batch(horizon, batch_size)
+        if not batch_rules:
+            break
+        rules += batch_rules
+        occurrences += batch_occurrences
+    return rules, occurrences
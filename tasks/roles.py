@@ -0,0 +1,107 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from organizations.models import Membership
+from teams.models import TeamMembership
+
+# Membership signals invalidate entries; the short expiry bounds how long a
+# change made without them (queryset.update() in the organizations or teams
+# apps) can leave someone with roles they no longer have
+ROLES_TIMEOUT = 5 * 60
+
+
+def _version_key(user_id):
+    return f'roles:version:{user_id}'
+
+
+def _roles_key(user_id, version):
+    return f'roles:{user_id}:{version}'
+
+
+def _load(user_ids):
+    roles = {user_id: ({}, {}) for user_id in user_ids}
+    for user_id, org_id, role in Membership.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'organization_id', 'role'):
+        roles[user_id][0][org_id] = role
+    for user_id, team_id, role in TeamMembership.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'team_id', 'role'):
+        roles[user_id][1][team_id] = role
+    return roles
+
+
+def _versions(user_ids):
+    keys = {_version_key(user_id): user_id for user_id in user_ids}
+    versions = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_roles_many(user_ids):
+    """
+    {user_id: (org_roles, team_roles)} for the given users, where org_roles
+    maps organization_id -> role and team_roles maps team_id -> role.
+
+    Served from the cache under each user's current roles version; users not
+    in the cache are loaded with one query per membership table for all of them.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    versions = _versions(user_ids)
+    keys = {_roles_key(user_id, versions.get(user_id)): user_id for user_id in user_ids}
+    roles = {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+
+    missing = user_ids - roles.keys()
+    if missing:
+        loaded = _load(missing)
+        cache.set_many(
+            {_roles_key(user_id, versions.get(user_id)): value for user_id, value in loaded.items()},
+            ROLES_TIMEOUT,
+        )
+        roles.update(loaded)
+    return roles
+
+
+def get_roles(user_id):
+    """(org_roles, team_roles) of one user; see get_roles_many."""
+    return get_roles_many([user_id])[user_id]
+
+
+async def aget_roles(user_id):
+    version_key = _version_key(user_id)
+    version = await cache.aget(version_key)
+    if version is None:
+        await cache.aadd(version_key, uuid.uuid4().hex, None)
+        version = await cache.aget(version_key)
+    key = _roles_key(user_id, version)
+
+    roles = await cache.aget(key)
+    if roles is None:
+        org_roles = {org_id: role async for org_id, role in Membership.objects.filter(
+            user_id=user_id).values_list('organization_id', 'role')}
+        team_roles = {team_id: role async for team_id, role in TeamMembership.objects.filter(
+            user_id=user_id).values_list('team_id', 'role')}
+        roles = (org_roles, team_roles)
+        await cache.aset(key, roles, ROLES_TIMEOUT)
+    return roles
+
+
+def invalidate_roles(user_ids):
+    """
+    Start a new roles version for the users once the current transaction
+    commits, so the next lookup reloads them. Entries under the old version
+    are left to expire.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    version = uuid.uuid4().hex
+    transaction.on_commit(
+        lambda: cache.set_many({_version_key(user_id): version for user_id in user_ids}, None)
+    )
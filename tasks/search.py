@@ -0,0 +1,96 @@
+from django.db import connection
+from django.db.models import Case, Exists, F, FloatField, OuterRef, Q, Value, When
+from django.db.models.functions import Coalesce
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from elevanalog.search import SEARCH_CONFIG, prefix_tsquery, search_terms
+from .models import Task, TaskComment
+
+# Matches in a task's title outrank its description, which outrank its comments
+COMMENT_MATCH_WEIGHT = 0.1
+
+
+def _postgres():
+    return connection.vendor == 'postgresql'
+
+
+def update_task_search_vectors(task_ids):
+    """Recompute the title/description vectors of the given tasks (Postgres only)."""
+    if not _postgres() or not task_ids:
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    Task.objects.filter(pk__in=list(task_ids)).update(
+        search_vector=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        )
+    )
+
+
+def update_comment_search_vectors(comment_ids):
+    if not _postgres() or not comment_ids:
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    TaskComment.objects.filter(pk__in=list(comment_ids)).update(
+        search_vector=SearchVector('text', config=SEARCH_CONFIG)
+    )
+
+
+def search_tasks(queryset, text):
+    """
+    Tasks in `queryset` matching every word of `text` (the last one as a
+    prefix) in their title, description or comments, annotated with a
+    search_rank. Filtering an already visibility-scoped queryset keeps
+    results within what the user may see.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+    if _postgres():
+        return _search_postgres(queryset, terms)
+    return _search_fallback(queryset, terms)
+
+
+def _search_postgres(queryset, terms):
+    from django.contrib.postgres.search import SearchQuery, SearchRank
+
+    query = SearchQuery(prefix_tsquery(terms), search_type='raw', config=SEARCH_CONFIG)
+    comment_match = Exists(TaskComment.objects.filter(task=OuterRef('pk'), search_vector__matches=query))
+    return (
+        queryset
+        .annotate(comment_match=comment_match)
+        .filter(Q(search_vector__matches=query) | Q(comment_match=True))
+        .annotate(search_rank=Coalesce(SearchRank(F('search_vector'), query), Value(0.0))
+                  + _weight(Q(comment_match=True), COMMENT_MATCH_WEIGHT))
+    )
+
+
+def _search_fallback(queryset, terms):
+    # SQLite and friends: icontains per word, so local tests exercise the same
+    # filter and ordering even though it can't use an index
+    condition = Q()
+    rank = Value(0.0, output_field=FloatField())
+    for term in terms:
+        in_comments = Exists(TaskComment.objects.filter(task=OuterRef('pk'), text__icontains=term))
+        condition &= Q(title__icontains=term) | Q(description__icontains=term) | in_comments
+        rank = rank + _weight(Q(title__icontains=term), 1.0) + _weight(Q(description__icontains=term), 0.4)
+    return queryset.filter(condition).annotate(search_rank=rank)
+
+
+def _weight(condition, weight):
+    return Case(When(condition, then=Value(weight)), default=Value(0.0), output_field=FloatField())
+
+
+class TaskSearchFilter(BaseFilterBackend):
+    """
+    Full-text replacement for SearchFilter on the task list, reading the same
+    ?search= parameter. With no explicit ?ordering= the paginator orders
+    matches by search_rank.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        return search_tasks(queryset, request.query_params.get(self.search_param, ''))
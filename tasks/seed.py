@@ -0,0 +1,169 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from accountability.models import TaskAccountability
+from organizations.models import Membership, Organization
+from teams.models import Team, TeamMembership
+from .models import RecurrenceRule, Task, TaskComment
+from .counters import rebuild_counters
+from .recurrence import parse_rule
+from .search import update_comment_search_vectors, update_task_search_vectors
+from .visibility import sync_task_visibility
+
+User = get_user_model()
+
+
+def seed_tasks(users=100, organizations=5, teams_per_org=4, tasks_per_user=50, partners_per_task=1,
+               comments_per_task=0, trial_share=0.0, prefix='seed', chunk_size=5000, rng=None):
+    """
+    Bulk-create a synthetic workload: users spread over organizations and
+    teams, tasks for every user (a third personal, the rest org or team work),
+    accountability partners and comments, with the visibility index built to
+    match. `trial_share` of the users are on a trial, half of them expired.
+    Returns the created users.
+    """
+    rng = rng or random.Random(0)
+    now = timezone.now()
+
+    def user(i):
+        on_trial = rng.random() < trial_share
+        return User(
+            username=f'{prefix}-user-{i}', email=f'{prefix}-user-{i}@example.com', password='!',
+            is_on_trial=on_trial,
+            trial_ends_at=now + timedelta(days=rng.choice([-1, 1]) * rng.randint(1, 14)) if on_trial else None,
+        )
+
+    user_objs = User.objects.bulk_create([user(i) for i in range(users)], batch_size=chunk_size)
+    orgs = Organization.objects.bulk_create([
+        Organization(name=f'{prefix}-org-{i}') for i in range(organizations)
+    ])
+    teams = Team.objects.bulk_create([
+        Team(name=f'{prefix}-team-{o.pk}-{i}', organization=o) for o in orgs for i in range(teams_per_org)
+    ])
+
+    org_of, team_of = {}, {}
+    memberships, team_memberships = [], []
+    for index, user in enumerate(user_objs):
+        org = orgs[index % len(orgs)] if orgs else None
+        if org is None:
+            continue
+        org_of[user.pk] = org
+        role = 'admin' if index < len(orgs) else ('manager' if index % 10 == 0 else 'member')
+        memberships.append(Membership(user=user, organization=org, role=role))
+        org_teams = [t for t in teams if t.organization_id == org.pk]
+        if org_teams:
+            team = team_of[user.pk] = rng.choice(org_teams)
+            team_memberships.append(TeamMembership(user=user, team=team, role='member'))
+    Membership.objects.bulk_create(memberships, batch_size=chunk_size)
+    TeamMembership.objects.bulk_create(team_memberships, batch_size=chunk_size)
+
+    statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+    priorities = [choice for choice, _ in Task.PRIORITY_CHOICES]
+    pending = []
+
+    def flush():
+        created = Task.objects.bulk_create(pending, batch_size=chunk_size)
+        partners = []
+        for task in created:
+            for partner in rng.sample(user_objs, min(partners_per_task, len(user_objs))):
+                if partner.pk != task.owner_id:
+                    partners.append(TaskAccountability(task=task, partner=partner))
+        TaskAccountability.objects.bulk_create(partners, batch_size=chunk_size, ignore_conflicts=True)
+        comments = TaskComment.objects.bulk_create([
+            TaskComment(task=task, author=rng.choice(user_objs), text=f'{prefix} comment {i} on {task.title}')
+            for task in created for i in range(comments_per_task)
+        ], batch_size=chunk_size)
+        sync_task_visibility(created)
+        update_task_search_vectors([task.pk for task in created])
+        update_comment_search_vectors([comment.pk for comment in comments])
+        pending.clear()
+
+    for user in user_objs:
+        for i in range(tasks_per_user):
+            org = org_of.get(user.pk) if i % 3 else None
+            team = team_of.get(user.pk) if org and i % 3 == 2 else None
+            pending.append(Task(
+                title=f'{prefix} task {i}',
+                owner=user,
+                assignee=rng.choice(user_objs) if org and rng.random() < 0.3 else None,
+                organization=org,
+                team=team,
+                status=rng.choice(statuses),
+                priority=rng.choice(priorities),
+                due_date=now + timedelta(days=rng.randint(-30, 30), hours=rng.randint(0, 23)),
+            ))
+            if len(pending) >= chunk_size:
+                flush()
+    if pending:
+        flush()
+    rebuild_counters([user.pk for user in user_objs])
+
+    return user_objs
+
+
+def seed_large_org(users=5000, teams=200, tasks=1_000_000, comments=5_000_000, partners_per_task=3,
+                   prefix='bench', chunk_size=5000, rng=None):
+    """
+    One organization at the scale the hot paths have to hold up at: by default
+    5k members in 200 teams, 1M tasks, 5M comments and three accountability
+    partners per task. Task and comment totals are spread evenly per user and
+    per task. Returns the created users.
+    """
+    return seed_tasks(
+        users=users,
+        organizations=1,
+        teams_per_org=teams,
+        tasks_per_user=max(tasks // max(users, 1), 1),
+        partners_per_task=partners_per_task,
+        comments_per_task=comments // max(tasks, 1),
+        trial_share=0.1,
+        prefix=prefix,
+        chunk_size=chunk_size,
+        rng=rng,
+    )
+
+
+RECURRENCE_RULES = [
+    'FREQ=DAILY',
+    'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR',
+    'FREQ=WEEKLY;BYDAY=MO',
+    'FREQ=WEEKLY;INTERVAL=2;BYDAY=FR',
+    'FREQ=MONTHLY;BYMONTHDAY=1',
+    'FREQ=DAILY;COUNT=30',
+]
+
+
+def seed_recurring(definitions=100_000, users=1000, prefix='recur', chunk_size=5000, rng=None):
+    """
+    Bulk-create `definitions` recurring template tasks with a mix of daily,
+    weekday, weekly and monthly rules, each due to be materialized from now
+    on. Returns the created rules.
+    """
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    user_objs = User.objects.bulk_create([
+        User(username=f'{prefix}-user-{i}', email=f'{prefix}-user-{i}@example.com', password='!')
+        for i in range(users)
+    ], batch_size=chunk_size)
+
+    rules = []
+    for start in range(0, definitions, chunk_size):
+        templates = Task.objects.bulk_create([
+            Task(title=f'{prefix} recurring task {i}', owner=rng.choice(user_objs), is_recurring=True,
+                 due_date=now - timedelta(days=rng.randint(0, 60), hours=rng.randint(0, 23)))
+            for i in range(start, min(start + chunk_size, definitions))
+        ])
+        sync_task_visibility(templates)
+        chunk = []
+        for task in templates:
+            text = rng.choice(RECURRENCE_RULES)
+            chunk.append(RecurrenceRule(
+                template=task, rule=text, dtstart=task.due_date,
+                next_occurrence=parse_rule(text, task.due_date).after(now),
+            ))
+        rules += RecurrenceRule.objects.bulk_create(chunk)
+    rebuild_counters([user.pk for user in user_objs])
+    return rules
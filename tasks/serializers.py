@@ -1,24 +1,73 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Task, TaskAttachment, TaskComment
-from users.serializers import UserSerializer
+from django.utils import timezone
+from .attachments import ALLOWED_CONTENT_TYPES, SNIFF_BYTES, sniff_content_type, store_attachment
+from .counters import partners_changed
+from .models import AttachmentUpload, Task, TaskAttachment, TaskComment
+from .permissions import get_permission_context
+from .recurrence import parse_rule, set_recurrence
+from .signals import partners_added, refresh_tasks
+from elevanalog.instrumentation import TimedSerializerMixin
+from users.serializers import CompactUserSerializer
 from accountability.models import TaskAccountability
 from teams.models import Team
 from teams.serializers import LimitedTeamSerializer
 
 User = get_user_model()
 
-class TaskCommentSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+class TaskCommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    author = CompactUserSerializer(read_only=True)
 
     class Meta:
         model = TaskComment
         fields = ['id', 'author', 'text', 'created_at', 'task']
         read_only_fields = ['author', 'created_at', 'task']
 
-class TaskSerializer(serializers.ModelSerializer):
-    owner = UserSerializer(read_only=True)
-    assignee = UserSerializer(read_only=True)
+class TaskAttachmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    uploaded_by = CompactUserSerializer(read_only=True)
+
+    class Meta:
+        model = TaskAttachment
+        fields = ['id', 'task', 'filename', 'content_type', 'size', 'thumbnail_url', 'uploaded_by', 'uploaded_at']
+        read_only_fields = fields
+
+
+class AttachmentUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    attachment = TaskAttachmentSerializer(read_only=True)
+
+    class Meta:
+        model = AttachmentUpload
+        fields = ['id', 'task', 'filename', 'size', 'sha256', 'status', 'error', 'attachment', 'created_at']
+        read_only_fields = ['id', 'task', 'status', 'error', 'attachment', 'created_at']
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or any(c not in '0123456789abcdef' for c in value)):
+            raise serializers.ValidationError("Expected a hex-encoded SHA-256 digest.")
+        return value
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Size must be positive.")
+        if value > settings.ATTACHMENT_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"File size too large. Maximum size is {settings.ATTACHMENT_MAX_SIZE // (1024 * 1024)}MB."
+            )
+        return value
+
+
+class UploadPartSerializer(serializers.Serializer):
+    number = serializers.IntegerField(min_value=1)
+    etag = serializers.CharField(max_length=255)
+
+
+class CompleteUploadSerializer(serializers.Serializer):
+    parts = UploadPartSerializer(many=True, allow_empty=False)
+
+class TaskSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    owner = CompactUserSerializer(read_only=True)
+    assignee = CompactUserSerializer(read_only=True)
     team = LimitedTeamSerializer(read_only=True)
     assignee_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), source='assignee', write_only=True, required=False, allow_null=True
@@ -30,49 +79,52 @@ class TaskSerializer(serializers.ModelSerializer):
     accountability_partners = serializers.ListField(
         child=serializers.EmailField(), write_only=True, required=False
     )
+    # An RRULE such as "FREQ=WEEKLY;BYDAY=MO"; blank stops the task repeating
+    recurrence_rule = serializers.CharField(write_only=True, required=False, allow_blank=True, max_length=500)
     can_edit = serializers.SerializerMethodField()
 
     class Meta:
         model = Task
-        fields = '__all__'
+        exclude = ['search_vector']
         read_only_fields = ['owner', 'completed_at']
 
     def get_can_edit(self, obj):
-        user = self.context['request'].user
+        request = self.context['request']
         # Check if the user is the task owner or an admin/manager in the task's organization
-        if not user.is_authenticated:
+        if not request.user.is_authenticated:
             return False
-        if obj.owner == user:
-            return True
-        if obj.organization is None:
-            return False
-        return user.membership_set.filter(
-            organization=obj.organization, role__in=['admin', 'manager']
-        ).exists()
+        return get_permission_context(request).can_edit(obj)
 
     def validate_attachment_file(self, value):
-        MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 MB
-        ALLOWED_MIME_TYPES = [
-            'image/jpeg',
-            'image/png',
-            'image/gif',
-            'image/svg+xml',
-            'application/pdf',
-            'text/plain'
-        ]
-
-        if value.size > MAX_FILE_SIZE:
-            raise serializers.ValidationError("File size too large. Maximum size is 5MB.")
-        
-        if value.content_type not in ALLOWED_MIME_TYPES:
+        if value.size > settings.ATTACHMENT_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"File size too large. Maximum size is {settings.ATTACHMENT_MAX_SIZE // (1024 * 1024)}MB."
+            )
+
+        # Judge the type by the content, not the client's Content-Type
+        value.seek(0)
+        value.content_type = sniff_content_type(value.read(SNIFF_BYTES))
+        value.seek(0)
+        if value.content_type not in ALLOWED_CONTENT_TYPES:
             raise serializers.ValidationError("Unsupported file type. Allowed types are JPG, PNG, GIF, SVG, PDF, and TXT.")
-        
+
+        return value
+
+    def validate_recurrence_rule(self, value):
+        if value:
+            try:
+                parse_rule(value, timezone.now())
+            except ValueError as exc:
+                raise serializers.ValidationError(f"Invalid recurrence rule: {exc}")
         return value
 
     def create(self, validated_data):
         user = self.context['request'].user
         attachment_file = validated_data.pop('attachment_file', None)
         partner_emails = validated_data.pop('accountability_partners', [])
+        recurrence_rule = validated_data.pop('recurrence_rule', '')
+        if recurrence_rule:
+            validated_data['is_recurring'] = True
 
         # Enforce limit for non-premium users
         if not user.has_premium_access and len(partner_emails) > 1:
@@ -82,26 +134,21 @@ class TaskSerializer(serializers.ModelSerializer):
         task = super().create(validated_data)
 
         if attachment_file:
-            TaskAttachment.objects.create(
-                task=task,
-                file=attachment_file,
-                uploaded_by=user
-            )
+            store_attachment(task, user, attachment_file)
+
+        if recurrence_rule:
+            set_recurrence(task, recurrence_rule)
         
         if partner_emails:
-            for email in partner_emails:
-                try:
-                    partner_user = User.objects.get(email=email)
-                    TaskAccountability.objects.create(task=task, partner=partner_user)
-                except User.DoesNotExist:
-                    # Silently ignore if a user with the email doesn't exist
-                    pass
+            # Emails that don't belong to a user are skipped and reported back
+            task._unmatched_partner_emails = self._set_accountability_partners(task, partner_emails)
         
         return task
 
     def update(self, instance, validated_data):
         user = self.context['request'].user
         partner_emails = validated_data.pop('accountability_partners', None)
+        recurrence_rule = validated_data.pop('recurrence_rule', None)
 
         if partner_emails is not None:
             # Enforce limit for non-premium users
@@ -109,12 +156,50 @@ class TaskSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Free users can only add one accountability partner per task.")
 
             # Full replacement of accountability partners on update
-            instance.accountability_partnerships.all().delete()
-            for email in partner_emails:
-                try:
-                    partner_user = User.objects.get(email=email)
-                    TaskAccountability.objects.create(task=instance, partner=partner_user)
-                except User.DoesNotExist:
-                    pass
+            instance._unmatched_partner_emails = self._set_accountability_partners(
+                instance, partner_emails, replace=True
+            )
         
-        return super().update(instance, validated_data)
\ No newline at end of file
+        if recurrence_rule is not None:
+            validated_data['is_recurring'] = bool(recurrence_rule)
+        instance = super().update(instance, validated_data)
+        if recurrence_rule is not None:
+            set_recurrence(instance, recurrence_rule)
+        return instance
+
+    def _set_accountability_partners(self, task, partner_emails, replace=False):
+        """
+        Attach the users with the given emails as accountability partners using one
+        lookup, one bulk insert and (with replace) one delete. Returns the emails
+        that didn't match a user.
+        """
+        emails = list(dict.fromkeys(partner_emails))
+        partner_ids = dict(User.objects.filter(email__in=emails).values_list('email', 'pk'))
+        wanted = set(partner_ids.values())
+
+        existing = set()
+        if replace:
+            existing = set(task.accountability_partnerships.values_list('partner_id', flat=True))
+            removed = existing - wanted
+            if removed:
+                task.accountability_partnerships.filter(partner_id__in=removed).delete()
+
+        added = wanted - existing
+        if added:
+            TaskAccountability.objects.bulk_create(
+                [TaskAccountability(task=task, partner_id=partner_id) for partner_id in added],
+                ignore_conflicts=True,
+            )
+            # bulk_create skips post_save, so update the counters and visibility index here
+            partners_changed(task.pk, added=added)
+            refresh_tasks([task])
+            partners_added.send(sender=Task, task=task, partner_ids=added, actor=self.context['request'].user)
+
+        return [email for email in emails if email not in partner_ids]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        unmatched = getattr(instance, '_unmatched_partner_emails', None)
+        if unmatched is not None:
+            data['unmatched_partner_emails'] = unmatched
+        return data
\ No newline at end of file
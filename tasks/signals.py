@@ -1,19 +1,237 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .cache import invalidate_audiences, invalidate_embedding_tasks
+from .comments import comment_removed, comments_added
+from .counters import (
+    apply_deltas, load_states, partners_changed, rebuild_team_counters, task_deltas, task_state,
+)
+from .models import AttachmentBlob, Task, TaskAttachment, TaskComment, TaskVisibility
+from .roles import get_roles, get_roles_many, invalidate_roles
+from .search import update_comment_search_vectors, update_task_search_vectors
+from .visibility import audiences_in, sync_task_visibility, user_key
+from accountability.models import AccountabilityPartner, TaskAccountability
+from organizations.models import Membership
+from teams.models import Team, TeamMembership
+
+User = get_user_model()
+
+# Sent for writes that skip post_save, so other apps can react to them too.
+# Tasks carry an `_actor` attribute when the writing user is known.
+tasks_bulk_written = Signal()  # sender=Task, created, updated
+partners_added = Signal()  # sender=Task, task, partner_ids, actor
+comments_bulk_created = Signal()  # sender=TaskComment, comments
 
-from accountability import apps
-from .models import Task
-from accountability.models import AccountabilityPartner
 
 @receiver(post_save, sender=Task)
 def auto_add_manager_as_partner(sender, instance, created, **kwargs):
     if created and instance.assignee and instance.owner != instance.assignee:
         # Find if owner is manager/admin in same org
-        Membership = apps.get_model('organizations', 'Membership')
-        owner_membership = Membership.objects.filter(user=instance.owner, organization=instance.organization).first()
-        if owner_membership and owner_membership.role in ['manager', 'admin']:
+        owner_role = get_roles(instance.owner_id)[0].get(instance.organization_id)
+        if owner_role in ['manager', 'admin']:
             AccountabilityPartner.objects.get_or_create(
                 requester=instance.assignee,
                 partner=instance.owner,
                 defaults={'status': 'accepted'}
-            )
\ No newline at end of file
+            )
+
+
+def refresh_tasks(tasks):
+    """
+    Sync the visibility index for the tasks and drop cached task responses for
+    every audience that could see them before or after.
+    """
+    changes = sync_task_visibility(tasks)
+    invalidate_audiences(audiences_in(changes))
+    return changes
+
+
+@receiver(post_save, sender=Task)
+def update_task_visibility(sender, instance, **kwargs):
+    refresh_tasks([instance])
+
+
+@receiver(post_save, sender=Task)
+def update_task_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'title', 'description'} & set(update_fields):
+        update_task_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=TaskComment)
+def update_comment_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        update_comment_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=TaskComment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        comments_added([instance])
+
+
+@receiver(post_delete, sender=TaskComment)
+def uncount_comment(sender, instance, origin=None, **kwargs):
+    # Nothing to recount when the task itself is being deleted
+    if getattr(origin, 'model', type(origin)) is not Task:
+        comment_removed(instance)
+
+
+@receiver(post_init, sender=Task)
+def remember_counter_state(sender, instance, **kwargs):
+    # What the task counted towards when loaded, so saves can apply deltas
+    instance._counter_state = task_state(instance)
+
+
+@receiver(pre_save, sender=Task)
+def load_counter_state(sender, instance, **kwargs):
+    # Loaded with deferred fields: read the stored state before it's overwritten
+    if not instance._state.adding and getattr(instance, '_counter_state', None) is None:
+        instance._counter_state = load_states([instance.pk]).get(instance.pk)
+
+
+@receiver(post_save, sender=Task)
+def update_task_counters(sender, instance, created, **kwargs):
+    before = None if created else instance._counter_state
+    after = task_state(instance) or load_states([instance.pk]).get(instance.pk)
+    if before != after:
+        apply_deltas(task_deltas([(before, after)]))
+    instance._counter_state = after
+
+
+@receiver(post_delete, sender=Task)
+def remove_task_counters(sender, instance, **kwargs):
+    # Partnerships were deleted (and uncounted) by the cascade before this runs
+    apply_deltas(task_deltas([(task_state(instance), None)]))
+
+
+@receiver(pre_delete, sender=Task)
+def invalidate_deleted_task(sender, instance, **kwargs):
+    invalidate_audiences(TaskVisibility.objects.filter(task=instance).values_list('audience', flat=True))
+
+
+@receiver(post_save, sender=TaskAccountability)
+def add_partner_visibility(sender, instance, created, **kwargs):
+    if created:
+        partners_changed(instance.task_id, added=[instance.partner_id])
+    refresh_tasks([instance.task])
+
+
+@receiver(post_delete, sender=TaskAccountability)
+def remove_partner_visibility(sender, instance, **kwargs):
+    # Synced after commit so that when the task itself is being deleted the
+    # cascade has finished and no rows get re-created for it
+    task_id = instance.task_id
+    partners_changed(task_id, removed=[instance.partner_id])
+    transaction.on_commit(lambda: refresh_tasks(Task.objects.filter(pk=task_id)))
+
+
+@receiver(post_save, sender=TaskAttachment)
+def reference_blob(sender, instance, created, **kwargs):
+    if created and instance.blob_id:
+        AttachmentBlob.objects.filter(pk=instance.blob_id).update(ref_count=F('ref_count') + 1, released_at=None)
+
+
+@receiver(post_delete, sender=TaskAttachment)
+def release_blob(sender, instance, **kwargs):
+    # Also runs for attachments deleted along with their task; the blob itself
+    # is left for gc_attachment_blobs
+    if instance.blob_id:
+        AttachmentBlob.objects.filter(pk=instance.blob_id).update(
+            ref_count=F('ref_count') - 1, released_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+@receiver(post_save, sender=TeamMembership)
+@receiver(post_delete, sender=TeamMembership)
+def invalidate_member(sender, instance, **kwargs):
+    # Index rows are keyed by organization/team, so only the member's own
+    # cached responses are affected
+    invalidate_roles([instance.user_id])
+    invalidate_audiences([user_key(instance.user_id)])
+
+
+# The user fields embedded in task payloads (CompactUserSerializer)
+EMBEDDED_USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'avatar', 'avatar_40_url')
+
+
+def _embedded_profile(user):
+    # Deferred fields read as None rather than being loaded
+    return tuple(user.__dict__.get(field) for field in EMBEDDED_USER_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_embedded_profile(sender, instance, **kwargs):
+    instance._embedded_profile = _embedded_profile(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_embedded_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Cached responses and ETags of task lists carry the owner's and
+    # assignee's names and avatars, which don't touch the tasks
+    if update_fields is not None and not set(update_fields) & set(EMBEDDED_USER_FIELDS):
+        return
+    profile = _embedded_profile(instance)
+    if not created and profile != instance._embedded_profile:
+        invalidate_embedding_tasks(user_ids=[instance.pk])
+    instance._embedded_profile = profile
+
+
+@receiver(post_save, sender=Team)
+def invalidate_embedded_team(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_embedding_tasks(team_ids=[instance.pk])
+
+
+@receiver(post_save, sender=TeamMembership)
+@receiver(post_delete, sender=TeamMembership)
+def update_member_team_counters(sender, instance, **kwargs):
+    rebuild_team_counters(instance.user_id)
+
+
+def tasks_written_in_bulk(created=(), updated=()):
+    """
+    Side effects post_save would have had for tasks written with
+    bulk_create/bulk_update, applied with a fixed number of queries.
+    """
+    created, updated = list(created), list(updated)
+
+    # auto_add_manager_as_partner for the whole batch
+    assigned = [
+        task for task in created
+        if task.assignee_id and task.owner_id != task.assignee_id and task.organization_id
+    ]
+    if assigned:
+        roles = get_roles_many({task.owner_id for task in assigned})
+        AccountabilityPartner.objects.bulk_create(
+            [
+                AccountabilityPartner(requester_id=task.assignee_id, partner_id=task.owner_id, status='accepted')
+                for task in assigned
+                if roles[task.owner_id][0].get(task.organization_id) in ['manager', 'admin']
+            ],
+            ignore_conflicts=True,
+        )
+
+    apply_deltas(task_deltas(
+        [(None, task_state(task)) for task in created]
+        + [(task._counter_state, task_state(task)) for task in updated]
+    ))
+    for task in created + updated:
+        task._counter_state = task_state(task)
+
+    update_task_search_vectors([task.pk for task in created + updated])
+    refresh_tasks(created + updated)
+    tasks_bulk_written.send(sender=Task, created=created, updated=updated)
+
+
+def comments_written_in_bulk(comments):
+    """Side effects post_save would have had for comments written with bulk_create."""
+    comments = list(comments)
+    comments_added(comments)
+    update_comment_search_vectors([comment.pk for comment in comments])
+    comments_bulk_created.send(sender=TaskComment, comments=comments)
@@ -0,0 +1,78 @@
+import logging
+
+from celery import shared_task
+from django.contrib.auth import get_user_model
+
+from .attachments import expire_stale_uploads, finish_upload
+from .counters import count_tasks, rebuild_counters, stored_counts
+from .recurrence import materialize_occurrences
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+COUNTER_RECONCILE_BATCH_SIZE = 500
+
+
+@shared_task
+def reconcile_task_counters(batch_size=COUNTER_RECONCILE_BATCH_SIZE):
+    """
+    Compare every user's stored task counters with counts from the source
+    tables and rebuild the ones that drifted (writes that bypass signals,
+    such as queryset updates or a team's tasks being unlinked on delete).
+    Also backfills counters for users that have none yet.
+    """
+    checked = repaired = 0
+    last_pk = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            break
+        expected = count_tasks(user_ids)
+        stored = stored_counts(user_ids)
+        drifted = {key[0] for key in expected.keys() ^ stored.keys()}
+        drifted |= {key[0] for key in expected.keys() & stored.keys() if expected[key] != stored[key]}
+        if drifted:
+            rebuild_counters(drifted)
+        checked += len(user_ids)
+        repaired += len(drifted)
+        last_pk = user_ids[-1]
+
+    if repaired:
+        logger.warning("Task counters drifted for %s of %s users; rebuilt", repaired, checked)
+    return f"Checked task counters for {checked} users, rebuilt {repaired}."
+
+
+@shared_task
+def process_attachment_upload(upload_pk):
+    """
+    Assemble a completed chunked upload, sniff its content type and thumbnail
+    images (see tasks.attachments.finish_upload), off the request path.
+    """
+    attachment = finish_upload(upload_pk)
+    if attachment is None:
+        return f"Upload {upload_pk} did not produce an attachment."
+    return f"Upload {upload_pk} stored as attachment {attachment.pk}."
+
+
+@shared_task
+def expire_attachment_uploads():
+    """
+    Abort abandoned pending uploads and fail ones stuck processing (see
+    tasks.attachments.expire_stale_uploads).
+    """
+    expired, timed_out = expire_stale_uploads()
+    return f"Expired {expired} pending uploads, timed out {timed_out} processing uploads."
+
+
+@shared_task
+def materialize_recurring_tasks():
+    """
+    Create the occurrences of recurring tasks due within the next
+    RECURRENCE_HORIZON_DAYS (see tasks.recurrence). Safe to run while a
+    previous run is still going.
+    """
+    rules, occurrences = materialize_occurrences()
+    return f"Materialized {occurrences} occurrences for {rules} recurrence rules."
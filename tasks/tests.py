@@ -1,3 +1,754 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Value
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accountability.models import TaskAccountability
+from elevanalog.instrumentation import QueryBudgetTestMixin
+from elevanalog.pagination import KeysetPagination
+from organizations.models import Membership, Organization
+from teams.models import Team, TeamMembership
+from .attachments import expire_stale_uploads, finish_upload, part_count
+from .cache import cache_stats
+from .counters import count_tasks, stored_counts, summary
+from .models import AttachmentBlob, AttachmentUpload, Task, TaskAttachment, TaskComment
+from .recurrence import materialize_occurrences, set_recurrence
+from .serializers import TaskSerializer
+from .views import TaskCommentViewSet, TaskViewSet
+from .visibility import audience_of, live_visible_tasks, visible_tasks
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TaskPermissionContextTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user(username='manager', email='manager@example.com', password='pass')
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        self.organization = Organization.objects.create(name='Acme')
+        self.membership = Membership.objects.create(user=self.manager, organization=self.organization, role='manager')
+
+    def _can_edit(self, tasks):
+        request = APIRequestFactory().get('/api/tasks/')
+        request.user = self.manager
+        serializer = TaskSerializer(context={'request': request})
+        return [serializer.get_can_edit(task) for task in tasks]
+
+    def test_can_edit_query_count_does_not_grow_with_tasks(self):
+        for count in (5, 50):
+            tasks = [
+                Task.objects.create(title=f'Task {i}', owner=self.owner, organization=self.organization)
+                for i in range(count)
+            ]
+            cache.clear()
+            # Two queries for the user's organization and team roles, however many tasks
+            with self.assertNumQueries(2):
+                results = self._can_edit(tasks)
+            self.assertTrue(all(results))
+
+    def test_roles_are_cached_across_requests_until_membership_changes(self):
+        task = Task.objects.create(title='Task', owner=self.owner, organization=self.organization)
+        self.assertEqual(self._can_edit([task]), [True])
+        with self.assertNumQueries(0):
+            self.assertEqual(self._can_edit([task]), [True])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.membership.role = 'member'
+            self.membership.save()
+        self.assertEqual(self._can_edit([task]), [False])
+
+
+class TaskVisibilityIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='viewer', email='viewer@example.com', password='pass')
+        self.owner = User.objects.create_user(username='lead', email='lead@example.com', password='pass')
+        self.organization = Organization.objects.create(name='Acme')
+        Membership.objects.create(user=self.owner, organization=self.organization, role='admin')
+        self.org_task = Task.objects.create(title='Org', owner=self.owner, organization=self.organization)
+        self.assigned = Task.objects.create(title='Assigned', owner=self.owner, assignee=self.user)
+        self.partnered = Task.objects.create(title='Partnered', owner=self.owner)
+        TaskAccountability.objects.create(task=self.partnered, partner=self.user)
+        self.private = Task.objects.create(title='Private', owner=self.owner)
+
+    def _indexed(self, user):
+        return set(visible_tasks(audience_of(user)).values_list('title', flat=True))
+
+    def test_index_matches_the_live_query_as_access_changes(self):
+        self.assertEqual(self._indexed(self.user), {'Assigned', 'Partnered'})
+        # Joining the organization writes no index rows, only a membership
+        Membership.objects.create(user=self.user, organization=self.organization, role='member')
+        self.assertEqual(self._indexed(self.user), {'Org', 'Assigned', 'Partnered'})
+        self.assertEqual(self._indexed(self.user), set(live_visible_tasks(self.user).values_list('title', flat=True)))
+
+        self.partnered.accountability_partnerships.all().delete()
+        self.assigned.assignee = None
+        self.assigned.save()
+        self.assertEqual(self._indexed(self.user), {'Org'})
+
+    def test_rebuild_command_repairs_drift_that_check_reports(self):
+        # A write that bypasses signals leaves the index behind
+        Task.objects.filter(pk=self.private.pk).update(assignee=self.user)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_task_visibility', '--check', stdout=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_task_visibility', stdout=out)
+        self.assertIn('1 task(s) updated', out.getvalue())
+        call_command('rebuild_task_visibility', '--check', stdout=StringIO())
+        self.assertIn('Private', self._indexed(self.user))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='pager', email='pager@example.com', password='pass')
+        day = timezone.now().replace(microsecond=0)
+        # Shared due dates and NULLs, which an offset on the due date alone would mis-page
+        due_dates = [day, day, None, day + timedelta(days=1), None, day - timedelta(days=1), day]
+        self.tasks = [
+            Task.objects.create(title=f'Task {i}', owner=self.user, due_date=due_date)
+            for i, due_date in enumerate(due_dates)
+        ]
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _page(self, url):
+        response = self.client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_walk_forwards_and_backwards_with_nulls_last(self):
+        expected = [
+            task.pk for task in sorted(self.tasks, key=lambda t: (t.due_date is None, t.due_date or 0, t.pk))
+        ]
+        pages, url = [], '/api/tasks/?ordering=due_date&page_size=2'
+        while url:
+            page = self._page(url)
+            pages.append([task['id'] for task in page['results']])
+            url = page['next']
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+        # Following previous links from the last page returns the same pages
+        backwards, url = [], page['previous']
+        while url:
+            page = self._page(url)
+            backwards.insert(0, [task['id'] for task in page['results']])
+            url = page['previous']
+        self.assertEqual(backwards, pages[:-1])
+
+    def test_descending_order_puts_nulls_last_too(self):
+        results = self._page('/api/tasks/?ordering=-due_date&page_size=10')['results']
+        self.assertEqual([task['due_date'] is None for task in results], [False] * 5 + [True] * 2)
+
+    def test_searched_querysets_default_to_rank_order(self):
+        request = APIRequestFactory().get('/api/tasks/')
+        queryset = Task.objects.annotate(search_rank=Value(1.0))
+        self.assertEqual(KeysetPagination().get_ordering(request, queryset, None), ('search_rank', True))
+        self.assertEqual(KeysetPagination().get_ordering(request, Task.objects.all(), None), ('created_at', True))
+
+    def test_garbled_cursor_is_a_404(self):
+        response = self.client.get('/api/tasks/?cursor=not-a-cursor', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+
+class AccountabilityPartnerAssignmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='planner', email='planner@example.com', password='pass',
+                                             is_premium=True)
+        self.partners = {
+            name: User.objects.create_user(username=name, email=f'{name}@example.com', password='pass')
+            for name in ('ada', 'bo', 'cy')
+        }
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _partners(self, task_id):
+        return set(TaskAccountability.objects.filter(task_id=task_id).values_list('partner__username', flat=True))
+
+    def test_partners_are_diffed_on_update_and_unmatched_emails_reported(self):
+        response = self.client.post('/api/tasks/', {
+            'title': 'Shared',
+            'accountability_partners': ['ada@example.com', 'bo@example.com', 'nobody@example.com', 'ada@example.com'],
+        }, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['unmatched_partner_emails'], ['nobody@example.com'])
+        task_id = response.json()['id']
+        self.assertEqual(self._partners(task_id), {'ada', 'bo'})
+        kept = TaskAccountability.objects.get(task_id=task_id, partner=self.partners['bo']).pk
+
+        response = self.client.patch(f'/api/tasks/{task_id}/', {
+            'accountability_partners': ['bo@example.com', 'cy@example.com'],
+        }, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unmatched_partner_emails'], [])
+        self.assertEqual(self._partners(task_id), {'bo', 'cy'})
+        # Unchanged partners keep their row; removed ones lose access
+        self.assertTrue(TaskAccountability.objects.filter(pk=kept).exists())
+        self.assertFalse(visible_tasks(audience_of(self.partners['ada'])).filter(pk=task_id).exists())
+        self.assertTrue(visible_tasks(audience_of(self.partners['cy'])).filter(pk=task_id).exists())
+
+    def test_free_users_get_one_partner(self):
+        self.user.is_premium = False
+        self.user.save()
+        response = self.client.post('/api/tasks/', {
+            'title': 'Shared', 'accountability_partners': ['ada@example.com', 'bo@example.com'],
+        }, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.filter(title='Shared').exists())
+
+
+class ListQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='member', email='member@example.com', password='pass')
+        self.organization = Organization.objects.create(name='Acme')
+        Membership.objects.create(user=self.user, organization=self.organization, role='member')
+        self.task = None
+
+    def _create_rows(self, count):
+        for i in range(count):
+            owner = User.objects.create_user(username=f'owner{i}-{count}', email=f'owner{i}-{count}@example.com', password='pass')
+            self.task = Task.objects.create(
+                title=f'Task {i}', owner=owner, assignee=self.user, organization=self.organization
+            )
+            TaskComment.objects.create(task=self.task, author=owner, text='Looks good')
+
+    def _count_queries(self, view, url, **kwargs):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_task_list_query_count_does_not_grow_with_tasks(self):
+        view = TaskViewSet.as_view({'get': 'list'})
+        self._create_rows(3)
+        baseline = self._count_queries(view, '/api/tasks/')
+        self._create_rows(9)
+        self.assertEqual(self._count_queries(view, '/api/tasks/'), baseline)
+
+    def test_comment_list_query_count_does_not_grow_with_comments(self):
+        view = TaskCommentViewSet.as_view({'get': 'list'})
+        self._create_rows(1)
+        task = self.task
+        baseline = self._count_queries(view, f'/api/tasks/{task.pk}/comments/', task_pk=task.pk)
+        for i in range(9):
+            TaskComment.objects.create(task=task, author=self.user, text=f'Comment {i}')
+        self.assertEqual(self._count_queries(view, f'/api/tasks/{task.pk}/comments/', task_pk=task.pk), baseline)
+
+
+class BulkTaskTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bulker', email='bulker@example.com', password='pass')
+        self.other = User.objects.create_user(username='bystander', email='bystander@example.com', password='pass')
+        self.mine = Task.objects.create(title='Mine', owner=self.user)
+        self.theirs = Task.objects.create(title='Theirs', owner=self.other)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _bulk(self, body):
+        return self.client.post('/api/tasks/bulk/', body, content_type='application/json', headers=self.headers)
+
+    def test_valid_operations_are_written_and_failures_reported_per_item(self):
+        response = self._bulk({'operations': [
+            {'op': 'create', 'data': {'title': 'New'}},
+            {'op': 'update', 'id': self.mine.pk, 'data': {'status': 'completed'}},
+            {'op': 'update', 'id': self.theirs.pk, 'data': {'title': 'Hijacked'}},
+            {'op': 'transition', 'id': self.mine.pk},
+            {'op': 'create', 'data': {'title': 'Assigned', 'assignee_id': self.other.pk}},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['succeeded'], body['failed']), (2, 3))
+        self.assertEqual([result['status'] for result in body['results']], ['ok', 'ok', 'error', 'error', 'error'])
+        self.assertEqual(body['results'][2]['errors'], {'detail': "Not found."})
+        self.assertIn('status', body['results'][3]['errors'])
+
+        self.assertTrue(Task.objects.filter(title='New', owner=self.user).exists())
+        self.assertFalse(Task.objects.filter(title='Assigned').exists())
+        self.theirs.refresh_from_db()
+        self.assertEqual(self.theirs.title, 'Theirs')
+        # An update to completed stamps completed_at like a transition does
+        self.mine.refresh_from_db()
+        self.assertEqual(self.mine.status, 'completed')
+        self.assertIsNotNone(self.mine.completed_at)
+
+    def test_body_must_be_an_object_with_operations(self):
+        self.assertEqual(self._bulk([{'op': 'create', 'data': {'title': 'New'}}]).status_code, 400)
+        self.assertEqual(self._bulk({'operations': []}).status_code, 400)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    query_budgets = settings.QUERY_BUDGETS
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='budget', email='budget@example.com', password='pass')
+        self.organization = Organization.objects.create(name='Acme')
+        Membership.objects.create(user=self.user, organization=self.organization, role='member')
+        for i in range(20):
+            task = Task.objects.create(title=f'Task {i}', owner=self.user, organization=self.organization)
+            TaskComment.objects.create(task=task, author=self.user, text='Noted')
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def test_endpoints_stay_within_their_query_budgets(self):
+        for url in ('/api/tasks/', '/api/tasks/my-today/', '/api/tasks/summary/', '/api/users/me/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, headers=self.headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinQueryBudget(response)
+
+    def test_serialization_is_timed_separately_from_rendering(self):
+        metrics = self.client.get('/api/tasks/', headers=self.headers).request_metrics
+        self.assertGreater(metrics.serializer_time, 0)
+        self.assertGreater(metrics.render_time, 0)
+        self.assertLess(metrics.serializer_time + metrics.render_time, metrics.total_time)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TaskResponseCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cached', email='cached@example.com', password='pass')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pass')
+        self.view = TaskViewSet.as_view({'get': 'list'})
+
+    def _list(self):
+        request = APIRequestFactory().get('/api/tasks/')
+        force_authenticate(request, user=self.user)
+        return self.view(request)
+
+    def test_list_is_served_from_cache_until_a_visible_task_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title='First', owner=self.user)
+
+        self.assertEqual(len(self._list().data['results']), 1)
+        self.assertEqual(len(self._list().data['results']), 1)
+        self.assertEqual(cache_stats()['hits'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'Renamed'
+            task.save()
+        self.assertEqual(self._list().data['results'][0]['title'], 'Renamed')
+
+        # Someone else's private task doesn't touch this user's cache
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Private', owner=self.other)
+        self._list()
+        self.assertEqual(cache_stats(), {'hits': 2, 'misses': 2, 'hit_ratio': 0.5})
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='poller', email='poller@example.com', password='pass')
+        self.task = Task.objects.create(title='Watched', owner=self.user)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _get(self, url, etag=None):
+        headers = {**self.headers, 'If-None-Match': etag} if etag else self.headers
+        return self.client.get(url, headers=headers)
+
+    def test_list_and_detail_answer_304_until_something_they_show_changes(self):
+        for url in ('/api/tasks/', f'/api/tasks/{self.task.pk}/'):
+            with self.subTest(url=url):
+                response = self._get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Last-Modified', response)
+                etag = response['ETag']
+                self.assertEqual(self._get(url, etag).status_code, 304)
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    TaskComment.objects.create(task=self.task, author=self.user, text=f'Seen {url}')
+                changed = self._get(url, etag)
+                self.assertEqual(changed.status_code, 200)
+                self.assertNotEqual(changed['ETag'], etag)
+
+    def test_renaming_an_embedded_user_changes_the_list(self):
+        etag = self._get('/api/tasks/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Renamed'
+            self.user.save()
+        response = self._get('/api/tasks/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['owner']['first_name'], 'Renamed')
+
+
+class TaskExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='exporter', email='exporter@example.com', password='pass')
+        self.partner = User.objects.create_user(username='partner', email='partner@example.com', password='pass')
+        self.task = Task.objects.create(title='Quarterly, report', owner=self.user)
+        TaskAccountability.objects.create(task=self.task, partner=self.partner)
+        TaskComment.objects.create(task=self.task, author=self.user, text='Draft attached')
+        Task.objects.create(title='Not mine', owner=self.partner)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _export(self, query='', **headers):
+        response = self.client.get(f'/api/tasks/export/{query}', headers={**self.headers, **headers})
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_is_the_default_whatever_the_client_accepts(self):
+        for accept in ('application/json', '*/*', 'application/x-ndjson'):
+            with self.subTest(accept=accept):
+                response, body = self._export(Accept=accept)
+                self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+                records = [json.loads(line) for line in body.splitlines()]
+                self.assertEqual([record['title'] for record in records], ['Quarterly, report'])
+                self.assertEqual(records[0]['accountability_partners'],
+                                 [{'id': self.partner.pk, 'email': 'partner@example.com'}])
+                self.assertEqual([comment['text'] for comment in records[0]['comments']], ['Draft attached'])
+
+    def test_csv_by_format_or_accept(self):
+        for query, headers in (('?format=csv', {}), ('', {'Accept': 'text/csv'})):
+            with self.subTest(query=query, headers=headers):
+                response, body = self._export(query, **headers)
+                self.assertTrue(response['Content-Type'].startswith('text/csv'))
+                header, row = list(csv.reader(StringIO(body)))
+                row = dict(zip(header, row))
+                self.assertEqual(row['title'], 'Quarterly, report')
+                self.assertEqual(json.loads(row['accountability_partners']), ['partner@example.com'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TaskSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', email='searcher@example.com', password='pass')
+        self.other = User.objects.create_user(username='stranger', email='stranger@example.com', password='pass')
+        self.view = TaskViewSet.as_view({'get': 'list'})
+
+    def _search(self, term):
+        request = APIRequestFactory().get('/api/tasks/', {'search': term})
+        force_authenticate(request, user=self.user)
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        return [task['title'] for task in response.data['results']]
+
+    def test_search_matches_title_description_and_comments_within_visible_tasks(self):
+        Task.objects.create(title='Budget', description='Draft the quarterly numbers', owner=self.user)
+        Task.objects.create(title='Quarterly report', owner=self.user)
+        commented = Task.objects.create(title='Offsite', owner=self.user)
+        TaskComment.objects.create(task=commented, author=self.user, text='Agenda for the quarterly review')
+        Task.objects.create(title='Groceries', owner=self.user)
+        Task.objects.create(title='Quarterly secrets', owner=self.other)
+
+        # Prefix match on the last word; title matches rank first
+        results = self._search('quarter')
+        self.assertEqual(results[0], 'Quarterly report')
+        self.assertCountEqual(results, ['Quarterly report', 'Budget', 'Offsite'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AsyncTaskListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='async', email='async@example.com', password='pass')
+        self.organization = Organization.objects.create(name='Acme')
+        Membership.objects.create(user=self.user, organization=self.organization, role='admin')
+        for i in range(3):
+            Task.objects.create(title=f'Task {i}', owner=self.user, organization=self.organization)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def test_async_list_matches_sync_list(self):
+        sync = await self.async_client.get('/api/tasks/', headers=self.headers)
+        response = await self.async_client.get('/api/async/tasks/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], sync.json()['results'])
+        self.assertEqual(response['ETag'], sync['ETag'])
+
+        not_modified = await self.async_client.get(
+            '/api/async/tasks/', headers={**self.headers, 'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    async def test_async_list_requires_a_token(self):
+        response = await self.async_client.get('/api/async/tasks/')
+        self.assertEqual(response.status_code, 401)
+
+
+class TaskCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='boss', email='boss@example.com', password='pass')
+        self.worker = User.objects.create_user(username='worker', email='worker@example.com', password='pass')
+        self.partner = User.objects.create_user(username='buddy', email='buddy@example.com', password='pass')
+        self.organization = Organization.objects.create(name='Acme')
+        self.team = Team.objects.create(name='Ops', organization=self.organization)
+        TeamMembership.objects.create(user=self.worker, team=self.team, role='member')
+        self.users = [self.owner.pk, self.worker.pk, self.partner.pk]
+
+    def assertCountersMatchSource(self):
+        self.assertEqual(stored_counts(self.users), count_tasks(self.users))
+
+    def test_counters_follow_task_partner_and_membership_changes(self):
+        mine = Task.objects.create(title='Mine', owner=self.owner)
+        delegated = Task.objects.create(
+            title='Delegated', owner=self.owner, assignee=self.worker,
+            organization=self.organization, team=self.team,
+        )
+        TaskAccountability.objects.create(task=delegated, partner=self.partner)
+        self.assertCountersMatchSource()
+
+        delegated.status = 'in_progress'
+        delegated.save()
+        mine.assignee = self.worker
+        mine.save()
+        self.assertCountersMatchSource()
+
+        TeamMembership.objects.create(user=self.partner, team=self.team, role='member')
+        TaskAccountability.objects.filter(task=delegated).delete()
+        self.assertCountersMatchSource()
+
+        delegated.delete()
+        self.assertCountersMatchSource()
+        self.assertEqual(summary(self.worker)['assigned'], {
+            'pending': 1, 'in_progress': 0, 'completed': 0, 'total': 1,
+        })
+
+
+class CommentCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(username='commenter', email='commenter@example.com', password='pass')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pass')
+        self.mine = Task.objects.create(title='Mine', owner=self.user)
+        self.partnered = Task.objects.create(title='Partnered', owner=self.other)
+        self.private = Task.objects.create(title='Private', owner=self.other)
+        TaskAccountability.objects.create(task=self.partnered, partner=self.user)
+
+    def test_batch_comments_and_deletes_keep_counts(self):
+        stale = Task.objects.for_write().get(pk=self.mine.pk)
+        first = TaskComment.objects.create(task=self.mine, author=self.user, text='First')
+
+        request = self.factory.post('/api/tasks/comments/batch/', {'comments': [
+            {'task': self.mine.pk, 'text': 'Second'},
+            {'task': self.partnered.pk, 'text': 'Checking in'},
+            {'task': self.private.pk, 'text': 'Not allowed'},
+            {'task': self.mine.pk},
+        ]}, format='json')
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = TaskCommentViewSet.as_view({'post': 'batch'})(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (2, 2))
+        self.assertEqual([r['status'] for r in response.data['results']], ['ok', 'ok', 'error', 'error'])
+        # One query each for the tasks and partnerships, however many tasks
+        self.assertEqual(sum('accountability' in q['sql'] for q in queries.captured_queries), 1)
+
+        request = self.factory.post('/api/tasks/comments/batch/', [{'task': self.mine.pk}], format='json')
+        force_authenticate(request, user=self.user)
+        self.assertEqual(TaskCommentViewSet.as_view({'post': 'batch'})(request).status_code, 400)
+
+        # Saving a task loaded for writing before the comments doesn't reset its count
+        stale.title = 'Renamed'
+        stale.save()
+        self.mine.refresh_from_db()
+        self.partnered.refresh_from_db()
+        self.private.refresh_from_db()
+        self.assertEqual((self.mine.title, self.mine.comment_count), ('Renamed', 2))
+        self.assertEqual(self.partnered.comment_count, 1)
+        self.assertEqual((self.private.comment_count, self.private.last_comment_at), (0, None))
+        second = TaskComment.objects.get(task=self.mine, text='Second')
+        self.assertEqual(self.mine.last_comment_at, second.created_at)
+
+        second.delete()
+        self.mine.refresh_from_db()
+        self.assertEqual((self.mine.comment_count, self.mine.last_comment_at), (1, first.created_at))
+
+
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='repeater', email='repeater@example.com', password='pass')
+        # The first occurrence falls later today
+        self.start = (timezone.now() - timedelta(days=1, minutes=-1)).replace(microsecond=0)
+        self.template = Task.objects.create(title='Standup notes', owner=self.user, due_date=self.start)
+
+    def test_materialization_is_idempotent_and_bounded_by_horizon(self):
+        rule = set_recurrence(self.template, 'FREQ=DAILY')
+        self.assertTrue(self.template.is_recurring)
+        horizon = self.start + timedelta(days=3, hours=1)
+
+        self.assertEqual(materialize_occurrences(horizon), (1, 3))
+        self.assertEqual(materialize_occurrences(horizon), (0, 0))
+        occurrences = Task.objects.filter(recurrence=rule).order_by('occurrence_start')
+        self.assertEqual(
+            [task.due_date for task in occurrences],
+            [self.start + timedelta(days=n) for n in (1, 2, 3)],
+        )
+        self.assertEqual({task.title for task in occurrences}, {'Standup notes'})
+        rule.refresh_from_db()
+        self.assertEqual(rule.next_occurrence, self.start + timedelta(days=4))
+
+        # Only materialized occurrences are visible
+        request = APIRequestFactory().get('/api/tasks/my-today/')
+        force_authenticate(request, user=self.user)
+        response = TaskViewSet.as_view({'get': 'my_today'})(request)
+        self.assertEqual([task['recurrence'] for task in response.data], [rule.pk])
+
+        set_recurrence(self.template, '')
+        rule.refresh_from_db()
+        self.assertIsNone(rule.next_occurrence)
+        self.assertEqual(materialize_occurrences(horizon), (0, 0))
+
+        # Turning it back on continues after the occurrences it already made
+        self.assertEqual(set_recurrence(self.template, 'FREQ=DAILY'), rule)
+        self.assertEqual(materialize_occurrences(horizon + timedelta(days=1)), (1, 1))
+        self.assertEqual(rule.occurrences.count(), 4)
+
+    def test_expansion_resumes_from_now(self):
+        self.template.due_date = self.start - timedelta(days=30)
+        self.template.save()
+        rule = set_recurrence(self.template, 'FREQ=DAILY')
+        self.assertGreater(rule.next_occurrence, timezone.now())
+        self.assertLessEqual(rule.next_occurrence, timezone.now() + timedelta(days=1))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AttachmentUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, ATTACHMENT_PART_SIZE=8)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='uploader', email='uploader@example.com', password='pass')
+        self.task = Task.objects.create(title='Report', owner=self.user)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _upload(self, filename, content):
+        response = self.client.post(
+            f'/api/tasks/{self.task.pk}/attachment-uploads/', {'filename': filename, 'size': len(content)},
+            content_type='application/json', headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 201)
+        upload = response.json()
+        parts = []
+        for part in upload['parts']:
+            start = (part['number'] - 1) * 8
+            put = self.client.put(part['url'], content[start:start + 8],
+                                  content_type='application/octet-stream', headers=self.headers)
+            self.assertEqual(put.status_code, 200)
+            parts.append({'number': part['number'], 'etag': put['ETag']})
+
+        response = self.client.post(f'/api/attachment-uploads/{upload["id"]}/complete/', {'parts': parts},
+                                    content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'processing')
+        finish_upload(upload['id'])
+        return self.client.get(f'/api/attachment-uploads/{upload["id"]}/', headers=self.headers).json()
+
+    def test_parts_are_assembled_and_typed_by_content(self):
+        content = b'%PDF-1.4\n' + b'x' * 30
+        upload = self._upload('scan.png', content)
+        self.assertEqual(upload['status'], 'complete')
+        self.assertEqual(upload['attachment']['content_type'], 'application/pdf')
+        self.assertEqual(upload['attachment']['size'], len(content))
+        attachment = TaskAttachment.objects.get(task=self.task)
+        with attachment.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_disallowed_content_is_rejected_whatever_its_name(self):
+        upload = self._upload('notes.txt', b'MZ\x90\x00\x03\x00\x00\x00\x04\x00')
+        self.assertEqual(upload['status'], 'failed')
+        self.assertFalse(TaskAttachment.objects.filter(task=self.task).exists())
+
+    def test_identical_content_is_stored_once_and_collected_when_unreferenced(self):
+        content = b'%PDF-1.4\n' + b'y' * 20
+        self._upload('first.pdf', content)
+        response = self.client.post(
+            f'/api/tasks/{self.task.pk}/attachment-uploads/',
+            {'filename': 'second.pdf', 'size': len(content), 'sha256': hashlib.sha256(content).hexdigest()},
+            content_type='application/json', headers=self.headers,
+        )
+        self.assertEqual((response.json()['status'], response.json()['parts']), ('complete', []))
+        blob = AttachmentBlob.objects.get()
+
+        # Someone who can't see the content has to send it all
+        outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='pass')
+        theirs = Task.objects.create(title='Elsewhere', owner=outsider)
+        response = self.client.post(
+            f'/api/tasks/{theirs.pk}/attachment-uploads/',
+            {'filename': 'copy.pdf', 'size': len(content), 'sha256': hashlib.sha256(content).hexdigest()},
+            content_type='application/json', headers={'Authorization': f'Bearer {AccessToken.for_user(outsider)}'},
+        )
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(len(response.json()['parts']), part_count(len(content)))
+        self.assertEqual(blob.ref_count, 2)
+        path = os.path.join(settings.MEDIA_ROOT, blob.key)
+        self.assertTrue(os.path.exists(path))
+
+        self.task.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        call_command('gc_attachment_blobs', grace_hours=0, stdout=StringIO())
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_abandoned_and_stuck_uploads_expire(self):
+        started = self.client.post(
+            f'/api/tasks/{self.task.pk}/attachment-uploads/', {'filename': 'draft.pdf', 'size': 20},
+            content_type='application/json', headers=self.headers,
+        ).json()
+        recent = self.client.post(
+            f'/api/tasks/{self.task.pk}/attachment-uploads/', {'filename': 'fresh.pdf', 'size': 20},
+            content_type='application/json', headers=self.headers,
+        ).json()
+        AttachmentUpload.objects.filter(pk=started['id']).update(updated_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(expire_stale_uploads(), (1, 0))
+        self.assertEqual(AttachmentUpload.objects.get(pk=started['id']).status, 'failed')
+        self.assertEqual(AttachmentUpload.objects.get(pk=recent['id']).status, 'pending')
+
+        AttachmentUpload.objects.filter(pk=recent['id']).update(
+            status='processing', updated_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(expire_stale_uploads(), (0, 1))
+        self.assertIsNone(finish_upload(recent['id']))
+        self.assertEqual(AttachmentUpload.objects.get(pk=recent['id']).status, 'failed')
+
+    def test_download_checks_visibility_and_serves_ranges(self):
+        content = b'%PDF-1.4\n' + bytes(range(32, 96))
+        attachment = self._upload('manual.pdf', content)['attachment']
+        url = f'/api/tasks/{self.task.pk}/attachments/{attachment["id"]}/download/'
+
+        response = self.client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        self.assertIn('manual.pdf', response['Content-Disposition'])
+
+        partial = self.client.get(url, headers={**self.headers, 'Range': 'bytes=4-11'})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial['Content-Range'], f'bytes 4-11/{len(content)}')
+        self.assertEqual(b''.join(partial.streaming_content), content[4:12])
+
+        stale = self.client.get(url, headers={**self.headers, 'Range': 'bytes=4-11', 'If-Range': '"other"'})
+        self.assertEqual(stale.status_code, 200)
+        beyond = self.client.get(url, headers={**self.headers, 'Range': f'bytes={len(content)}-'})
+        self.assertEqual(beyond.status_code, 416)
+        cached = self.client.get(url, headers={**self.headers, 'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='pass')
+        denied = self.client.get(url, headers={'Authorization': f'Bearer {AccessToken.for_user(outsider)}'})
+        self.assertEqual(denied.status_code, 404)
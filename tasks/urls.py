@@ -1,12 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, TaskCommentViewSet
+from . import async_views
+from .views import AttachmentUploadViewSet, TaskAttachmentViewSet, TaskViewSet, TaskCommentViewSet
 
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    # Async read endpoints for ASGI deployments (see tasks.async_views)
+    path('async/tasks/', async_views.task_list, name='async-task-list'),
+    path('async/tasks/my-today/', async_views.my_today, name='async-task-my-today'),
+    path('async/tasks/<int:task_pk>/comments/', async_views.comment_list, name='async-task-comment-list'),
+    path('tasks/comments/batch/', TaskCommentViewSet.as_view({
+        'post': 'batch'
+    }), name='task-comment-batch'),
     path('tasks/<int:task_pk>/comments/', TaskCommentViewSet.as_view({
         'get': 'list',
         'post': 'create'
@@ -17,4 +25,21 @@ urlpatterns = [
         'patch': 'partial_update',
         'delete': 'destroy'
     })),
-]
\ No newline at end of file
+    # Chunked attachment uploads (see tasks.attachments)
+    path('tasks/<int:task_pk>/attachment-uploads/', AttachmentUploadViewSet.as_view({
+        'post': 'create'
+    }), name='attachment-upload-create'),
+    path('attachment-uploads/<uuid:pk>/', AttachmentUploadViewSet.as_view({
+        'get': 'retrieve',
+        'delete': 'destroy'
+    }), name='attachment-upload-detail'),
+    path('attachment-uploads/<uuid:pk>/parts/<int:number>/', AttachmentUploadViewSet.as_view({
+        'put': 'upload_part'
+    }), name='attachment-upload-part'),
+    path('attachment-uploads/<uuid:pk>/complete/', AttachmentUploadViewSet.as_view({
+        'post': 'complete'
+    }), name='attachment-upload-complete'),
+    path('tasks/<int:task_pk>/attachments/<int:pk>/download/', TaskAttachmentViewSet.as_view({
+        'get': 'download'
+    }), name='task-attachment-download'),
+]
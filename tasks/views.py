@@ -1,27 +1,59 @@
-from datetime import date
-from django.db.models import Q
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Task, TaskComment
-from .serializers import TaskSerializer, TaskCommentSerializer
+from rest_framework import filters, mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from elevanalog.conditional import make_etag, not_modified, queryset_etag, set_validators
+from elevanalog.downloads import file_response, offload_response
+from elevanalog.pagination import KeysetPagination
+from elevanalog.prefetch import apply_prefetch_plan
+from elevanalog.uploads import get_upload_storage
+from .attachments import DOWNLOAD_URL_EXPIRES, part_count, part_urls, start_upload
+from .bulk import MAX_BULK_COMMENTS, MAX_BULK_OPERATIONS, BulkCommentWriter, BulkTaskWriter
+from .cache import cache_stats, cached_response, request_generation
+from .comments import COMMENT_AGGREGATES
+from .counters import summary
+from .export import (
+    CSVRenderer, ExportContentNegotiation, NDJSONRenderer, csv_lines, export_queryset, ndjson_lines,
+)
+from .models import AttachmentUpload, Task, TaskAttachment, TaskComment
+from .permissions import get_permission_context
+from .roles import get_roles
+from .search import TaskSearchFilter
+from .serializers import (
+    AttachmentUploadSerializer, CompleteUploadSerializer, TaskCommentSerializer, TaskSerializer,
+)
+from .tasks import process_attachment_upload
+from .visibility import OPEN_STATUSES, due_on, tasks_for_user
 
 
 class TaskCommentViewSet(viewsets.ModelViewSet):
     serializer_class = TaskCommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ['created_at']
 
     def get_queryset(self):
-        return TaskComment.objects.filter(task_id=self.kwargs['task_pk']).select_related('author')
+        queryset = TaskComment.objects.filter(task_id=self.kwargs['task_pk'])
+        return apply_prefetch_plan(queryset, self.get_serializer_class())
 
     def perform_create(self, serializer):
-        task = Task.objects.get(pk=self.kwargs['task_pk'])
+        task = get_object_or_404(Task, pk=self.kwargs['task_pk'])
         user = self.request.user
 
-        is_owner = task.owner == user
-        is_org_member = task.organization and user.membership_set.filter(organization=task.organization).exists()
-        is_accountability_partner = task.accountability_partnerships.filter(partner=user).exists()
-        is_team_member = task.team and user.team_memberships.filter(team=task.team).exists()
-
-        if not (is_owner or is_org_member or is_accountability_partner or is_team_member):
+        if not get_permission_context(self.request).can_comment(task):
             raise PermissionDenied("You do not have permission to comment on this task.")
 
         serializer.save(author=user, task=task)
@@ -31,61 +63,210 @@ class TaskCommentViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You can only delete your own comments.")
         instance.delete()
 
+    def batch(self, request):
+        """
+        Post many comments, across any number of tasks, in one call:
+
+            {"comments": [{"task": 12, "text": "..."}, {"task": 13, "text": "..."}]}
+
+        Allowed comments are written in a single transaction; each item gets
+        its own result so callers can retry the ones that failed.
+        """
+        comments = request.data.get('comments') if isinstance(request.data, dict) else None
+        if not isinstance(comments, list) or not comments:
+            raise ValidationError({'comments': "Expected a non-empty list of comments."})
+        if len(comments) > MAX_BULK_COMMENTS:
+            raise ValidationError({'comments': f"At most {MAX_BULK_COMMENTS} comments per request."})
+
+        results = BulkCommentWriter(request).run(comments)
+        failed = sum(1 for result in results if result['status'] == 'error')
+        return Response({'succeeded': len(results) - failed, 'failed': failed, 'results': results})
+
+
+class AttachmentUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+                              viewsets.GenericViewSet):
+    """
+    Chunked attachment uploads. Create one with the file's name and size, PUT
+    each part to the URL returned for it, then POST the parts' ETags to
+    complete. Assembly, content sniffing and thumbnails happen in a Celery
+    task; poll the upload until it is complete (or failed).
+    """
+    serializer_class = AttachmentUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return AttachmentUpload.objects.filter(uploaded_by=self.request.user).select_related(
+            'attachment__uploaded_by'
+        )
+
+    def create(self, request, *args, **kwargs):
+        task = get_object_or_404(Task, pk=self.kwargs['task_pk'])
+        permissions = get_permission_context(request)
+        if not permissions.can_comment(task):
+            raise PermissionDenied("You do not have permission to add attachments to this task.")
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = start_upload(task, permissions, serializer.validated_data['filename'],
+                              serializer.validated_data['size'], serializer.validated_data.get('sha256', ''))
+
+        data = self.get_serializer(upload).data
+        data['part_size'] = settings.ATTACHMENT_PART_SIZE
+        # Content the user can already see (matched by sha256) needs no parts
+        data['parts'] = [] if upload.status == 'complete' else part_urls(
+            upload, lambda number: request.build_absolute_uri(
+                reverse('attachment-upload-part', kwargs={'pk': upload.pk, 'number': number})
+            )
+        )
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def upload_part(self, request, pk=None, number=None):
+        # Only for storages that don't take parts directly (LocalUploadStorage)
+        upload = self.get_object()
+        storage = get_upload_storage()
+        if storage.direct_parts:
+            return Response({'detail': "Parts of this upload go straight to storage."},
+                            status=status.HTTP_409_CONFLICT)
+        if upload.status != 'pending':
+            return Response({'detail': "This upload is no longer accepting parts."}, status=status.HTTP_409_CONFLICT)
+        if not 1 <= number <= part_count(upload.size):
+            raise ValidationError({'number': "No such part for this upload."})
+        if int(request.META.get('CONTENT_LENGTH') or 0) > settings.ATTACHMENT_PART_SIZE:
+            raise ValidationError({'detail': f"Parts are at most {settings.ATTACHMENT_PART_SIZE} bytes."})
+
+        etag = storage.write_part(upload.key, upload.upload_id, number, request.stream or BytesIO())
+        # Keeps expire_stale_uploads off uploads that are still receiving parts
+        AttachmentUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+        response = Response({'number': number, 'etag': etag})
+        response['ETag'] = f'"{etag}"'
+        return response
+
+    @transaction.atomic
+    def complete(self, request, pk=None):
+        upload = self.get_object()
+        serializer = CompleteUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        parts = sorted(serializer.validated_data['parts'], key=lambda part: part['number'])
+        if [part['number'] for part in parts] != list(range(1, part_count(upload.size) + 1)):
+            raise ValidationError({'parts': f"Expected parts 1 to {part_count(upload.size)}."})
+
+        started = AttachmentUpload.objects.filter(pk=upload.pk, status='pending').update(
+            status='processing', updated_at=timezone.now(),
+            parts=[{'number': part['number'], 'etag': part['etag'].strip('"')} for part in parts],
+        )
+        if not started:
+            return Response({'detail': "This upload has already been completed."}, status=status.HTTP_409_CONFLICT)
+        transaction.on_commit(lambda: process_attachment_upload.delay(str(upload.pk)))
+        upload.refresh_from_db()
+        return Response(self.get_serializer(upload).data, status=status.HTTP_202_ACCEPTED)
+
+    def perform_destroy(self, instance):
+        if instance.status == 'processing':
+            raise ValidationError({'detail': "The upload is being processed."})
+        if instance.status == 'pending':
+            get_upload_storage().abort(instance.key, instance.upload_id)
+        instance.delete()
+
+
+class TaskAttachmentViewSet(viewsets.GenericViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # Attachments of tasks the user can see; anything else is a 404
+        return TaskAttachment.objects.filter(
+            task_id=self.kwargs['task_pk'], task__in=tasks_for_user(get_permission_context(self.request)),
+        ).select_related('blob')
+
+    def download(self, request, task_pk=None, pk=None):
+        """
+        The attachment's content, with ETag/Last-Modified, conditional
+        requests and single byte ranges. Depending on the deployment the
+        bytes come from a storage redirect, the front server
+        (ATTACHMENT_SENDFILE) or a stream from this worker.
+        """
+        attachment = self.get_object()
+        etag = (quote_etag(attachment.blob.sha256) if attachment.blob
+                else make_etag(attachment.pk, attachment.file.name, attachment.uploaded_at))
+        response = not_modified(request, etag, attachment.uploaded_at)
+        if response is not None:
+            return response
+
+        storage = get_upload_storage()
+        key = attachment.file.name
+        filename = attachment.filename or os.path.basename(key)
+        content_type = attachment.content_type or 'application/octet-stream'
+        url = storage.download_url(key, filename, DOWNLOAD_URL_EXPIRES)
+        if url:
+            response = HttpResponseRedirect(url)
+        elif settings.ATTACHMENT_SENDFILE == 'x-accel-redirect':
+            response = offload_response(
+                'x-accel-redirect', settings.ATTACHMENT_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + key,
+                content_type, filename,
+            )
+        elif settings.ATTACHMENT_SENDFILE == 'x-sendfile' and hasattr(storage, 'path'):
+            response = offload_response('x-sendfile', storage.path(key), content_type, filename)
+        else:
+            size = attachment.size if attachment.size is not None else storage.size(key)
+            response = file_response(request, storage.open(key), size, content_type, filename,
+                                     etag, attachment.uploaded_at)
+        response['Cache-Control'] = 'private'
+        return set_validators(response, etag, attachment.uploaded_at)
+
 
 class TaskViewSet(viewsets.ModelViewSet):
     queryset = Task.objects.select_related('owner', 'assignee').all()
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description']
+    filter_backends = [TaskSearchFilter, filters.OrderingFilter]
     ordering_fields = ['due_date', 'priority', 'created_at']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        user = self.request.user
         task_type = self.request.query_params.get('task_type')
         priority = self.request.query_params.get('priority')
         due_date = self.request.query_params.get('due_date')
 
-        queryset = None
-
-        if task_type == 'owned_by_me':
-            # Tasks created by the user for themselves (or unassigned)
-            queryset = Task.objects.filter(owner=user).filter(Q(assignee=user) | Q(assignee__isnull=True)).distinct()
-
-        elif task_type == 'assigned_by_me':
-            # Tasks created by the user and assigned to someone else
-            queryset = Task.objects.filter(owner=user, assignee__isnull=False).exclude(assignee=user).distinct()
-
-        elif task_type == 'assigned':
-            # Tasks assigned to the user by others
-            queryset = Task.objects.filter(assignee=user).exclude(owner=user).distinct()
-        
-        elif task_type == 'accountability':
-            queryset = Task.objects.filter(accountability_partnerships__partner=user).distinct()
-
-        elif task_type == 'team':
-            user_teams = user.team_memberships.values_list('team_id', flat=True)
-            queryset = Task.objects.filter(team_id__in=list(user_teams)).distinct()
-
-        else:
-            # Default to all tasks somehow related to the user (broadest query)
-            org_ids = user.membership_set.values_list('organization_id', flat=True)
-            user_teams = user.team_memberships.values_list('team_id', flat=True)
-            queryset = Task.objects.filter(
-                Q(owner=user) |
-                Q(assignee=user) |
-                Q(organization_id__in=list(org_ids)) |
-                Q(team_id__in=list(user_teams)) |
-                Q(accountability_partnerships__partner=user)
-            ).distinct()
+        queryset = tasks_for_user(get_permission_context(self.request), task_type)
+        if self.action in ('update', 'partial_update'):
+            queryset = queryset.for_write()
 
         if priority:
             queryset = queryset.filter(priority=priority)
         if due_date:
-            queryset = queryset.filter(due_date__date=due_date)
+            day = parse_date(due_date) if isinstance(due_date, str) else None
+            if day is None:
+                raise ValidationError({'due_date': "Expected a date in YYYY-MM-DD format."})
+            queryset = queryset.filter(due_on(day))
+
+        return apply_prefetch_plan(queryset, self.get_serializer_class())
 
-        return queryset
+    def _validator_parts(self, request):
+        # The cache generation changes with the user's memberships, which can
+        # change can_edit without touching any task's updated_at
+        return request.user.pk, request_generation(request), sorted(request.query_params.lists())
 
+    def list(self, request, *args, **kwargs):
+        etag = queryset_etag(
+            self.filter_queryset(self.get_queryset()), *self._validator_parts(request),
+            aggregates=COMMENT_AGGREGATES,
+        )
+        response = not_modified(request, etag)
+        if response is None:
+            response = cached_response(
+                request, 'task-list', lambda: super(TaskViewSet, self).list(request, *args, **kwargs)
+            )
+        return set_validators(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(instance.pk, instance.updated_at, instance.comment_count, instance.last_comment_at,
+                         *self._validator_parts(request))
+        # No Last-Modified: comments and membership changes don't touch updated_at
+        response = not_modified(request, etag)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        return set_validators(response, etag)
+
+    @transaction.atomic
     def perform_create(self, serializer):
         user = self.request.user
         assignee = serializer.validated_data.get('assignee')
@@ -96,76 +277,41 @@ class TaskViewSet(viewsets.ModelViewSet):
             if not organization:
                 raise PermissionDenied("You cannot assign tasks outside of an organization.")
 
-            try:
-                creator_membership = Membership.objects.get(user=user, organization=organization)
-                assignee_membership = Membership.objects.get(user=assignee, organization=organization)
-
-                if creator_membership.role not in ['admin', 'manager']:
-                    raise PermissionDenied("You must be an admin or manager to assign tasks.")
-            
-            except Membership.DoesNotExist:
+            creator_role = get_permission_context(self.request).org_roles.get(organization.pk)
+            assignee_role = get_roles(assignee.pk)[0].get(organization.pk)
+            if creator_role is None or assignee_role is None:
                 raise PermissionDenied("Both you and the assignee must be members of the organization.")
+            if creator_role not in ['admin', 'manager']:
+                raise PermissionDenied("You must be an admin or manager to assign tasks.")
 
         serializer.save(owner=user)
 
+    @transaction.atomic
     def perform_update(self, serializer):
         instance = self.get_object()
-        user = self.request.user
 
         if instance.status == 'completed':
             raise PermissionDenied("Completed tasks cannot be updated.")
 
-        can_update = False
-        
-        # 1. Personal task (no org), only owner can edit
-        if not instance.organization and instance.owner == user:
-            can_update = True
-        
-        # 2. Team-assigned task
-        elif instance.team:
-            is_org_admin = OrgMembership.objects.filter(
-                user=user, 
-                organization=instance.team.organization, 
-                role='admin'
-            ).exists()
-            is_team_manager_or_assistant = TeamMembership.objects.filter(
-                user=user,
-                team=instance.team,
-                role__in=['manager', 'assistant']
-            ).exists()
-            if is_org_admin or is_team_manager_or_assistant:
-                can_update = True
-                
-        # 3. Org task not assigned to a team, only org admin can edit
-        elif instance.organization:
-             is_org_admin = OrgMembership.objects.filter(
-                 user=user, 
-                 organization=instance.organization, 
-                 role='admin'
-            ).exists()
-             if is_org_admin:
-                 can_update = True
-        
-        if not can_update:
+        # Personal tasks: owner only. Team tasks: org admin or team manager/assistant.
+        # Other org tasks: org admin only.
+        if not get_permission_context(self.request).can_update(instance):
             raise PermissionDenied("You do not have permission to edit this task.")
-            
+
+        # Recorded as the actor of the resulting activity events
+        serializer.instance._actor = self.request.user
         serializer.save()
 
+    @transaction.atomic
     def perform_destroy(self, instance):
-        user = self.request.user
+        permissions = get_permission_context(self.request)
 
-        if not instance.organization:
-            # Personal task: only owner can delete
-            if instance.owner != user:
+        if not permissions.can_delete(instance):
+            if not instance.organization_id:
+                # Personal task: only owner can delete
                 raise PermissionDenied("You do not have permission to delete this personal task.")
-        else:
             # Organization task: only admin can delete
-            is_admin = user.membership_set.filter(
-                organization=instance.organization,
-                role='admin'
-            ).exists()
-            if not is_admin:
-                raise PermissionDenied("You must be an admin to delete this task.")
+            raise PermissionDenied("You must be an admin to delete this task.")
 
         if instance.status == 'completed':
             raise PermissionDenied("Completed tasks cannot be deleted.")
@@ -173,6 +319,70 @@ class TaskViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='my-today')
     def my_today(self, request):
-        tasks = self.get_queryset().filter(due_date__date=date.today(), status__in=['pending', 'in_progress'])
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        today = timezone.localdate()
+        tasks = self.get_queryset().filter(due_on(today), status__in=OPEN_STATUSES)
+        etag = queryset_etag(
+            tasks, today, *self._validator_parts(request), aggregates=COMMENT_AGGREGATES
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        def build():
+            serializer = self.get_serializer(tasks, many=True)
+            return Response(serializer.data)
+
+        response = cached_response(request, f'task-my-today:{today.isoformat()}', build)
+        return set_validators(response, etag)
+
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[NDJSONRenderer, CSVRenderer],
+            content_negotiation_class=ExportContentNegotiation)
+    def export(self, request):
+        """
+        Stream every visible task (same filters as the list) with its comments
+        and accountability partners, as NDJSON or ?format=csv (or Accept:
+        text/csv); other Accept headers get NDJSON. Rows are read through a
+        server-side cursor, so memory use doesn't grow with the export.
+        """
+        tasks = export_queryset(self.filter_queryset(self.get_queryset()))
+        if request.accepted_renderer.format == 'csv':
+            response = StreamingHttpResponse(csv_lines(tasks), content_type='text/csv; charset=utf-8')
+            filename = 'tasks.csv'
+        else:
+            response = StreamingHttpResponse(ndjson_lines(tasks), content_type='application/x-ndjson')
+            filename = 'tasks.ndjson'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='summary', url_name='summary')
+    def task_summary(self, request):
+        """Task counts per task_type bucket and status, read from the maintained counters."""
+        return Response(summary(request.user))
+
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def response_cache_stats(self, request):
+        return Response(cache_stats())
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Create, partially update or transition many tasks in one call:
+
+            {"operations": [
+                {"op": "create", "data": {"title": "..."}},
+                {"op": "update", "id": 12, "data": {"priority": "high"}},
+                {"op": "transition", "id": 13, "status": "completed"}
+            ]}
+
+        Valid operations are written in a single transaction; each item gets
+        its own result so callers can retry the ones that failed.
+        """
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not operations:
+            raise ValidationError({'operations': "Expected a non-empty list of operations."})
+        if len(operations) > MAX_BULK_OPERATIONS:
+            raise ValidationError({'operations': f"At most {MAX_BULK_OPERATIONS} operations per request."})
+
+        results = BulkTaskWriter(request).run(operations)
+        failed = sum(1 for result in results if result['status'] == 'error')
+        return Response({'succeeded': len(results) - failed, 'failed': failed, 'results': results})
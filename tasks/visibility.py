@@ -0,0 +1,160 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from accountability.models import TaskAccountability
+from organizations.models import Membership
+from teams.models import TeamMembership
+from .models import Task, TaskVisibility
+
+# Audience keys name who a task is shared with: a user (owner, assignee,
+# accountability partner), an organization or a team. A user sees every task
+# shared with one of their own keys, so joining an organization or team never
+# rewrites index rows.
+
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+def org_key(organization_id):
+    return f'org:{organization_id}'
+
+
+def team_key(team_id):
+    return f'team:{team_id}'
+
+
+def user_audience(user_id, org_ids, team_ids):
+    return [user_key(user_id)] + [org_key(i) for i in org_ids] + [team_key(i) for i in team_ids]
+
+
+def audience_of(user):
+    """Audience keys for a user, read from their memberships."""
+    user_id = getattr(user, 'pk', user)
+    return user_audience(
+        user_id,
+        Membership.objects.filter(user_id=user_id).values_list('organization_id', flat=True),
+        TeamMembership.objects.filter(user_id=user_id).values_list('team_id', flat=True),
+    )
+
+
+def live_visible_tasks(user):
+    """
+    All tasks somehow related to the user, computed from the source tables.
+    This is the query the visibility index replaces; it is kept for rebuilds
+    and drift checks.
+    """
+    org_ids = Membership.objects.filter(user=user).values_list('organization_id', flat=True)
+    user_teams = TeamMembership.objects.filter(user=user).values_list('team_id', flat=True)
+    return Task.objects.filter(
+        Q(owner=user) |
+        Q(assignee=user) |
+        Q(organization_id__in=list(org_ids)) |
+        Q(team_id__in=list(user_teams)) |
+        Q(accountability_partnerships__partner=user)
+    ).distinct()
+
+
+def visible_tasks(audience):
+    """Tasks shared with any of the given audience keys, as one indexed semi-join."""
+    return Task.objects.filter(
+        Exists(TaskVisibility.objects.filter(task=OuterRef('pk'), audience__in=list(audience)))
+    )
+
+
+def tasks_for_user(permissions, task_type=None):
+    """
+    The task_type buckets of TaskViewSet for the user of a TaskPermissionContext.
+    Anything other than a known bucket means every task visible to the user.
+    """
+    user = permissions.user
+
+    if task_type == 'owned_by_me':
+        # Tasks created by the user for themselves (or unassigned)
+        return Task.objects.filter(owner=user).filter(Q(assignee=user) | Q(assignee__isnull=True)).distinct()
+
+    if task_type == 'assigned_by_me':
+        # Tasks created by the user and assigned to someone else
+        return Task.objects.filter(owner=user, assignee__isnull=False).exclude(assignee=user).distinct()
+
+    if task_type == 'assigned':
+        # Tasks assigned to the user by others
+        return Task.objects.filter(assignee=user).exclude(owner=user).distinct()
+
+    if task_type == 'accountability':
+        return Task.objects.filter(accountability_partnerships__partner=user).distinct()
+
+    if task_type == 'team':
+        return Task.objects.filter(team_id__in=list(permissions.team_roles)).distinct()
+
+    # Default to all tasks somehow related to the user (broadest query),
+    # read from the precomputed visibility index
+    return visible_tasks(permissions.audience)
+
+
+def due_on(day):
+    """
+    Tasks due on `day` in the current timezone, as a half-open range so the
+    due_date indexes can be used (due_date__date wraps the column in a cast).
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return Q(due_date__gte=start, due_date__lt=start + timedelta(days=1))
+
+
+OPEN_STATUSES = ['pending', 'in_progress']
+
+
+def _task_audiences(tasks):
+    # {task_id: audience keys the task should be shared with}
+    wanted = {}
+    for task in tasks:
+        keys = wanted[task.pk] = {user_key(task.owner_id)}
+        if task.assignee_id:
+            keys.add(user_key(task.assignee_id))
+        if task.organization_id:
+            keys.add(org_key(task.organization_id))
+        if task.team_id:
+            keys.add(team_key(task.team_id))
+
+    partners = TaskAccountability.objects.filter(task_id__in=wanted).values_list('partner_id', 'task_id')
+    for partner_id, task_id in partners:
+        wanted[task_id].add(user_key(partner_id))
+    return wanted
+
+
+def sync_task_visibility(tasks):
+    """
+    Bring the index rows of the given tasks in line with their owner,
+    assignee, organization, team and accountability partners.
+    Returns {task_id: (audience keys before, audience keys after)}.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return {}
+    wanted = _task_audiences(tasks)
+    current = {task_id: set() for task_id in wanted}
+    for audience, task_id in TaskVisibility.objects.filter(task_id__in=wanted).values_list('audience', 'task_id'):
+        current[task_id].add(audience)
+
+    stale = Q()
+    missing = []
+    for task_id, keys in wanted.items():
+        if current[task_id] - keys:
+            stale |= Q(task_id=task_id, audience__in=current[task_id] - keys)
+        missing += [TaskVisibility(task_id=task_id, audience=key) for key in keys - current[task_id]]
+    if stale:
+        TaskVisibility.objects.filter(stale).delete()
+    if missing:
+        TaskVisibility.objects.bulk_create(missing, ignore_conflicts=True, batch_size=1000)
+
+    return {task_id: (current[task_id], wanted[task_id]) for task_id in wanted}
+
+
+def audiences_in(changes):
+    """Every audience key that could see any of the changed tasks, before or after."""
+    keys = set()
+    for before, after in changes.values():
+        keys |= before | after
+    return keys
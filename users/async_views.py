@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+
+from elevanalog.async_api import async_api_view
+from elevanalog.conditional import make_etag, not_modified, set_validators
+from elevanalog.prefetch import apply_prefetch_plan
+from organizations.models import Membership
+from .serializers import UserSerializer
+
+User = get_user_model()
+
+
+def _users_for_me():
+    # Loaded with everything UserSerializer reads, so it never lazy-loads in the event loop
+    return apply_prefetch_plan(User.objects.all(), UserSerializer)
+
+
+@async_api_view(user_queryset=_users_for_me)
+async def me(request):
+    """Async GET of /api/users/me/, with the same ETag as UserViewSet.me."""
+    user = request.user
+    memberships = [
+        row async for row in Membership.objects.filter(user=user).order_by('pk').values_list('pk', 'organization_id', 'role')
+    ]
+    etag = make_etag(user.pk, user.updated_at, user.has_premium_access, memberships)
+    response = not_modified(request, etag)
+    if response is None:
+        response = JsonResponse(UserSerializer(user, context={'request': request}).data)
+    return set_validators(response, etag)
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from users.tasks import generate_avatar_thumbnails
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue generate_avatar_thumbnails for users whose avatar has no stored "
+        "thumbnails yet (avatars uploaded before thumbnails were precomputed), "
+        "so they stop serving the full-size original. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        missing = User.objects.exclude(avatar='').exclude(avatar__isnull=True).filter(avatar_40_url='')
+        queued = 0
+        last_pk = 0
+        while True:
+            user_ids = list(
+                missing.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                generate_avatar_thumbnails.delay(user_id)
+            queued += len(user_ids)
+            last_pk = user_ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"Queued avatar thumbnails for {queued} users."))
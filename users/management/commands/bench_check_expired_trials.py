@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from users.tasks import TRIAL_EXPIRY_BATCH_SIZE, check_expired_trials
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Seed expired trial users and time check_expired_trials against them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help="Number of expired trial users to seed.")
+        parser.add_argument('--batch-size', type=int, default=TRIAL_EXPIRY_BATCH_SIZE)
+        parser.add_argument('--keep', action='store_true',
+                            help="Commit the seeded users instead of rolling everything back.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seed_time = self._seed(options['users'])
+            self.stdout.write(f"Seeded {options['users']} expired trial users in {seed_time:.2f}s")
+
+            started = time.monotonic()
+            result = check_expired_trials(batch_size=options['batch_size'])
+            elapsed = time.monotonic() - started
+            self.stdout.write(result)
+            self.stdout.write(self.style.SUCCESS(f"check_expired_trials took {elapsed:.2f}s"))
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def _seed(self, count, chunk=10_000):
+        started = time.monotonic()
+        ends_at = timezone.now() - timedelta(days=1)
+        for offset in range(0, count, chunk):
+            User.objects.bulk_create([
+                User(
+                    username=f'bench-trial-{i}',
+                    email=f'bench-trial-{i}@example.com',
+                    password='!',
+                    is_on_trial=True,
+                    trial_start_date=ends_at - timedelta(days=7),
+                    trial_ends_at=ends_at,
+                )
+                for i in range(offset, min(offset + chunk, count))
+            ])
+        return time.monotonic() - started
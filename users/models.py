@@ -2,16 +2,23 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from sorl.thumbnail import ImageField, get_thumbnail
 
+AVATAR_SIZES = (40, 100, 400)
+
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     address = models.CharField(max_length=255, blank=True, null=True)
     avatar = ImageField(upload_to='avatars/', blank=True, null=True)
+    # Thumbnail URLs, filled in by a Celery task whenever the avatar changes
+    avatar_40_url = models.CharField(max_length=500, blank=True)
+    avatar_100_url = models.CharField(max_length=500, blank=True)
+    avatar_400_url = models.CharField(max_length=500, blank=True)
     is_premium = models.BooleanField(default=False)
     stripe_customer_id = models.CharField(max_length=255, blank=True)
     trial_start_date = models.DateTimeField(null=True, blank=True)
     trial_ends_at = models.DateTimeField(null=True, blank=True)
     is_on_trial = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     @property
     def is_trial_active(self):
@@ -28,17 +35,27 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
-    def get_avatar_40(self):
+    def build_avatar_thumbnails(self):
+        # Renders through sorl; only called from users.tasks.generate_avatar_thumbnails
+        return {
+            size: get_thumbnail(self.avatar, f'{size}x{size}', crop='center', quality=99).url
+            for size in AVATAR_SIZES
+        }
+
+    def _avatar_url(self, size):
+        url = getattr(self, f'avatar_{size}_url')
+        if url:
+            return url
         if self.avatar:
-            return get_thumbnail(self.avatar, '40x40', crop='center', quality=99).url
-        return "/static/default-avatar-40.png"
+            # Thumbnails are still being generated, serve the original meanwhile
+            return self.avatar.url
+        return f"/static/default-avatar-{size}.png"
+
+    def get_avatar_40(self):
+        return self._avatar_url(40)
 
     def get_avatar_100(self):
-        if self.avatar:
-            return get_thumbnail(self.avatar, '100x100', crop='center', quality=99).url
-        return "/static/default-avatar-100.png"
+        return self._avatar_url(100)
 
     def get_avatar_400(self):
-        if self.avatar:
-            return get_thumbnail(self.avatar, '400x400', crop='center', quality=99).url
-        return "/static/default-avatar-400.png" 
\ No newline at end of file
+        return self._avatar_url(400)
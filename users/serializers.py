@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_decode
 from sorl.thumbnail import get_thumbnail
+from elevanalog.instrumentation import TimedSerializerMixin
 from organizations.serializers import MembershipSerializer
 
 
@@ -45,7 +46,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         fields = ['first_name', 'last_name', 'phone_number', 'address', 'avatar']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     avatar_40 = serializers.SerializerMethodField()
     avatar_100 = serializers.SerializerMethodField()
     avatar_400 = serializers.SerializerMethodField()
@@ -62,6 +63,8 @@ class UserSerializer(serializers.ModelSerializer):
                   'avatar_100', 'avatar_400', 'has_premium_access', 'is_on_trial', 
                   'trial_ends_at', 'date_joined', 'memberships', 'subscription_ends_at']
         extra_kwargs = {'password': {'write_only': True}}
+        # Read by get_subscription_ends_at; used by elevanalog.prefetch
+        select_related = ['subscription']
 
     def get_subscription_ends_at(self, obj):
         if hasattr(obj, 'subscription') and obj.subscription:
@@ -86,4 +89,20 @@ class UserSerializer(serializers.ModelSerializer):
         user.trial_start_date = timezone.now()
         user.trial_ends_at = timezone.now() + timedelta(days=7)
         user.save()
-        return user
\ No newline at end of file
+        return user
+
+
+class CompactUserSerializer(serializers.ModelSerializer):
+    """
+    Lightweight user representation for embedding in task, comment and
+    accountability rows. Needs no related rows, unlike UserSerializer.
+    """
+    avatar_40 = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'avatar_40']
+        read_only_fields = fields
+
+    def get_avatar_40(self, obj):
+        return obj.get_avatar_40()
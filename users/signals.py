@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import AVATAR_SIZES, User
+from .tasks import generate_avatar_thumbnails
+
+
+def _avatar_name(instance):
+    # None when the avatar was deferred and hasn't been loaded
+    if 'avatar' not in instance.__dict__:
+        return None
+    value = instance.__dict__['avatar']
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=User)
+def remember_avatar(sender, instance, **kwargs):
+    # What the avatar was when loaded, so saves can tell it changed
+    instance._saved_avatar = _avatar_name(instance)
+
+
+@receiver(pre_save, sender=User)
+def track_avatar_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    if instance._state.adding:
+        previous = ''
+    else:
+        previous = instance._saved_avatar
+        if previous is None:
+            # Loaded with the avatar deferred: read the stored one
+            previous = User.objects.filter(pk=instance.pk).values_list('avatar', flat=True).first() or ''
+    if previous != (instance.avatar.name or ''):
+        instance._avatar_changed = True
+        # The stored thumbnails belong to the old image
+        for size in AVATAR_SIZES:
+            setattr(instance, f'avatar_{size}_url', '')
+
+
+@receiver(post_save, sender=User)
+def queue_avatar_thumbnails(sender, instance, **kwargs):
+    instance._saved_avatar = _avatar_name(instance)
+    if getattr(instance, '_avatar_changed', False):
+        instance._avatar_changed = False
+        user_id = instance.pk
+        transaction.on_commit(lambda: generate_avatar_thumbnails.delay(user_id))
@@ -1,33 +1,99 @@
+import logging
+import time
+
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
-from .models import User
+from .models import AVATAR_SIZES, User
 from organizations.models import Organization
+from tasks.cache import invalidate_embedding_tasks
+
+logger = logging.getLogger(__name__)
+
+TRIAL_EXPIRY_BATCH_SIZE = 1000
+
+
+def _expire_trials(model, now, batch_size):
+    """
+    Switch off expired trials for `model` in primary-key batches.
+
+    Each batch locks its rows with SKIP LOCKED, so an overlapping beat run
+    works on different rows instead of double-processing the same ones, and
+    the update re-checks the filter so only rows it actually changed are
+    counted. Uses update(), so no per-row save() or signals.
+    """
+    expired = model.objects.filter(is_on_trial=True, trial_ends_at__lt=now)
+    # update() skips auto_now, so keep updated_at (used for ETags) current by hand
+    touch = {'updated_at': now} if any(f.name == 'updated_at' for f in model._meta.fields) else {}
+    total = 0
+    batch = 0
+    while True:
+        started = time.monotonic()
+        with transaction.atomic():
+            ids = list(
+                expired.select_for_update(skip_locked=True).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            updated = expired.filter(pk__in=ids).update(is_on_trial=False, is_premium=False, **touch)
+        total += updated
+        batch += 1
+        logger.info(
+            "check_expired_trials batch",
+            extra={
+                'model': model._meta.label,
+                'batch': batch,
+                'rows': updated,
+                'duration_ms': round((time.monotonic() - started) * 1000, 2),
+            },
+        )
+    return total
+
 
 @shared_task
-def check_expired_trials():
+def check_expired_trials(batch_size=TRIAL_EXPIRY_BATCH_SIZE):
     """
     A Celery task to check for expired trials for both users and organizations.
     """
     now = timezone.now()
-    
-    # Check for expired user trials
-    expired_user_trials = User.objects.filter(
-        is_on_trial=True,
-        trial_ends_at__lt=now
-    )
-    for user in expired_user_trials:
-        user.is_on_trial = False
-        user.is_premium = False
-        user.save()
-
-    # Check for expired organization trials
-    expired_org_trials = Organization.objects.filter(
-        is_on_trial=True,
-        trial_ends_at__lt=now
+    started = time.monotonic()
+
+    user_count = _expire_trials(User, now, batch_size)
+    org_count = _expire_trials(Organization, now, batch_size)
+
+    logger.info(
+        "check_expired_trials finished",
+        extra={
+            'users': user_count,
+            'organizations': org_count,
+            'duration_ms': round((time.monotonic() - started) * 1000, 2),
+        },
     )
-    for org in expired_org_trials:
-        org.is_on_trial = False
-        org.is_premium = False
-        org.save()
+    return f"Checked for expired trials. Deactivated {user_count} user trials and {org_count} organization trials."
+
 
-    return f"Checked for expired trials. Deactivated {expired_user_trials.count()} user trials and {expired_org_trials.count()} organization trials."
+@shared_task
+def generate_avatar_thumbnails(user_id):
+    """
+    Render a user's avatar thumbnails and store their URLs on the user, so
+    serializing a user never goes through the thumbnail pipeline.
+    """
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return "User not found."
+
+    if user.avatar:
+        urls = user.build_avatar_thumbnails()
+    else:
+        urls = {size: '' for size in AVATAR_SIZES}
+
+    # Skip the write if the avatar was replaced again while we were rendering
+    updated = User.objects.filter(pk=user_id, avatar=user.avatar.name or '').update(
+        updated_at=timezone.now(),
+        **{f'avatar_{size}_url': url for size, url in urls.items()}
+    )
+    if not updated:
+        return "Avatar changed, skipped."
+    # update() sends no post_save; lists embedding the user's avatar_40 change
+    invalidate_embedding_tasks(user_ids=[user_id])
+    return f"Stored avatar thumbnails for user {user_id}."
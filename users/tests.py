@@ -1,3 +1,51 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import User
+from .tasks import check_expired_trials
+
+
+class AvatarThumbnailBackfillTests(TestCase):
+    def test_queues_only_avatars_without_thumbnails(self):
+        pending = User.objects.create_user(username='pending', email='pending@example.com', password='pass')
+        done = User.objects.create_user(username='done', email='done@example.com', password='pass')
+        User.objects.create_user(username='plain', email='plain@example.com', password='pass')
+        # update() so the avatar signals don't queue anything themselves
+        User.objects.filter(pk=pending.pk).update(avatar='avatars/pending.png')
+        User.objects.filter(pk=done.pk).update(avatar='avatars/done.png', avatar_40_url='/media/cache/done.png')
+
+        with mock.patch('users.management.commands.backfill_avatar_thumbnails.generate_avatar_thumbnails') as task:
+            call_command('backfill_avatar_thumbnails', stdout=StringIO())
+        task.delay.assert_called_once_with(pending.pk)
+
+
+class TrialExpiryTests(TestCase):
+    def _user(self, name, ends_in):
+        return User.objects.create_user(
+            username=name, email=f'{name}@example.com', password='pass', is_on_trial=True, is_premium=True,
+            trial_ends_at=timezone.now() + ends_in,
+        )
+
+    def test_expired_trials_are_switched_off_in_batches(self):
+        expired = [self._user(f'lapsed{i}', -timedelta(days=i + 1)) for i in range(5)]
+        active = self._user('active', timedelta(days=3))
+        before = timezone.now()
+
+        with self.assertLogs('users.tasks', 'INFO') as logs:
+            result = check_expired_trials(batch_size=2)
+        self.assertIn('Deactivated 5 user trials', result)
+        batches = [record for record in logs.records if record.getMessage() == 'check_expired_trials batch']
+        self.assertEqual([record.rows for record in batches if record.model == User._meta.label], [2, 2, 1])
+
+        for user in User.objects.filter(pk__in=[user.pk for user in expired]):
+            self.assertEqual((user.is_on_trial, user.is_premium), (False, False))
+            self.assertGreaterEqual(user.updated_at, before)
+        active.refresh_from_db()
+        self.assertEqual((active.is_on_trial, active.is_premium), (True, True))
 
-# Create your tests here.
+        self.assertIn('Deactivated 0 user trials', check_expired_trials(batch_size=2))
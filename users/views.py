@@ -14,6 +14,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth import get_user_model
+from elevanalog.conditional import make_etag, not_modified, set_validators
+from organizations.models import Membership
 from .serializers import UserSerializer, UserUpdateSerializer, PasswordResetConfirmSerializer
 
 User = get_user_model()
@@ -34,9 +36,18 @@ class UserViewSet(mixins.RetrieveModelMixin,
     def me(self, request, *args, **kwargs):
         instance = self.request.user
         if request.method == 'GET':
-            print(f"User {instance.email} is premium: {instance.is_premium}")
-            serializer = self.get_serializer(instance)
-            return Response(serializer.data)
+            logger.debug("User %s is premium: %s", instance.email, instance.is_premium)
+            # Memberships are embedded in the payload but don't touch updated_at,
+            # so they go into the ETag (and no Last-Modified is sent)
+            memberships = list(
+                Membership.objects.filter(user=instance).order_by('pk').values_list('pk', 'organization_id', 'role')
+            )
+            etag = make_etag(instance.pk, instance.updated_at, instance.has_premium_access, memberships)
+            response = not_modified(request, etag)
+            if response is None:
+                serializer = self.get_serializer(instance)
+                response = Response(serializer.data)
+            return set_validators(response, etag)
         
         if request.method == 'POST':
             from django.utils import timezone